@@ -1,8 +1,10 @@
 from django.contrib import admin
+from core.busqueda import BusquedaAdminMixin
+
 from .models import BlogPost
 
 @admin.register(BlogPost)
-class BlogPostAdmin(admin.ModelAdmin):
+class BlogPostAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ('titulo', 'slug', 'tipo_contenido', 'fecha_publicacion', 'esta_publicado')
     list_filter = ('tipo_contenido', 'fecha_publicacion', 'esta_publicado')
     search_fields = ('titulo', 'descripcion_breve', 'contenido')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        ('tags', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('esta_publicado', True)), fields=['-fecha_publicacion'], name='blogpost_pub_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('esta_publicado', True)), fields=['tipo_contenido', '-fecha_publicacion'], name='blogpost_pub_tipo_fecha_idx'),
+        ),
+    ]
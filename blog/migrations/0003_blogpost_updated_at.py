@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def usar_fecha_publicacion(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPost.objects.update(updated_at=F('fecha_publicacion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blogpost_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Última Actualización'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(usar_fecha_publicacion, migrations.RunPython.noop),
+    ]
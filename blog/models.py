@@ -30,6 +30,7 @@ class BlogPost(models.Model):
         verbose_name="Tipo de Contenido"
     )
     fecha_publicacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Publicación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     autor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="blog_posts", verbose_name="Autor")
 
     # Campos para contenido multimedia
@@ -48,6 +49,14 @@ class BlogPost(models.Model):
         verbose_name = "Entrada de Blog"
         verbose_name_plural = "Entradas de Blog"
         ordering = ['-fecha_publicacion']
+        indexes = [
+            # Índices parciales: Django filtra los booleanos como WHERE "esta_publicado",
+            # que SQLite no usa como primera columna de un índice compuesto
+            models.Index(fields=['-fecha_publicacion'], name='blogpost_pub_fecha_idx',
+                         condition=models.Q(esta_publicado=True)),
+            models.Index(fields=['tipo_contenido', '-fecha_publicacion'], name='blogpost_pub_tipo_fecha_idx',
+                         condition=models.Q(esta_publicado=True)),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -1,3 +1,44 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import BlogPost
+
+
+class PresupuestoConsultasTests(TestCase):
+    """Consultas máximas por petición de las vistas públicas del blog."""
+    ENTRADAS = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        tipos = [tipo for tipo, _ in BlogPost.TIPO_CONTENIDO_CHOICES]
+        entradas = BlogPost.objects.bulk_create([
+            BlogPost(
+                titulo=f'Entrada {i}', slug=f'entrada-{i}', contenido='Contenido',
+                tipo_contenido=tipos[i % len(tipos)], descripcion_breve='Descripción',
+                esta_publicado=i % 10 != 0,
+            )
+            for i in range(cls.ENTRADAS)
+        ], batch_size=500)
+        cls.entrada = entradas[1]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_blog_list(self):
+        # Last-Modified, conteo del paginador y página actual
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog:blog_list'), {'page': 3})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_blog_detalle(self):
+        # Last-Modified, entrada, relacionadas por etiquetas y, como no hay
+        # etiquetas, relacionadas del mismo tipo
+        with self.assertNumQueries(4):
+            response = self.client.get(self.entrada.get_absolute_url())
+        self.assertEqual(len(response.context['posts_relacionados']), 3)
+
+    def test_blog_por_tipo(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('blog:blog_por_tipo', args=['lectura']))
+        self.assertEqual(len(response.context['page_obj']), 10)
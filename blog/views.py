@@ -1,47 +1,88 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import aget_object_or_404
 from django.core.paginator import Paginator
+from django.db.models import Max, Q, Subquery
+from core.asincrono import alista, arender
+from core.cache_paginas import cache_pagina, respuesta_condicional
+from core.enrutador import solo_lectura
+from core.relacionados import ids_relacionados, relacionados
 from .models import BlogPost
 
 
-def blog_list(request):
+async def _ultima_modificacion_blog(request):
+    # Sin filtrar esta_publicado: despublicar una entrada también cambia la lista
+    return (await BlogPost.objects.aaggregate(m=Max('updated_at')))['m']
+
+
+async def _ultima_modificacion_entrada(request, slug):
+    # La entrada y sus relacionadas: por etiquetas y, si faltan, del mismo tipo de contenido
+    entrada = BlogPost.objects.filter(slug=slug)
+    entradas = BlogPost.objects.filter(
+        Q(tipo_contenido__in=entrada.values('tipo_contenido'))
+        | Q(pk__in=ids_relacionados(BlogPost, Subquery(entrada.values('pk')), BlogPost))
+    )
+    return (await entradas.aaggregate(m=Max('updated_at')))['m']
+
+
+async def _pagina(posts, request, por_pagina=10):
+    """
+    Paginator.get_page() con el ORM asíncrono: el total y las entradas de la
+    página se consultan antes de renderizar.
+    """
+    paginator = Paginator(posts, por_pagina)
+    paginator.count = await posts.acount()
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = await alista(page_obj.object_list)
+    return page_obj
+
+
+@solo_lectura
+@respuesta_condicional('blog', ultima_modificacion=_ultima_modificacion_blog)
+@cache_pagina('blog')
+async def blog_list(request):
     """
     Vista para listar todas las entradas de blog
     """
     posts = BlogPost.objects.filter(esta_publicado=True).order_by('-fecha_publicacion')
     
     # Paginación
-    paginator = Paginator(posts, 10)  # 10 posts por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await _pagina(posts, request, 10)  # 10 posts por página
     
     context = {
         'page_obj': page_obj,
         'titulo_pagina': 'Blog - Jesús Te Sana'
     }
-    return render(request, 'blog/blog_list.html', context)
+    return await arender(request, 'blog/blog_list.html', context)
 
 
-def blog_detalle(request, slug):
+@solo_lectura
+@respuesta_condicional('blog', ultima_modificacion=_ultima_modificacion_entrada)
+@cache_pagina('blog')
+async def blog_detalle(request, slug):
     """
     Vista para mostrar un post específico del blog
     """
-    post = get_object_or_404(BlogPost, slug=slug, esta_publicado=True)
+    post = await aget_object_or_404(BlogPost, slug=slug, esta_publicado=True)
     
-    # Obtener posts relacionados (mismo tipo o mismas etiquetas)
-    posts_relacionados = BlogPost.objects.filter(
-        tipo_contenido=post.tipo_contenido, 
-        esta_publicado=True
-    ).exclude(slug=slug)[:3]
+    # Posts relacionados por etiquetas (precalculados en core.relacionados) y,
+    # si no alcanzan, otros del mismo tipo de contenido
+    posts_relacionados = await alista(relacionados(post, BlogPost).filter(esta_publicado=True)[:3])
+    if len(posts_relacionados) < 3:
+        posts_relacionados += await alista(BlogPost.objects.filter(
+            tipo_contenido=post.tipo_contenido,
+            esta_publicado=True
+        ).exclude(pk__in=[post.pk, *(relacionado.pk for relacionado in posts_relacionados)])[:3 - len(posts_relacionados)])
     
     context = {
         'post': post,
         'posts_relacionados': posts_relacionados,
         'titulo_pagina': f'{post.titulo} - Blog Jesús Te Sana'
     }
-    return render(request, 'blog/blog_detalle.html', context)
+    return await arender(request, 'blog/blog_detalle.html', context)
 
 
-def blog_por_tipo(request, tipo_contenido):
+@solo_lectura
+@cache_pagina('blog')
+async def blog_por_tipo(request, tipo_contenido):
     """
     Vista para listar entradas de blog por tipo de contenido
     """
@@ -51,9 +92,7 @@ def blog_por_tipo(request, tipo_contenido):
     ).order_by('-fecha_publicacion')
     
     # Paginación
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await _pagina(posts, request)
     
     # Obtener el nombre amigable del tipo de contenido
     tipo_nombres = {
@@ -72,4 +111,4 @@ def blog_por_tipo(request, tipo_contenido):
         'titulo_tipo': titulo_tipo,
         'titulo_pagina': f'{titulo_tipo} - Jesús Te Sana'
     }
-    return render(request, 'blog/blog_por_tipo.html', context)
\ No newline at end of file
+    return await arender(request, 'blog/blog_por_tipo.html', context)
\ No newline at end of file
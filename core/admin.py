@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .busqueda import BusquedaAdminMixin
 from .models import Evento, Inscripcion, Cuori
 
 # Configuraciones personalizadas para el Admin
@@ -11,11 +12,11 @@ class InscripcionInline(admin.TabularInline):
     # Permitir buscar y agregar Cuoris directamente desde el evento
     autocomplete_fields = ['cuori']
 
-class EventoAdmin(admin.ModelAdmin):
+class EventoAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     class Media:
         js = ('admin/js/evento_ofrenda.js',)
 
-    list_display = ('titulo', 'fecha', 'hora_fin', 'lugar', 'direccion', 'ciudad', 'departamento', 'coordenadas_mapa', 'cupos', 'tipo_asistencia', 'dirigido_a', 'requiere_ofrenda', 'valor_ofrenda', 'requiere_inscripcion')
+    list_display = ('titulo', 'fecha', 'hora_fin', 'lugar', 'direccion', 'ciudad', 'departamento', 'coordenadas_mapa', 'cupos', 'get_cupos_disponibles', 'tipo_asistencia', 'dirigido_a', 'requiere_ofrenda', 'valor_ofrenda', 'requiere_inscripcion')
     list_filter = ('fecha', 'lugar', 'ciudad', 'departamento', 'tipo_asistencia', 'dirigido_a', 'requiere_ofrenda', 'requiere_inscripcion')
     search_fields = ('titulo', 'descripcion', 'ciudad', 'departamento', 'direccion', 'coordenadas_mapa')
     inlines = [InscripcionInline]
@@ -31,6 +32,12 @@ class EventoAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_cupos_disponibles(self, obj):
+        if obj.tipo_asistencia == 'ABIERTO':
+            return '-'
+        return obj.cupos_disponibles
+    get_cupos_disponibles.short_description = 'Cupos Disponibles'
+
     def get_fieldsets(self, request, obj=None):
         fieldsets = super().get_fieldsets(request, obj)
         # Convertir a lista para poder modificar
@@ -83,7 +90,7 @@ class InscripcionInlineForCuori(admin.TabularInline):
     readonly_fields = ['evento', 'fecha_inscripcion'] # Hacerlos de solo lectura
     can_delete = False # No permitir eliminar inscripciones desde aquí
 
-class CuoriAdmin(admin.ModelAdmin):
+class CuoriAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ('nombre_completo', 'cedula', 'email_contacto', 'numero_contacto', 'numero_contacto_2', 'ciudad', 'departamento')
     search_fields = ('nombre_completo', 'cedula', 'email_contacto', 'numero_contacto', 'numero_contacto_2')
     inlines = [InscripcionInlineForCuori]
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks, portada, signals  # noqa: F401
+        from . import busqueda, generaciones, imagenes, relacionados
+        busqueda.conectar_senales()
+        generaciones.conectar_senales()
+        imagenes.conectar_senales()
+        relacionados.conectar_senales()
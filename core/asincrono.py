@@ -0,0 +1,40 @@
+"""
+Utilidades para las vistas asíncronas (ASGI, ver jts_project/asgi.py).
+
+Desde el bucle de eventos no se puede consultar la base de datos de forma
+síncrona: request.user, la sesión y los querysets que se evalúan en la
+plantilla fallarían con SynchronousOnlyOperation. Las vistas asíncronas
+materializan sus consultas con el ORM asíncrono y renderizan con arender(),
+que carga antes al usuario.
+
+El renderizado tampoco corre en el bucle: etiquetas como imagen_responsiva
+pueden leer el almacenamiento y generar variantes con Pillow, y eso
+bloquearía todas las conexiones del proceso.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+async def cargar_usuario(request):
+    """
+    Carga el usuario (y con él la sesión) con el ORM asíncrono y lo deja en
+    request.user, para que el código síncrono que lo lea después, como los
+    context processors, no consulte la base de datos.
+    """
+    if hasattr(request, 'auser'):
+        request.user = await request.auser()
+    return getattr(request, 'user', None)
+
+
+async def arender(request, template_name, context=None, **kwargs):
+    """
+    render() para vistas asíncronas, en un hilo; el contexto ya debe estar
+    materializado.
+    """
+    await cargar_usuario(request)
+    return await sync_to_async(render)(request, template_name, context, **kwargs)
+
+
+async def alista(queryset):
+    """Evalúa el queryset con el ORM asíncrono y devuelve la lista de resultados."""
+    return [objeto async for objeto in queryset]
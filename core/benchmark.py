@@ -0,0 +1,259 @@
+"""
+Benchmark de las vistas públicas usado por `manage.py bench`.
+
+Siembra una base de datos de prueba con volúmenes parecidos a los de
+producción, recorre las vistas principales de core, products y blog con el
+cliente de pruebas de Django y calcula percentiles de latencia y peticiones
+por segundo de cada una.
+
+medir_concurrencia() es la carga de `manage.py bench_concurrencia`: hilos
+lectores y escritores simultáneos sobre una base SQLite en archivo.
+"""
+import itertools
+import math
+import threading
+import time
+
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import BlogPost
+from products.models import Package, Product
+from .models import Cuori, Evento, Inscripcion
+from .services import CuposAgotados, inscribir_cuori
+
+# Volúmenes de referencia (se multiplican por la escala)
+VOLUMENES = {
+    'eventos': 200,
+    'cuoris': 50_000,
+    'inscripciones_por_cuori': 2,
+    'productos': 2000,
+    'paquetes': 20,
+    'entradas_blog': 5000,
+}
+
+
+def sembrar_datos(escala=1.0):
+    """Crea los datos del benchmark y devuelve los objetos que usan los escenarios."""
+    cantidad = {clave: max(1, int(valor * escala)) for clave, valor in VOLUMENES.items()}
+    cantidad['inscripciones_por_cuori'] = VOLUMENES['inscripciones_por_cuori']
+    cantidad['eventos'] = max(cantidad['eventos'], cantidad['inscripciones_por_cuori'])
+    ahora = timezone.now()
+
+    eventos = Evento.objects.bulk_create([
+        Evento(
+            titulo=f'Evento {i}', slug=f'evento-{i}', descripcion='Retiro de sanación',
+            fecha=ahora + timezone.timedelta(hours=1, days=i), lugar='Casa de retiros',
+            cupos=cantidad['cuoris'] * 2,
+        )
+        for i in range(cantidad['eventos'])
+    ])
+    cuoris = Cuori.objects.bulk_create([
+        Cuori(
+            nombre_completo=f'CUORI {i}', cedula=str(1_000_000 + i), numero_contacto='3000000000',
+            email_contacto=f'{i}@example.com', pais='COLOMBIA', departamento='CUNDINAMARCA', ciudad='BOGOTÁ',
+        )
+        for i in range(cantidad['cuoris'])
+    ], batch_size=2000)
+    Inscripcion.objects.bulk_create([
+        Inscripcion(evento=eventos[(i + j) % len(eventos)], cuori=cuori)
+        for i, cuori in enumerate(cuoris)
+        for j in range(cantidad['inscripciones_por_cuori'])
+    ], batch_size=5000)
+    for evento in eventos:
+        Evento.objects.filter(pk=evento.pk).update(inscritos_count=evento.inscritos.count())
+
+    categorias = [category for category, _ in Product.CATEGORIA_CHOICES if category != 'paquete']
+    productos = Product.objects.bulk_create([
+        Product(
+            name=f'Producto {i}', slug=f'producto-{i}', price=10000, description='Descripción',
+            category=categorias[i % len(categorias)],
+        )
+        for i in range(cantidad['productos'])
+    ], batch_size=500)
+    paquetes = Package.objects.bulk_create([
+        Package(name=f'Paquete {i}', slug=f'paquete-{i}', price=50000)
+        for i in range(cantidad['paquetes'])
+    ])
+    Package.products.through.objects.bulk_create([
+        Package.products.through(package=paquete, product=productos[(i * 5 + j) % len(productos)])
+        for i, paquete in enumerate(paquetes)
+        for j in range(5)
+    ], ignore_conflicts=True)
+
+    tipos = [tipo for tipo, _ in BlogPost.TIPO_CONTENIDO_CHOICES]
+    entradas = BlogPost.objects.bulk_create([
+        BlogPost(
+            titulo=f'Entrada {i}', slug=f'entrada-{i}', contenido='Contenido', descripcion_breve='Descripción',
+            tipo_contenido=tipos[i % len(tipos)],
+        )
+        for i in range(cantidad['entradas_blog'])
+    ], batch_size=500)
+
+    return {
+        'evento': eventos[0],
+        'cuori': cuoris[0],
+        'producto': productos[0],
+        'paquete': paquetes[0],
+        'entrada': entradas[0],
+    }
+
+
+def escenarios(datos):
+    """
+    Peticiones del benchmark como (nombre, método, url, función que devuelve
+    los datos de la i-ésima petición).
+    """
+    evento = datos['evento']
+    cedula = datos['cuori'].cedula
+
+    def datos_inscripcion(i):
+        return {
+            'nombre_completo': f'Bench {i}', 'cedula': str(9_000_000 + i), 'numero_contacto': '3000000000',
+            'email_contacto': f'bench{i}@example.com', 'pais': 'COLOMBIA', 'departamento': 'CUNDINAMARCA',
+            'ciudad': 'BOGOTÁ', 'terms_accepted': 'on',
+        }
+
+    return [
+        ('home', 'get', reverse('home'), None),
+        ('about', 'get', reverse('about'), None),
+        ('eventos', 'get', reverse('eventos'), None),
+        ('evento_detalle', 'get', reverse('evento_detalle', args=[evento.slug]), None),
+        ('inscribir_evento GET', 'get', reverse('inscribir_evento', args=[evento.slug]), lambda i: {'cedula': cedula}),
+        ('inscribir_evento POST', 'post', reverse('inscribir_evento', args=[evento.slug]), datos_inscripcion),
+        ('get_inscripcion_data_by_cedula', 'get', reverse('get_inscripcion_data_by_cedula'),
+         lambda i: {'cedula': cedula, 'evento_slug': evento.slug}),
+        ('products:categorized_product_list', 'get', reverse('products:categorized_product_list'), None),
+        ('products:product_detail', 'get', datos['producto'].get_absolute_url(), None),
+        ('products:package_detail', 'get', datos['paquete'].get_absolute_url(), None),
+        ('blog:blog_list', 'get', reverse('blog:blog_list'), None),
+        ('blog:detalle_post', 'get', datos['entrada'].get_absolute_url(), None),
+        ('blog:blog_por_tipo', 'get', reverse('blog:blog_por_tipo', args=['lectura']), None),
+    ]
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano."""
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def medir(escenario, peticiones, calentamiento=5):
+    nombre, metodo, url, datos = escenario
+    client = Client(HTTP_X_REQUESTED_WITH='XMLHttpRequest') if metodo == 'post' else Client()
+    enviar = getattr(client, metodo)
+
+    for i in range(calentamiento):
+        enviar(url, datos(-1 - i) if datos else None)
+
+    tiempos = []
+    inicio_total = time.perf_counter()
+    for i in range(peticiones):
+        inicio = time.perf_counter()
+        response = enviar(url, datos(i) if datos else None)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{nombre} respondió {response.status_code}')
+    duracion = time.perf_counter() - inicio_total
+
+    tiempos.sort()
+    return {
+        'peticiones': peticiones,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'media_ms': round(sum(tiempos) / peticiones, 3),
+        'peticiones_por_segundo': round(peticiones / duracion, 1),
+    }
+
+
+def comparar(resultados, linea_base, metrica='p95_ms', umbral=0.25, minimo_ms=1.0):
+    """
+    Devuelve las vistas cuya métrica empeoró más del umbral (fracción) respecto
+    a la línea base, ignorando diferencias menores a minimo_ms.
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = linea_base.get(nombre)
+        if not anterior or metrica not in anterior:
+            continue
+        limite = anterior[metrica] * (1 + umbral)
+        if actual[metrica] > limite and actual[metrica] - anterior[metrica] >= minimo_ms:
+            regresiones.append((nombre, anterior[metrica], actual[metrica]))
+    return regresiones
+
+
+def _resumen_operaciones(tiempos, errores, duracion):
+    tiempos.sort()
+    return {
+        'operaciones': len(tiempos),
+        'errores': errores,
+        'por_segundo': round(len(tiempos) / duracion, 1),
+        'p50_ms': round(percentil(tiempos, 50), 3) if tiempos else None,
+        'p95_ms': round(percentil(tiempos, 95), 3) if tiempos else None,
+        'p99_ms': round(percentil(tiempos, 99), 3) if tiempos else None,
+    }
+
+
+def medir_concurrencia(evento, lectores=8, escritores=4, duracion=5.0):
+    """
+    Durante `duracion` segundos, los hilos lectores consultan el listado de
+    eventos y los inscritos de `evento` mientras los escritores inscriben
+    cuoris nuevos con inscribir_cuori(). Cada hilo usa su propia conexión.
+
+    Las operaciones que fallan con OperationalError ("database is locked")
+    se cuentan como errores y no se reintentan: en una petición real serían
+    un error 500.
+    """
+    cedulas = itertools.count(8_000_000)
+    fin = []
+    # El reloj empieza cuando todos los hilos están listos
+    inicio = threading.Barrier(lectores + escritores, action=lambda: fin.append(time.perf_counter() + duracion))
+    por_hilo = []
+
+    def leer():
+        list(Evento.objects.order_by('fecha')[:20])
+        list(Inscripcion.objects.filter(evento=evento).values_list('cuori__cedula', flat=True)[:50])
+
+    def escribir():
+        cedula = str(next(cedulas))
+        try:
+            inscribir_cuori(evento, {
+                'nombre_completo': f'Bench {cedula}', 'cedula': cedula, 'numero_contacto': '3000000000',
+                'numero_contacto_2': None, 'email_contacto': f'{cedula}@example.com',
+                'pais': 'COLOMBIA', 'departamento': 'CUNDINAMARCA', 'ciudad': 'BOGOTÁ',
+            })
+        except CuposAgotados:
+            pass
+
+    def trabajar(operacion, tipo):
+        tiempos, errores = [], 0
+        try:
+            inicio.wait()
+            while time.perf_counter() < fin[0]:
+                comienzo = time.perf_counter()
+                try:
+                    operacion()
+                except OperationalError:
+                    errores += 1
+                    continue
+                tiempos.append((time.perf_counter() - comienzo) * 1000)
+        finally:
+            connection.close()
+        por_hilo.append((tipo, tiempos, errores))
+
+    hilos = [threading.Thread(target=trabajar, args=(leer, 'lecturas')) for _ in range(lectores)]
+    hilos += [threading.Thread(target=trabajar, args=(escribir, 'escrituras')) for _ in range(escritores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    resultados = {}
+    for tipo in ('lecturas', 'escrituras'):
+        tiempos = [tiempo for t, lista, _ in por_hilo if t == tipo for tiempo in lista]
+        errores = sum(errores for t, _, errores in por_hilo if t == tipo)
+        resultados[tipo] = _resumen_operaciones(tiempos, errores, duracion)
+    return resultados
@@ -0,0 +1,325 @@
+"""
+Búsqueda de texto completo en eventos, productos, paquetes y entradas del blog.
+
+Los textos se copian a la tabla virtual FTS5 core_busqueda (migración
+core/0005), que separa las palabras con el tokenizador unicode61 sin
+diacríticos: "cancion" encuentra "Canción" y "sanacion" encuentra "SANACIÓN".
+FTS5 no trae raíces para el español, así que cada palabra se busca también
+como prefijo ("libro" encuentra "libros").
+
+Las señales (ver conectar_senales) actualizan el índice en la misma
+transacción que el cambio. Las escrituras masivas, que no envían señales,
+llaman a indexar() directamente, y `manage.py reconstruir_busqueda` rehace el
+índice desde cero.
+
+buscar() ordena por bm25, con más peso para el título, y devuelve un
+fragmento con las coincidencias resaltadas. Para que FTS5 no lea el texto de
+todas las coincidencias al ordenar, el rowid de cada fila codifica el id, el
+tipo y si el objeto es público (ver _rowid), y los textos se leen después, solo
+para los resultados de la página. El admin usa el mismo índice con
+BusquedaAdminMixin; los Cuoris se indexan solo para el admin, nunca son
+públicos.
+"""
+import operator
+from functools import reduce
+
+import bisect
+import re
+import unicodedata
+from typing import NamedTuple
+
+from django.apps import apps as apps_globales
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from django.utils.text import smart_split, unescape_string_literal
+
+TABLA = 'core_busqueda'
+MAXIMO_PALABRAS = 8
+PALABRAS_FRAGMENTO = 16
+# Peso del título frente al contenido en bm25
+PESO_TITULO = 10.0
+
+# Marcas diacríticas combinables que quedan al descomponer con NFD
+_DIACRITICOS = re.compile('[\u0300-\u036f]')
+
+_INSERTAR = f'INSERT INTO {TABLA} (rowid, titulo, contenido, slug) VALUES (%s, %s, %s, %s)'
+
+
+class Fuente(NamedTuple):
+    tipo: str
+    titulo: str
+    contenido: tuple
+    # Campo booleano que decide si el objeto aparece en la búsqueda pública
+    publicado: str | None
+    # Sin vista pública el objeto solo se busca desde el admin
+    vista: str | None
+    parametro: str = 'slug'
+
+
+# Modelos indexados (etiqueta app.Modelo). La posición de cada uno forma parte
+# del rowid del índice: no cambiar el orden sin reconstruirlo.
+INDEXADOS = {
+    'core.Evento': Fuente('evento', 'titulo', ('descripcion', 'lugar', 'direccion', 'ciudad', 'departamento'), None,
+                          'evento_detalle', 'evento_slug'),
+    'products.Product': Fuente('producto', 'name', ('description', 'authors'), 'is_available', 'products:product_detail'),
+    'products.Package': Fuente('paquete', 'name', ('description',), 'is_available', 'products:package_detail'),
+    'blog.BlogPost': Fuente('entrada', 'titulo', ('descripcion_breve', 'contenido'), 'esta_publicado', 'blog:detalle_post'),
+    'core.Cuori': Fuente('cuori', 'nombre_completo', ('cedula', 'email_contacto', 'numero_contacto', 'numero_contacto_2'),
+                         None, None),
+}
+_ETIQUETAS = list(INDEXADOS)
+_FUENTES = list(INDEXADOS.values())
+TIPOS = [fuente.tipo for fuente in _FUENTES if fuente.vista]
+# rowid = pk * _BLOQUE + publico * len(_ETIQUETAS) + índice del modelo
+_BLOQUE = 2 * len(_ETIQUETAS)
+
+
+def _rowid(indice, pk, publico):
+    return pk * _BLOQUE + int(publico) * len(_ETIQUETAS) + indice
+
+
+def _fila(indice, fuente, objeto):
+    contenido = ' '.join(strip_tags(getattr(objeto, campo) or '') for campo in fuente.contenido)
+    if fuente.vista is None:
+        return (_rowid(indice, objeto.pk, False), getattr(objeto, fuente.titulo), contenido, '')
+    publico = getattr(objeto, fuente.publicado) if fuente.publicado else True
+    return (_rowid(indice, objeto.pk, publico), getattr(objeto, fuente.titulo), contenido, objeto.slug)
+
+
+def _campos(fuente):
+    campos = ['pk', fuente.titulo, *fuente.contenido]
+    if fuente.vista:
+        campos.append('slug')
+    if fuente.publicado:
+        campos.append(fuente.publicado)
+    return campos
+
+
+def _conexion_lectura():
+    # El índice vive en la misma base de datos que los modelos indexados
+    return connections[router.db_for_read(apps_globales.get_model(_ETIQUETAS[0]))]
+
+
+def indexar(objetos, using=None):
+    """Agrega o actualiza en el índice los objetos (de uno de los modelos indexados)."""
+    objetos = list(objetos)
+    if not objetos:
+        return
+    modelo = type(objetos[0])
+    indice = _ETIQUETAS.index(modelo._meta.label)
+    filas = [_fila(indice, INDEXADOS[modelo._meta.label], objeto) for objeto in objetos]
+    using = using or router.db_for_write(modelo)
+    # FTS5 no tiene restricciones únicas: se borra la fila anterior
+    desindexar(modelo, [objeto.pk for objeto in objetos], using=using)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(_INSERTAR, filas)
+
+
+def desindexar(modelo, pks, using=None):
+    indice = _ETIQUETAS.index(modelo._meta.label)
+    with connections[using or router.db_for_write(modelo)].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLA} WHERE rowid IN (%s, %s)',
+            [(_rowid(indice, pk, False), _rowid(indice, pk, True)) for pk in pks],
+        )
+
+
+def reconstruir(apps=apps_globales, using=None, lote=2000):
+    """
+    Vacía el índice y vuelve a indexar todos los objetos. apps permite usarla
+    desde una migración con los modelos históricos.
+    """
+    using = using or router.db_for_write(apps.get_model(_ETIQUETAS[0]))
+    total = 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA}')
+        for indice, (etiqueta, fuente) in enumerate(INDEXADOS.items()):
+            objetos = apps.get_model(etiqueta)._default_manager.using(using).only(*_campos(fuente)).order_by()
+            filas = []
+            for objeto in objetos.iterator(chunk_size=lote):
+                filas.append(_fila(indice, fuente, objeto))
+                if len(filas) >= lote:
+                    cursor.executemany(_INSERTAR, filas)
+                    total += len(filas)
+                    filas = []
+            if filas:
+                cursor.executemany(_INSERTAR, filas)
+                total += len(filas)
+        # Une los segmentos del índice en uno solo
+        cursor.execute(f"INSERT INTO {TABLA} ({TABLA}) VALUES ('optimize')")
+    return total
+
+
+def _palabras(texto):
+    return re.findall(r'\w+', texto or '')[:MAXIMO_PALABRAS]
+
+
+def consulta(texto):
+    """
+    Expresión MATCH de FTS5 para el texto del usuario: todas las palabras,
+    cada una también como prefijo. None si no hay palabras.
+    """
+    palabras = _palabras(texto)
+    if not palabras:
+        return None
+    # Entre comillas para que FTS5 no interprete AND, OR, NEAR, etc.
+    return ' '.join(f'"{palabra}"*' if len(palabra) > 1 else f'"{palabra}"' for palabra in palabras)
+
+
+def _normalizar(texto):
+    """Como el tokenizador del índice: minúsculas y sin tildes."""
+    return _DIACRITICOS.sub('', unicodedata.normalize('NFD', texto.casefold()))
+
+
+def fragmento(contenido, palabras, largo=PALABRAS_FRAGMENTO):
+    """
+    Trozo de `largo` palabras del contenido desde poco antes de la primera
+    coincidencia, escapado y con las palabras buscadas dentro de <mark>.
+    """
+    texto = _normalizar(contenido)
+    if len(texto) != len(contenido):
+        # Las posiciones no coinciden (letras ya descompuestas, ß...): se
+        # resalta sin ignorar tildes
+        texto = contenido
+    # Prefijo de las palabras buscadas, o la palabra completa si es de una letra
+    patron = re.compile(r'\b(?:%s)' % '|'.join(
+        re.escape(buscada) + (r'\w*' if len(buscada) > 1 else r'\b') for buscada in map(_normalizar, palabras)
+    ), re.IGNORECASE)
+    resaltadas = {coincidencia.start() for coincidencia in patron.finditer(texto)}
+
+    tokens = list(re.finditer(r'\w+', texto))
+    if not tokens:
+        return ''
+    primera = bisect.bisect_left(tokens, min(resaltadas, default=0), key=lambda token: token.start())
+    desde = max(0, min(primera - 3, len(tokens) - largo))
+    partes = ['…' if desde else '']
+    posicion = tokens[desde].start()
+    for token in tokens[desde:desde + largo]:
+        inicio, fin = token.span()
+        partes.append(escape(contenido[posicion:inicio]))
+        palabra = escape(contenido[inicio:fin])
+        partes.append(f'<mark>{palabra}</mark>' if inicio in resaltadas else palabra)
+        posicion = fin
+    if desde + largo < len(tokens):
+        partes.append('…')
+    return mark_safe(''.join(partes))
+
+
+def buscar(texto, limite=20, tipos=None):
+    """
+    Objetos públicos que coinciden con el texto, del más relevante al menos:
+    lista de diccionarios con tipo, id, titulo, url y fragmento (HTML seguro).
+    """
+    expresion = consulta(texto)
+    indices = [i for i, fuente in enumerate(_FUENTES) if tipos is None or fuente.tipo in tipos]
+    if expresion is None or not indices:
+        return []
+    n = len(_ETIQUETAS)
+    publicos = ', '.join(str(n + indice) for indice in indices)
+    with _conexion_lectura().cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {TABLA} WHERE {TABLA} MATCH %s AND rowid %% {_BLOQUE} IN ({publicos}) '
+            f'ORDER BY bm25({TABLA}, {PESO_TITULO}, 1.0) LIMIT %s',
+            [expresion, limite],
+        )
+        rowids = [rowid for rowid, in cursor.fetchall()]
+        if not rowids:
+            return []
+        cursor.execute(
+            f'SELECT rowid, titulo, contenido, slug FROM {TABLA} WHERE rowid IN ({", ".join(["%s"] * len(rowids))})',
+            rowids,
+        )
+        textos = {rowid: resto for rowid, *resto in cursor.fetchall()}
+
+    palabras = _palabras(texto)
+    resultados = []
+    for rowid in rowids:
+        titulo, contenido, slug = textos[rowid]
+        pk, indice = rowid // _BLOQUE, rowid % n
+        fuente = _FUENTES[indice]
+        resultados.append({
+            'tipo': fuente.tipo,
+            'id': pk,
+            'titulo': titulo,
+            'url': reverse(fuente.vista, kwargs={fuente.parametro: slug}),
+            'fragmento': fragmento(contenido, palabras),
+        })
+    return resultados
+
+
+def ids_coincidentes(modelo, expresion):
+    """Subconsulta con los ids del modelo que coinciden con la expresión (incluye los no publicados)."""
+    return RawSQL(
+        f'SELECT rowid / {_BLOQUE} FROM {TABLA} WHERE {TABLA} MATCH %s AND rowid %% {len(_ETIQUETAS)} = %s',
+        (expresion, _ETIQUETAS.index(modelo._meta.label)),
+    )
+
+
+class BusquedaAdminMixin:
+    """
+    Busca en el changelist del admin (y en los autocomplete) con el índice de
+    texto completo. Los search_fields que el índice no cubre (como la
+    categoría de los productos) se siguen buscando como en el admin, y los
+    resultados de los dos se suman.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        expresion = consulta(search_term)
+        if expresion is None:
+            return super().get_search_results(request, queryset, search_term)
+        filtro = Q(pk__in=ids_coincidentes(self.model, expresion))
+        campos = campos_no_indexados(self.model, self.get_search_fields(request))
+        if campos:
+            filtro |= _filtro_admin(campos, search_term)
+        return queryset.filter(filtro), False
+
+
+def campos_no_indexados(modelo, search_fields):
+    """Los search_fields del admin que no están en el índice."""
+    fuente = INDEXADOS[modelo._meta.label]
+    indexados = {fuente.titulo, *fuente.contenido}
+    return [campo for campo in search_fields if campo.lstrip('^=@') not in indexados]
+
+
+_PREFIJOS_ADMIN = {'^': 'istartswith', '=': 'iexact', '@': 'search'}
+
+
+def _filtro_admin(campos, search_term):
+    """
+    El filtro de ModelAdmin.get_search_results sobre los campos: cada palabra
+    (o frase entre comillas) en alguno de ellos.
+    """
+    lookups = [
+        f'{campo[1:]}__{_PREFIJOS_ADMIN[campo[0]]}' if campo[0] in _PREFIJOS_ADMIN else f'{campo}__icontains'
+        for campo in campos
+    ]
+    filtro = Q()
+    for palabra in smart_split(search_term):
+        if palabra.startswith(('"', "'")) and palabra[0] == palabra[-1]:
+            palabra = unescape_string_literal(palabra)
+        filtro &= reduce(operator.or_, (Q(**{lookup: palabra}) for lookup in lookups))
+    return filtro
+
+
+def _indexar_al_guardar(sender, instance, using, update_fields=None, **kwargs):
+    # save(update_fields=...) que no toca campos indexados no cambia el índice
+    if update_fields is not None and not set(update_fields) & set(_campos(INDEXADOS[sender._meta.label])):
+        return
+    indexar([instance], using=using)
+
+
+def _desindexar_al_borrar(sender, instance, using, **kwargs):
+    desindexar(sender, [instance.pk], using=using)
+
+
+def conectar_senales():
+    for etiqueta in INDEXADOS:
+        modelo = apps_globales.get_model(etiqueta)
+        uid = f'busqueda:{etiqueta}'
+        post_save.connect(_indexar_al_guardar, sender=modelo, dispatch_uid=uid)
+        post_delete.connect(_desindexar_al_borrar, sender=modelo, dispatch_uid=uid)
@@ -0,0 +1,199 @@
+"""
+Caché de páginas completas para visitantes anónimos.
+
+Las vistas públicas se decoran con @cache_pagina('grupo', ...): la respuesta
+renderizada se guarda en la caché de Django por host, URL, parámetros e
+idioma, y se sirve sin tocar la base de datos mientras el contenido no cambie.
+Cada grupo reúne los modelos de los que dependen sus páginas; la clave de la
+página incluye la generación de esos modelos (ver core.generaciones), así que
+cualquier cambio en ellos deja de servir las páginas anteriores. Las
+generaciones, y con ellas las claves y los ETag de respuesta_condicional, salen
+de la caché compartida (ver CACHES en settings), así que todos los procesos
+responden igual a la misma página.
+
+No se usa la caché para usuarios autenticados, peticiones con mensajes
+pendientes ni respuestas que no sean un 200 sin cookies.
+
+Los dos decoradores aceptan también vistas asíncronas; en ese caso usan las
+llamadas asíncronas de la caché y ultima_modificacion debe ser una corrutina.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from django.utils.translation import get_language
+
+from . import enrutador, generaciones
+from .asincrono import cargar_usuario
+from .relacionados import GENERACION_RELACIONADOS
+
+# Modelos de los que dependen las páginas de cada grupo; las de detalle
+# muestran también el contenido relacionado
+MODELOS_POR_GRUPO = {
+    'eventos': ('core.Evento', 'core.Inscripcion', 'tags.Tag', GENERACION_RELACIONADOS),
+    'productos': ('products.Product', 'products.Package', 'tags.Tag', GENERACION_RELACIONADOS),
+    'blog': ('blog.BlogPost', 'tags.Tag', GENERACION_RELACIONADOS),
+}
+
+
+def _tiempo_cache():
+    return getattr(settings, 'CACHE_PAGINAS_TIEMPO', 60 * 10)
+
+
+def modelos_de(grupos):
+    modelos = {modelo for grupo in grupos for modelo in MODELOS_POR_GRUPO[grupo]}
+    if modelos and enrutador.lee_de_replica():
+        # Leída de una réplica en archivo: depende también de la última copia
+        modelos.add(enrutador.GENERACION_REPLICA)
+    return sorted(modelos)
+
+
+def _clave(request, generaciones_actuales):
+    parametros = urlencode(sorted(request.GET.lists()), doseq=True)
+    version = sorted(generaciones_actuales.items())
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{parametros}|{get_language()}|{version}'
+    return f'pagina:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def clave_pagina(request, grupos=()):
+    return _clave(request, generaciones.generaciones(*modelos_de(grupos)))
+
+
+async def aclave_pagina(request, grupos=()):
+    return _clave(request, await generaciones.ageneraciones(*modelos_de(grupos)))
+
+
+def _hay_mensajes(request):
+    # Los mensajes se muestran una sola vez en la página que los recibe
+    return bool(len(get_messages(request)))
+
+
+def se_puede_cachear(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    return not _hay_mensajes(request)
+
+
+async def ase_puede_cachear(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Carga la sesión de forma asíncrona antes de buscar mensajes en ella
+    usuario = await cargar_usuario(request)
+    if usuario is not None and usuario.is_authenticated:
+        return False
+    return not _hay_mensajes(request)
+
+
+def _respuesta_cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_pagina(*grupos):
+    """Cachea la vista para visitantes anónimos; grupos indica de qué contenido depende."""
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                if not await ase_puede_cachear(request):
+                    return await vista(request, *args, **kwargs)
+                clave = await aclave_pagina(request, grupos)
+                response = await cache.aget(clave)
+                if response is not None:
+                    return response
+                response = await vista(request, *args, **kwargs)
+                if _respuesta_cacheable(response):
+                    await cache.aset(clave, response, _tiempo_cache())
+                return response
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not se_puede_cachear(request):
+                return vista(request, *args, **kwargs)
+            clave = clave_pagina(request, grupos)
+            response = cache.get(clave)
+            if response is not None:
+                return response
+            response = vista(request, *args, **kwargs)
+            if _respuesta_cacheable(response):
+                cache.set(clave, response, _tiempo_cache())
+            return response
+        return envoltura
+    return decorador
+
+
+def respuesta_condicional(*grupos, ultima_modificacion=None):
+    """
+    Responde 304 Not Modified sin ejecutar la vista cuando el navegador ya
+    tiene la página. El ETag sale de las generaciones de los grupos (sin
+    consultas); ultima_modificacion(request, *args, **kwargs) devuelve el
+    datetime para Last-Modified y se guarda en caché hasta que cambie la
+    generación.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                await cargar_usuario(request)
+                if request.method not in ('GET', 'HEAD') or _hay_mensajes(request):
+                    return await vista(request, *args, **kwargs)
+                huella = (await aclave_pagina(request, grupos)).split(':', 1)[1]
+                timestamp = None
+                if ultima_modificacion is not None:
+                    clave = f'ultima_modificacion:{huella}'
+                    timestamp = await cache.aget(clave)
+                    if timestamp is None:
+                        timestamp = _timestamp(await ultima_modificacion(request, *args, **kwargs))
+                        await cache.aset(clave, timestamp, _tiempo_cache())
+                response = get_conditional_response(request, etag=quote_etag(huella), last_modified=timestamp or None)
+                if response is None:
+                    response = await vista(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return _con_validadores(response, huella, timestamp)
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _hay_mensajes(request):
+                return vista(request, *args, **kwargs)
+            huella = clave_pagina(request, grupos).split(':', 1)[1]
+            timestamp = None
+            if ultima_modificacion is not None:
+                clave = f'ultima_modificacion:{huella}'
+                timestamp = cache.get(clave)
+                if timestamp is None:
+                    timestamp = _timestamp(ultima_modificacion(request, *args, **kwargs))
+                    cache.set(clave, timestamp, _tiempo_cache())
+            response = get_conditional_response(request, etag=quote_etag(huella), last_modified=timestamp or None)
+            if response is None:
+                response = vista(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _con_validadores(response, huella, timestamp)
+        return envoltura
+    return decorador
+
+
+def _timestamp(fecha):
+    return int(fecha.timestamp()) if fecha else 0
+
+
+def _con_validadores(response, huella, timestamp):
+    response.setdefault('ETag', quote_etag(huella))
+    if timestamp:
+        response.setdefault('Last-Modified', http_date(timestamp))
+    return response
@@ -0,0 +1,23 @@
+"""Chequeos del sistema (manage.py check) para la configuración de producción."""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+CACHES_POR_PROCESO = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def cache_compartida(app_configs, **kwargs):
+    """
+    Con DB_PERFIL=produccion corren varios procesos: una caché por proceso
+    no ve los incrementos de generación de los demás y sirve páginas viejas.
+    """
+    if getattr(settings, 'DB_PERFIL', None) != 'produccion':
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in CACHES_POR_PROCESO:
+        return [Error(
+            f'La caché por defecto ({backend}) es por proceso y DB_PERFIL=produccion corre varios procesos.',
+            hint='Configure una caché compartida: CACHE_DIR (archivos) o CACHE_REDIS.',
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,131 @@
+"""
+Enrutador de base de datos con un alias de solo lectura para las páginas públicas.
+
+Si settings.DATABASES tiene el alias 'lectura' (ver DB_LECTURA en
+jts_project/basedatos.py), las consultas de las vistas decoradas con
+@solo_lectura (home, eventos, catálogo y blog) se hacen en esa conexión de
+solo lectura. Todo lo demás, incluidas las escrituras, la inscripción a
+eventos, el admin y el importador de productos, sigue en 'default'.
+
+Lectura de las propias escrituras: cuando una petición escribe,
+LecturaEscrituraMiddleware marca al navegador con una cookie y, mientras dure,
+sus peticiones leen de 'default' aunque la vista sea @solo_lectura, por si
+la réplica todavía no tiene los cambios. La sesión y los usuarios (apps
+sessions y auth) se leen siempre de 'default'.
+
+Una réplica en archivo (DB_LECTURA=/ruta) solo cambia cuando
+`manage.py actualizar_replica` la copia, que incrementa la generación
+GENERACION_REPLICA: las páginas cacheadas que se leyeron de la réplica
+incluyen esa generación en su clave (ver core.cache_paginas), así que la
+copia siguiente deja de servirlas aunque no haya habido otra escritura.
+"""
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALIAS_LECTURA = 'lectura'
+COOKIE_ESCRITURA = 'leer_primaria'
+# Generación (ver core.generaciones) de la última copia de la réplica
+GENERACION_REPLICA = 'lectura:replica'
+# Se leen de la primaria aunque la vista sea @solo_lectura: la sesión o el
+# usuario que se acaban de cambiar no pueden venir de una réplica atrasada
+APPS_PRIMARIA = {'auth', 'sessions'}
+
+_usar_lectura = ContextVar('usar_lectura', default=False)
+# Conjunto de la petición en curso al que se añaden los alias escritos
+_escrituras = ContextVar('escrituras', default=None)
+
+
+def lectura_configurada():
+    return ALIAS_LECTURA in connections
+
+
+def archivo_replica():
+    """
+    Ruta de la réplica si el alias de lectura es una copia aparte; None si no
+    hay alias o si es la misma base abierta en solo lectura (DB_LECTURA=ro).
+    """
+    if not lectura_configurada():
+        return None
+    # configuracion_lectura() abre la réplica como file:///ruta?mode=ro
+    replica = Path(unquote(urlsplit(connections[ALIAS_LECTURA].settings_dict['NAME']).path))
+    if replica.resolve() == Path(connections[DEFAULT_DB_ALIAS].settings_dict['NAME']).resolve():
+        return None
+    return replica
+
+
+def lee_de_replica():
+    """True si las consultas del contexto actual van a una réplica en archivo, que puede estar atrasada."""
+    return _usar_lectura.get() and archivo_replica() is not None
+
+
+def solo_lectura(vista):
+    """Hace que las consultas de la vista lean del alias de solo lectura."""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_asincrona(request, *args, **kwargs):
+            if COOKIE_ESCRITURA in request.COOKIES:
+                return await vista(request, *args, **kwargs)
+            # El ORM asíncrono copia el contexto al hilo donde consulta
+            token = _usar_lectura.set(True)
+            try:
+                return await vista(request, *args, **kwargs)
+            finally:
+                _usar_lectura.reset(token)
+        return envoltura_asincrona
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if COOKIE_ESCRITURA in request.COOKIES:
+            return vista(request, *args, **kwargs)
+        token = _usar_lectura.set(True)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            _usar_lectura.reset(token)
+    return envoltura
+
+
+def iniciar_peticion():
+    """Empieza a registrar las escrituras de la petición; devuelve (escrituras, token)."""
+    escrituras = set()
+    return escrituras, _escrituras.set(escrituras)
+
+
+def terminar_peticion(token):
+    _escrituras.reset(token)
+
+
+class EnrutadorLecturaEscritura:
+    def __init__(self):
+        self.alias_lectura = ALIAS_LECTURA if lectura_configurada() else None
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in APPS_PRIMARIA:
+            return None
+        if self.alias_lectura and _usar_lectura.get():
+            return self.alias_lectura
+        return None
+
+    def db_for_write(self, model, **hints):
+        escrituras = _escrituras.get()
+        if escrituras is not None:
+            escrituras.add(DEFAULT_DB_ALIAS)
+        # Explícito: una instancia leída de la réplica se guarda en la primaria
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos conexiones son la misma base de datos
+        alias = {DEFAULT_DB_ALIAS, ALIAS_LECTURA}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS_LECTURA:
+            return False
+        return None
@@ -0,0 +1,126 @@
+"""
+Registro de generaciones para invalidar la caché.
+
+Cada modelo tiene un contador en la caché que solo aumenta. Las claves de
+caché que dependen de un modelo incluyen su generación actual, así que
+incrementar el contador invalida de una vez todas esas entradas, sin tener
+que buscarlas ni borrarlas: las entradas viejas simplemente dejan de leerse
+y expiran solas.
+
+Las señales de los modelos (ver conectar_senales) incrementan la generación
+al confirmarse la transacción. Las operaciones masivas pueden envolverse en
+agrupar_incrementos() para incrementar cada generación una sola vez.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+# Modelos con generación propia (etiqueta app.Modelo)
+MODELOS = (
+    'core.Evento',
+    'core.Inscripcion',
+    'products.Product',
+    'products.Package',
+    'blog.BlogPost',
+    'tags.Tag',
+)
+
+_pendientes = ContextVar('generaciones_pendientes', default=None)
+
+
+def _clave(modelo):
+    return f'generacion:{modelo}'
+
+
+def _valor_inicial():
+    # Basado en el reloj para no repetir generaciones ya usadas si la caché
+    # pierde el contador
+    return time.time_ns() // 1000
+
+
+def generaciones(*modelos):
+    """Diccionario {modelo: generación actual}."""
+    claves = {modelo: _clave(modelo) for modelo in modelos}
+    valores = cache.get_many(claves.values())
+    resultado = {}
+    for modelo, clave in claves.items():
+        valor = valores.get(clave)
+        if valor is None:
+            cache.add(clave, _valor_inicial(), None)
+            valor = cache.get(clave)
+        resultado[modelo] = valor
+    return resultado
+
+
+async def ageneraciones(*modelos):
+    """generaciones() con las llamadas asíncronas de la caché, para las vistas asíncronas."""
+    claves = {modelo: _clave(modelo) for modelo in modelos}
+    valores = await cache.aget_many(claves.values())
+    resultado = {}
+    for modelo, clave in claves.items():
+        valor = valores.get(clave)
+        if valor is None:
+            await cache.aadd(clave, _valor_inicial(), None)
+            valor = await cache.aget(clave)
+        resultado[modelo] = valor
+    return resultado
+
+
+def _incrementar_ahora(modelos):
+    for modelo in modelos:
+        clave = _clave(modelo)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, _valor_inicial(), None)
+
+
+def incrementar(*modelos):
+    """Incrementa las generaciones de los modelos al confirmarse la transacción."""
+    pendientes = _pendientes.get()
+    if pendientes is not None:
+        pendientes.update(modelos)
+    else:
+        transaction.on_commit(lambda: _incrementar_ahora(modelos))
+
+
+@contextmanager
+def agrupar_incrementos():
+    """
+    Acumula los incrementos del bloque (por ejemplo, uno por fila desde las
+    señales) y aplica uno solo por modelo al salir.
+    """
+    if _pendientes.get() is not None:
+        yield
+        return
+    pendientes = set()
+    token = _pendientes.set(pendientes)
+    try:
+        yield
+    finally:
+        _pendientes.reset(token)
+    if pendientes:
+        transaction.on_commit(lambda: _incrementar_ahora(pendientes))
+
+
+def conectar_senales():
+    from django.apps import apps
+
+    for etiqueta in MODELOS:
+        modelo = apps.get_model(etiqueta)
+
+        def incrementar_modelo(sender, etiqueta=etiqueta, **kwargs):
+            # m2m_changed se envía antes y después de cada cambio
+            if kwargs.get('action') in (None, 'post_add', 'post_remove', 'post_clear'):
+                incrementar(etiqueta)
+
+        uid = f'generaciones:{etiqueta}'
+        post_save.connect(incrementar_modelo, sender=modelo, dispatch_uid=uid, weak=False)
+        post_delete.connect(incrementar_modelo, sender=modelo, dispatch_uid=uid, weak=False)
+        for campo in modelo._meta.many_to_many:
+            m2m_changed.connect(incrementar_modelo, sender=campo.remote_field.through,
+                                dispatch_uid=f'{uid}:{campo.name}', weak=False)
@@ -0,0 +1,130 @@
+"""
+Variantes responsivas de las imágenes subidas (productos, paquetes, eventos y
+entradas de blog).
+
+De cada imagen se generan copias de varios anchos en WebP (y AVIF si Pillow
+lo soporta), guardadas junto al original en una carpeta derivadas/. Se
+generan al confirmarse la transacción que guarda el modelo (ver
+conectar_senales) o, para las imágenes que
+ya existían, la primera vez que se muestran con la etiqueta
+{% imagen_responsiva %} (core/templatetags/image_tags.py).
+"""
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = (320, 640, 960, 1280)
+CARPETA_VARIANTES = 'derivadas'
+CALIDAD = {'avif': 55, 'webp': 80}
+
+# Campos de imagen con variantes, por modelo
+CAMPOS_IMAGEN = {
+    'core.Evento': 'imagen',
+    'products.Product': 'image',
+    'products.Package': 'image',
+    'blog.BlogPost': 'imagen_destacada',
+}
+
+
+def formatos():
+    """Formatos de las variantes, del más liviano al más compatible."""
+    configurados = getattr(settings, 'IMAGENES_FORMATOS', ('avif', 'webp'))
+    return [formato for formato in configurados if features.check(formato)]
+
+
+def nombre_variante(nombre, ancho, formato):
+    # Con la extensión del original: foto.png y foto.webp no comparten variantes
+    carpeta, archivo = posixpath.split(nombre)
+    return posixpath.join(carpeta, CARPETA_VARIANTES, f'{archivo}-{ancho}w.{formato}')
+
+
+def archivo(nombre):
+    """FieldFile del almacenamiento por defecto para un nombre guardado, p. ej. en la portada."""
+    return FieldFile(None, FileField(), nombre)
+
+
+def _clave(nombre):
+    # Sin reutilizar las entradas de imagen:, que apuntan a las variantes sin extensión
+    return f'variantes:{nombre}'
+
+
+def generar_variantes(imagen):
+    """
+    Genera las variantes que falten de la imagen (un FieldFile) y devuelve
+    {'ancho': .., 'alto': .., 'variantes': {formato: [(ancho, url), ...]}}.
+    """
+    storage = imagen.storage
+    with imagen.open('rb') as archivo:
+        original = ImageOps.exif_transpose(Image.open(archivo))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or original.mode in ('LA', 'PA') else 'RGB')
+
+    # No se amplían las imágenes pequeñas: el ancho original es la última variante
+    anchos = [ancho for ancho in ANCHOS if ancho < original.width] or [original.width]
+    if original.width < ANCHOS[-1] and original.width not in anchos:
+        anchos.append(original.width)
+
+    variantes = {}
+    for formato in formatos():
+        variantes[formato] = []
+        for ancho in anchos:
+            nombre = nombre_variante(imagen.name, ancho, formato)
+            if not storage.exists(nombre):
+                alto = round(original.height * ancho / original.width)
+                copia = original.resize((ancho, alto), Image.LANCZOS) if ancho != original.width else original
+                contenido = io.BytesIO()
+                copia.save(contenido, formato.upper(), quality=CALIDAD.get(formato, 80))
+                nombre = storage.save(nombre, ContentFile(contenido.getvalue()))
+            variantes[formato].append((ancho, storage.url(nombre)))
+
+    datos = {'ancho': original.width, 'alto': original.height, 'variantes': variantes}
+    cache.set(_clave(imagen.name), datos, None)
+    return datos
+
+
+def _generar(imagen):
+    try:
+        return generar_variantes(imagen)
+    except (OSError, ValueError) as e:
+        logger.warning('No se pudieron generar las variantes de %s: %s', imagen.name, e)
+        # Para no volver a intentarlo en cada página que muestra la imagen
+        cache.set(_clave(imagen.name), {}, 60 * 10)
+        return {}
+
+
+def variantes(imagen):
+    """Como generar_variantes(), pero consultando primero la caché; {} si la imagen no se puede leer."""
+    if not imagen:
+        return {}
+    datos = cache.get(_clave(imagen.name))
+    if datos is None:
+        datos = _generar(imagen)
+    return datos
+
+
+def conectar_senales():
+    from django.apps import apps
+
+    for etiqueta, campo in CAMPOS_IMAGEN.items():
+        def generar_al_guardar(sender, instance, campo=campo, update_fields=None, **kwargs):
+            imagen = getattr(instance, campo)
+            if not imagen or (update_fields is not None and campo not in update_fields):
+                return
+            # Fuera de la transacción, para no alargarla mientras Pillow codifica
+            # las variantes; se intenta aunque un intento anterior haya fallado
+            transaction.on_commit(lambda: _generar(imagen), robust=True)
+
+        post_save.connect(generar_al_guardar, sender=apps.get_model(etiqueta),
+                          dispatch_uid=f'imagenes:{etiqueta}', weak=False)
@@ -0,0 +1,140 @@
+"""
+Consultas cacheadas para la API de cédulas del formulario de inscripción.
+
+El formulario público consulta la cédula en cada cambio del campo, por lo que
+los datos de contacto del Cuori y los inscritos de cada evento se guardan en
+la caché de Django y se invalidan cuando cambian (ver core.signals).
+
+Las funciones con prefijo "a" usan el ORM y la caché asíncronos, para la
+vista asíncrona de la API.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Cuori, Evento, Inscripcion
+
+CAMPOS_CONTACTO = [
+    'nombre_completo',
+    'numero_contacto',
+    'numero_contacto_2',
+    'email_contacto',
+    'pais',
+    'departamento',
+    'ciudad',
+]
+
+TIEMPO_CACHE_CUORI = 60 * 5
+TIEMPO_CACHE_INSCRITOS = 60
+
+
+def _clave_cuori(cedula):
+    return f'cuori:{cedula}'
+
+
+def _clave_evento(evento_slug):
+    return f'evento_id:{evento_slug}'
+
+
+def _clave_inscritos(evento_id):
+    return f'inscritos:{evento_id}'
+
+
+def datos_contacto_cuori(cedula):
+    """
+    Devuelve un diccionario con los datos de contacto del Cuori, o un
+    diccionario vacío si no existe.
+    """
+    clave = _clave_cuori(cedula)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = Cuori.objects.filter(cedula=cedula).values('pk', *CAMPOS_CONTACTO).first() or {}
+        cache.set(clave, datos, TIEMPO_CACHE_CUORI)
+    return datos
+
+
+async def adatos_contacto_cuori(cedula):
+    clave = _clave_cuori(cedula)
+    datos = await cache.aget(clave)
+    if datos is None:
+        datos = await Cuori.objects.filter(cedula=cedula).values('pk', *CAMPOS_CONTACTO).afirst() or {}
+        await cache.aset(clave, datos, TIEMPO_CACHE_CUORI)
+    return datos
+
+
+async def aevento_id_por_slug(evento_slug):
+    clave = _clave_evento(evento_slug)
+    evento_id = await cache.aget(clave)
+    if evento_id is None:
+        evento_id = await Evento.objects.filter(slug=evento_slug).values_list('pk', flat=True).afirst()
+        if evento_id is None:
+            return None
+        await cache.aset(clave, evento_id, TIEMPO_CACHE_INSCRITOS)
+    return evento_id
+
+
+async def ainscritos_evento(evento_id):
+    """Conjunto de ids de los Cuoris inscritos en el evento."""
+    clave = _clave_inscritos(evento_id)
+    inscritos = await cache.aget(clave)
+    if inscritos is None:
+        inscritos = {
+            cuori_id async for cuori_id in Inscripcion.objects.filter(evento_id=evento_id).values_list('cuori_id', flat=True)
+        }
+        await cache.aset(clave, inscritos, TIEMPO_CACHE_INSCRITOS)
+    return inscritos
+
+
+def ip_cliente(request):
+    """
+    Dirección del cliente para el límite de consultas. Detrás del proxy inverso
+    REMOTE_ADDR es la del proxy: si la petición viene de uno de
+    settings.PROXIES_CONFIABLES, se usa la última dirección del encabezado
+    settings.ENCABEZADO_IP_CLIENTE que no sea de un proxy confiable (la que
+    agregó el proxy; las anteriores las puede inventar el cliente).
+    """
+    remota = request.META.get('REMOTE_ADDR', '')
+    proxies = set(getattr(settings, 'PROXIES_CONFIABLES', ()))
+    if remota not in proxies:
+        return remota
+    encabezado = request.META.get(getattr(settings, 'ENCABEZADO_IP_CLIENTE', 'HTTP_X_FORWARDED_FOR'), '')
+    for ip in reversed([parte.strip() for parte in encabezado.split(',')]):
+        if ip and ip not in proxies:
+            return ip
+    return remota
+
+
+async def aconsulta_permitida(ip):
+    """
+    Limita las consultas de cédulas por dirección IP (ver ip_cliente) en
+    ventanas de un minuto (settings.LIMITE_CONSULTAS_CEDULA, 60 por defecto;
+    None lo desactiva). El contador vive en la caché compartida, así que el
+    límite vale para todos los workers juntos.
+    """
+    limite = getattr(settings, 'LIMITE_CONSULTAS_CEDULA', 60)
+    if limite is None:
+        return True
+    clave = f'consultas_cedula:{ip}'
+    await cache.aadd(clave, 0, 60)
+    try:
+        consultas = await cache.aincr(clave)
+    except ValueError:
+        # La clave expiró entre aadd() y aincr()
+        return True
+    return consultas <= limite
+
+
+def _invalidar(claves):
+    claves = set(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def invalidar_cuori(*cedulas):
+    _invalidar(_clave_cuori(cedula) for cedula in cedulas)
+
+
+def invalidar_inscritos(*eventos_ids):
+    _invalidar(_clave_inscritos(evento_id) for evento_id in eventos_ids)
+
+
+def invalidar_evento(*eventos_slugs):
+    _invalidar(_clave_evento(evento_slug) for evento_slug in eventos_slugs)
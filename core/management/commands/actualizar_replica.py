@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import generaciones
+from core.enrutador import ALIAS_LECTURA, GENERACION_REPLICA, archivo_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base de datos principal al archivo réplica del alias de solo lectura '
+        '(DB_LECTURA=/ruta/replica.sqlite3) con la API de backup en línea de SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, default=1024,
+                            help='Páginas copiadas por paso; entre pasos la base principal queda libre para escribir')
+
+    def handle(self, *args, **options):
+        if ALIAS_LECTURA not in connections:
+            raise CommandError('No hay alias de solo lectura: defina DB_LECTURA con la ruta de la réplica.')
+        principal = connections[DEFAULT_DB_ALIAS]
+        replica = archivo_replica()
+        if replica is None:
+            raise CommandError('DB_LECTURA=ro lee de la misma base de datos: no hay réplica que actualizar.')
+
+        inicio = time.perf_counter()
+        principal.ensure_connection()
+        destino = sqlite3.connect(replica)
+        try:
+            principal.connection.backup(destino, pages=options['paginas'])
+        finally:
+            destino.close()
+        # Las páginas y la portada leídas de la copia anterior dejan de servirse
+        generaciones.incrementar(GENERACION_REPLICA)
+        self.stdout.write(self.style.SUCCESS(
+            f'Réplica actualizada: {replica} ({time.perf_counter() - inicio:.2f} s).'
+        ))
@@ -0,0 +1,124 @@
+import json
+import platform
+import subprocess
+import tempfile
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from core import benchmark
+from jts_project.pruebas import caches_temporales
+
+LINEA_BASE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+def version_codigo():
+    """Commit medido (con -dirty si hay cambios sin confirmar); None fuera de un repositorio git."""
+    try:
+        salida = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia (p50/p95/p99) y las peticiones por segundo de las vistas públicas '
+        'sobre una base de datos de prueba sembrada, y compara con la línea base guardada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones medidas por vista')
+        parser.add_argument('--calentamiento', type=int, default=5, help='Peticiones previas sin medir por vista')
+        parser.add_argument('--escala', type=float, default=1.0, help='Multiplicador de los volúmenes sembrados')
+        parser.add_argument('--vista', action='append', dest='vistas', help='Medir solo esta vista (se puede repetir)')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--linea-base', default=str(LINEA_BASE), help='Archivo JSON con la línea base')
+        parser.add_argument('--actualizar-linea-base', action='store_true', help='Guarda los resultados como nueva línea base')
+        parser.add_argument('--metrica', default='p95_ms', choices=['p50_ms', 'p95_ms', 'p99_ms', 'media_ms'])
+        parser.add_argument('--umbral', type=float, default=0.25, help='Regresión tolerada (0.25 = 25%%)')
+        parser.add_argument('--minimo-ms', type=float, default=1.0, help='Diferencia mínima en ms para contar como regresión')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        # Base de datos de prueba y caché temporal: nunca se tocan las reales
+        with tempfile.TemporaryDirectory() as carpeta_cache, override_settings(CACHES=caches_temporales(carpeta_cache)):
+            old_config = setup_databases(verbosity=verbosity, interactive=False)
+            try:
+                with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False, LIMITE_CONSULTAS_CEDULA=None,
+                                       METRICAS_VISTAS=False):
+                    cache.clear()
+                    self.stdout.write('Sembrando datos...')
+                    datos = benchmark.sembrar_datos(options['escala'])
+                    resultados = self.medir(datos, options)
+            finally:
+                teardown_databases(old_config, verbosity=verbosity)
+
+        informe = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'commit': version_codigo(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'plataforma': platform.platform(),
+                'base_de_datos': connection.vendor,
+                'peticiones': options['peticiones'],
+                'escala': options['escala'],
+            },
+            'vistas': resultados,
+        }
+        if options['salida']:
+            Path(options['salida']).write_text(json.dumps(informe, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        linea_base = Path(options['linea_base'])
+        if options['actualizar_linea_base']:
+            linea_base.parent.mkdir(parents=True, exist_ok=True)
+            linea_base.write_text(json.dumps(informe, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Línea base actualizada: {linea_base}'))
+            return
+
+        if not linea_base.exists():
+            self.stdout.write(self.style.WARNING(f'No hay línea base en {linea_base}; no se compara.'))
+            return
+
+        anteriores = json.loads(linea_base.read_text())['vistas']
+        regresiones = benchmark.comparar(
+            resultados, anteriores, metrica=options['metrica'],
+            umbral=options['umbral'], minimo_ms=options['minimo_ms'],
+        )
+        for nombre, anterior, actual in regresiones:
+            self.stdout.write(self.style.ERROR(
+                f"{nombre}: {options['metrica']} {anterior:.1f} ms -> {actual:.1f} ms"
+            ))
+        if regresiones:
+            raise CommandError(f'{len(regresiones)} vistas empeoraron más de {options["umbral"]:.0%}.')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base.'))
+
+    def medir(self, datos, options):
+        seleccion = options['vistas']
+        resultados = {}
+        self.stdout.write(f"{'vista':<38} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}")
+        for escenario in benchmark.escenarios(datos):
+            nombre = escenario[0]
+            if seleccion and nombre not in seleccion:
+                continue
+            try:
+                resultado = benchmark.medir(escenario, options['peticiones'], options['calentamiento'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            resultados[nombre] = resultado
+            self.stdout.write(
+                f"{nombre:<38} {resultado['p50_ms']:>8.2f} {resultado['p95_ms']:>8.2f} "
+                f"{resultado['p99_ms']:>8.2f} {resultado['peticiones_por_segundo']:>8.1f}"
+            )
+        return resultados
@@ -0,0 +1,106 @@
+import copy
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from core import benchmark
+from jts_project import basedatos
+from jts_project.pruebas import caches_temporales
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide lecturas y escrituras concurrentes sobre una base SQLite de prueba en archivo con cada '
+        'perfil de jts_project/basedatos.py (por defecto, todos) y compara el rendimiento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfil', action='append', dest='perfiles', choices=list(basedatos.PERFILES),
+                            help='Perfil a medir (se puede repetir)')
+        parser.add_argument('--lectores', type=int, default=8, help='Hilos lectores')
+        parser.add_argument('--escritores', type=int, default=4, help='Hilos escritores')
+        parser.add_argument('--duracion', type=float, default=5.0, help='Segundos de carga por perfil')
+        parser.add_argument('--escala', type=float, default=0.1, help='Multiplicador de los volúmenes sembrados')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_concurrencia solo compara perfiles de SQLite.')
+        perfiles = options['perfiles'] or list(basedatos.PERFILES)
+
+        # Las conexiones de todos los hilos comparten este diccionario, así que
+        # cambiarlo aquí cambia la configuración con que se abren
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        original = copy.deepcopy(settings_dict)
+        resultados = {}
+        try:
+            # Caché temporal: nunca se toca la compartida
+            with tempfile.TemporaryDirectory() as carpeta, override_settings(
+                DEBUG=False, CACHES=caches_temporales(Path(carpeta) / 'cache'),
+            ):
+                for perfil in perfiles:
+                    connections.close_all()
+                    self.aplicar_perfil(settings_dict, perfil, Path(carpeta) / f'{perfil}.sqlite3')
+                    # Base de datos de prueba en archivo: nunca se toca la base de datos real
+                    old_config = setup_databases(verbosity=0, interactive=False)
+                    try:
+                        cache.clear()
+                        self.stdout.write(f'[{perfil}] Sembrando datos...')
+                        datos = benchmark.sembrar_datos(options['escala'])
+                        connection.close()
+                        self.stdout.write(
+                            f"[{perfil}] {options['lectores']} lectores y {options['escritores']} escritores "
+                            f"durante {options['duracion']:g} s..."
+                        )
+                        resultados[perfil] = benchmark.medir_concurrencia(
+                            datos['evento'], lectores=options['lectores'],
+                            escritores=options['escritores'], duracion=options['duracion'],
+                        )
+                    finally:
+                        connections.close_all()
+                        teardown_databases(old_config, verbosity=0)
+        finally:
+            connections.close_all()
+            settings_dict.clear()
+            settings_dict.update(original)
+
+        self.mostrar(resultados)
+        if options['salida']:
+            informe = {
+                'lectores': options['lectores'],
+                'escritores': options['escritores'],
+                'duracion': options['duracion'],
+                'escala': options['escala'],
+                'perfiles': resultados,
+            }
+            Path(options['salida']).write_text(json.dumps(informe, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+    def aplicar_perfil(self, settings_dict, perfil, archivo):
+        configuracion = basedatos.configuracion_sqlite(settings_dict['NAME'], perfil)
+        settings_dict['OPTIONS'] = configuracion['OPTIONS']
+        settings_dict['CONN_MAX_AGE'] = configuracion.get('CONN_MAX_AGE', 0)
+        settings_dict['CONN_HEALTH_CHECKS'] = configuracion.get('CONN_HEALTH_CHECKS', False)
+        settings_dict['TEST'] = {**settings_dict.get('TEST', {}), 'NAME': str(archivo)}
+
+    def mostrar(self, resultados):
+        self.stdout.write('')
+        self.stdout.write(f"{'perfil':<12} {'operación':<11} {'ops/s':>9} {'errores':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for perfil, tipos in resultados.items():
+            for tipo, r in tipos.items():
+                p50 = '-' if r['p50_ms'] is None else f"{r['p50_ms']:.2f}"
+                p95 = '-' if r['p95_ms'] is None else f"{r['p95_ms']:.2f}"
+                self.stdout.write(f"{perfil:<12} {tipo:<11} {r['por_segundo']:>9.1f} {r['errores']:>8} {p50:>9} {p95:>9}")
+
+        if 'desarrollo' in resultados and 'produccion' in resultados:
+            self.stdout.write('')
+            for tipo in ('lecturas', 'escrituras'):
+                antes = resultados['desarrollo'][tipo]['por_segundo']
+                despues = resultados['produccion'][tipo]['por_segundo']
+                cambio = f'x{despues / antes:.2f}' if antes else 'sin operaciones en desarrollo'
+                self.stdout.write(f'{tipo}: {antes:.1f} -> {despues:.1f} ops/s ({cambio})')
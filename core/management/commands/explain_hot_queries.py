@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from blog.models import BlogPost
+from core.models import Cuori, Evento, Inscripcion
+from core.portada import inicio_mes_siguiente
+from products.models import Package, Product
+
+
+def hot_queries():
+    """
+    Consultas más frecuentes de las vistas públicas, como (nombre, queryset,
+    se permite recorrer la tabla completa). Las que listan todas las filas de
+    una tabla pequeña pueden recorrerla sin problema.
+    """
+    now = timezone.now()
+    return [
+        # core
+        ('home: próximo evento del mes', Evento.objects.filter(fecha__gte=now, fecha__lt=inicio_mes_siguiente(now)).order_by('fecha')[:1], False),
+        ('eventos_list', Evento.objects.order_by('fecha'), True),
+        ('evento_detalle', Evento.objects.filter(slug='retiro'), False),
+        ('get_inscripcion_data_by_cedula: Cuori', Cuori.objects.filter(cedula='1000000'), False),
+        ('get_inscripcion_data_by_cedula: inscritos', Inscripcion.objects.filter(evento_id=1).values_list('cuori_id', flat=True), False),
+        ('inscribir_evento: inscripción existente', Inscripcion.objects.filter(evento_id=1, cuori_id=1), False),
+        # products
+        ('categorized_product_list', Product.objects.filter(is_available=True, category__in=['libro', 'serie']).order_by('shuffle_key'), False),
+        ('categorized_product_list: paquetes', Package.objects.filter(is_available=True), True),
+        ('product_detail', Product.objects.filter(slug='libro', is_available=True), False),
+        ('product_detail: relacionados', Product.objects.filter(category='libro', is_available=True, shuffle_key__gte=1000).order_by('shuffle_key')[:4], False),
+        ('product_list por categoría', Product.objects.filter(category='libro', is_available=True).order_by('-created_at'), False),
+        ('package_detail', Package.objects.filter(slug='paquete', is_available=True), False),
+        # blog
+        ('blog_list', BlogPost.objects.filter(esta_publicado=True).order_by('-fecha_publicacion')[:10], False),
+        ('blog_detalle', BlogPost.objects.filter(slug='entrada', esta_publicado=True), False),
+        ('blog_detalle: relacionados', BlogPost.objects.filter(tipo_contenido='LECTURA', esta_publicado=True).exclude(slug='entrada')[:3], False),
+        ('blog_por_tipo', BlogPost.objects.filter(tipo_contenido='LECTURA', esta_publicado=True).order_by('-fecha_publicacion')[:10], False),
+    ]
+
+
+def full_scans(plan):
+    """Líneas del plan que recorren una tabla completa (SQLite y PostgreSQL)."""
+    flagged = []
+    for line in plan.splitlines():
+        detail = line.strip()
+        if 'Seq Scan' in detail:
+            flagged.append(detail)
+        elif 'SCAN ' in detail and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+            flagged.append(detail)
+    return flagged
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas más frecuentes y señala las que recorren tablas completas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Muestra el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Base de datos: {connection.vendor}')
+        problems = 0
+        for name, queryset, scan_allowed in hot_queries():
+            plan = queryset.explain()
+            scans = full_scans(plan)
+            if scans and not scan_allowed:
+                problems += 1
+                self.stdout.write(self.style.ERROR(f'[SCAN] {name}'))
+                for scan in scans:
+                    self.stdout.write(f'    {scan}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[OK]   {name}'))
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if problems:
+            raise CommandError(f'{problems} consultas recorren tablas completas.')
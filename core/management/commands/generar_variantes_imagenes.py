@@ -0,0 +1,22 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core import imagenes
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes responsivas (AVIF/WebP en varios anchos) de las imágenes ya subidas.'
+
+    def handle(self, *args, **options):
+        generadas = fallidas = 0
+        for etiqueta, campo in imagenes.CAMPOS_IMAGEN.items():
+            modelo = apps.get_model(etiqueta)
+            for objeto in modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True}).only(campo):
+                imagen = getattr(objeto, campo)
+                try:
+                    imagenes.generar_variantes(imagen)
+                    generadas += 1
+                except (OSError, ValueError) as e:
+                    fallidas += 1
+                    self.stderr.write(f'{imagen.name}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Variantes generadas para {generadas} imágenes ({fallidas} con errores).'))
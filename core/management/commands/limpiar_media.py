@@ -0,0 +1,62 @@
+import posixpath
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from core.imagenes import CARPETA_VARIANTES
+from core.storage import archivos
+
+
+class Command(BaseCommand):
+    help = (
+        'Lista (o borra con --borrar) los archivos de MEDIA_ROOT que no usa ningún modelo, '
+        'incluidas las variantes de imágenes cuyo original ya no existe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrar', action='store_true', help='Borra los archivos huérfanos en lugar de solo listarlos')
+        parser.add_argument('--gracia', type=int, default=60,
+                            help='Ignora los archivos modificados hace menos de estos minutos (subidas en curso)')
+
+    def referenciados(self):
+        nombres = set()
+        for modelo in apps.get_models():
+            campos = [campo.name for campo in modelo._meta.concrete_fields if isinstance(campo, models.FileField)]
+            for campo in campos:
+                nombres.update(
+                    modelo._default_manager.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+                    .values_list(campo, flat=True)
+                )
+        return nombres
+
+    def handle(self, *args, **options):
+        referenciados = self.referenciados()
+        limite = timezone.now() - timedelta(minutes=options['gracia'])
+
+        huerfanos = []
+        for nombre in archivos(default_storage):
+            if nombre in referenciados:
+                continue
+            carpeta, archivo = posixpath.split(nombre)
+            if posixpath.basename(carpeta) == CARPETA_VARIANTES:
+                # derivadas/<original con extensión>-<ancho>w.<formato>
+                original = posixpath.join(posixpath.dirname(carpeta), archivo.rsplit('-', 1)[0])
+                if original in referenciados:
+                    continue
+            if default_storage.get_modified_time(nombre) > limite:
+                continue
+            huerfanos.append(nombre)
+
+        total = 0
+        for nombre in huerfanos:
+            total += default_storage.size(nombre)
+            if options['borrar']:
+                default_storage.delete(nombre)
+            self.stdout.write(nombre)
+
+        accion = 'Borrados' if options['borrar'] else 'Huérfanos (usa --borrar para eliminarlos)'
+        self.stdout.write(self.style.SUCCESS(f'{accion}: {len(huerfanos)} archivos, {total / 1024 / 1024:.1f} MB.'))
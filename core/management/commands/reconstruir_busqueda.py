@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        'Vuelve a indexar en la tabla de búsqueda de texto completo todos los eventos, '
+        'productos, paquetes y entradas del blog.'
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            total = busqueda.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de búsqueda reconstruido: {total} objetos ({time.perf_counter() - inicio:.2f} s).'
+        ))
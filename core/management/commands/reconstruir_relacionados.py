@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import relacionados
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el contenido relacionado por etiquetas de todos los eventos, productos, '
+        'paquetes y entradas del blog, con los pesos actuales de las etiquetas.'
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            total = relacionados.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Relacionados recalculados: {total} filas ({time.perf_counter() - inicio:.2f} s).'
+        ))
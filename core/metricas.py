@@ -0,0 +1,162 @@
+"""
+Métricas por vista: consultas SQL, tiempo en base de datos y tiempo de
+renderizado de plantillas, agregadas en memoria por url_name.
+
+Las registra core.middleware.MetricasVistasMiddleware cuando
+settings.METRICAS_VISTAS está activo. Cada proceso guarda sus propias
+métricas; se consultan en /metricas/vistas/ (solo staff).
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.base import Template
+
+# Límites superiores de los buckets de los histogramas
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+MAX_DUPLICADAS = 10
+
+_NUMEROS = re.compile(r'\b\d+\b')
+_ESPACIOS = re.compile(r'\s+')
+
+_medicion_actual = ContextVar('medicion_vista', default=None)
+_lock = threading.Lock()
+_metricas = {}
+
+
+def huella_consulta(sql):
+    """SQL normalizado: mismos parámetros de posición, sin literales numéricos."""
+    return _ESPACIOS.sub(' ', _NUMEROS.sub('N', sql)).strip()
+
+
+class Medicion:
+    """Datos de una petición en curso."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db_ms = 0.0
+        self.plantillas_ms = 0.0
+        self.huellas = Counter()
+        self._profundidad_plantilla = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Se instala con connection.execute_wrapper()
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.huellas[huella_consulta(sql)] += 1
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def duplicadas(self):
+        return {huella: veces for huella, veces in self.huellas.items() if veces > 1}
+
+
+def iniciar_medicion():
+    medicion = Medicion()
+    return medicion, _medicion_actual.set(medicion)
+
+
+def terminar_medicion(token):
+    _medicion_actual.reset(token)
+
+
+def _bucket(valor, limites):
+    for limite in limites:
+        if valor <= limite:
+            return f'<={limite}'
+    return f'>{limites[-1]}'
+
+
+def registrar(url_name, medicion):
+    total_ms = medicion.total_ms
+    with _lock:
+        datos = _metricas.setdefault(url_name, {
+            'peticiones': 0,
+            'consultas_total': 0,
+            'consultas_max': 0,
+            'db_ms_total': 0.0,
+            'plantillas_ms_total': 0.0,
+            'total_ms_total': 0.0,
+            'total_ms_max': 0.0,
+            'histograma_consultas': Counter(),
+            'histograma_ms': Counter(),
+            'duplicadas': Counter(),
+        })
+        datos['peticiones'] += 1
+        datos['consultas_total'] += medicion.consultas
+        datos['consultas_max'] = max(datos['consultas_max'], medicion.consultas)
+        datos['db_ms_total'] += medicion.db_ms
+        datos['plantillas_ms_total'] += medicion.plantillas_ms
+        datos['total_ms_total'] += total_ms
+        datos['total_ms_max'] = max(datos['total_ms_max'], total_ms)
+        datos['histograma_consultas'][_bucket(medicion.consultas, BUCKETS_CONSULTAS)] += 1
+        datos['histograma_ms'][_bucket(total_ms, BUCKETS_MS)] += 1
+        datos['duplicadas'].update(medicion.duplicadas())
+
+
+def resumen():
+    """Métricas agregadas por url_name, listas para serializar como JSON."""
+    with _lock:
+        vistas = {}
+        for url_name, datos in sorted(_metricas.items()):
+            peticiones = datos['peticiones']
+            vistas[url_name] = {
+                'peticiones': peticiones,
+                'consultas_promedio': round(datos['consultas_total'] / peticiones, 2),
+                'consultas_max': datos['consultas_max'],
+                'db_ms_promedio': round(datos['db_ms_total'] / peticiones, 2),
+                'plantillas_ms_promedio': round(datos['plantillas_ms_total'] / peticiones, 2),
+                'total_ms_promedio': round(datos['total_ms_total'] / peticiones, 2),
+                'total_ms_max': round(datos['total_ms_max'], 2),
+                'histograma_consultas': dict(datos['histograma_consultas']),
+                'histograma_ms': dict(datos['histograma_ms']),
+                'consultas_duplicadas': [
+                    {'sql': huella, 'veces': veces}
+                    for huella, veces in datos['duplicadas'].most_common(MAX_DUPLICADAS)
+                ],
+            }
+        return vistas
+
+
+def reiniciar():
+    with _lock:
+        _metricas.clear()
+
+
+_render_original = None
+
+
+def medir_plantillas():
+    """
+    Envuelve Template.render para sumar el tiempo de renderizado a la petición
+    en curso. Solo se mide la plantilla exterior; las incluidas y las que
+    extiende se ejecutan dentro de ella.
+    """
+    global _render_original
+    if _render_original is not None:
+        return
+    _render_original = Template.render
+
+    def render(self, context):
+        medicion = _medicion_actual.get()
+        if medicion is None or medicion._profundidad_plantilla:
+            return _render_original(self, context)
+        medicion._profundidad_plantilla += 1
+        inicio = time.perf_counter()
+        try:
+            return _render_original(self, context)
+        finally:
+            medicion.plantillas_ms += (time.perf_counter() - inicio) * 1000
+            medicion._profundidad_plantilla -= 1
+
+    Template.render = render
@@ -0,0 +1,114 @@
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import enrutador, metricas
+
+
+class MetricasVistasMiddleware:
+    """
+    Mide las consultas SQL, el tiempo en base de datos y el de plantillas de
+    cada vista y los agrega por url_name (ver core.metricas). Se activa con
+    settings.METRICAS_VISTAS y añade la cabecera Server-Timing a la respuesta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_VISTAS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        metricas.medir_plantillas()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion, token = metricas.iniciar_medicion()
+        try:
+            with ExitStack() as stack:
+                self.envolver_conexiones(stack, medicion)
+                response = self.get_response(request)
+        finally:
+            metricas.terminar_medicion(token)
+        return self.registrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = metricas.iniciar_medicion()
+        # El ORM asíncrono consulta desde el hilo de sync_to_async de la
+        # petición: los wrappers se instalan en las conexiones de ese hilo
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.envolver_conexiones)(stack, medicion)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            metricas.terminar_medicion(token)
+        return self.registrar(request, response, medicion)
+
+    def envolver_conexiones(self, stack, medicion):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(medicion))
+
+    def registrar(self, request, response, medicion):
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            metricas.registrar(match.view_name, medicion)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicion.db_ms:.1f};desc="{medicion.consultas} consultas"',
+            f'tpl;dur={medicion.plantillas_ms:.1f}',
+            f'total;dur={medicion.total_ms:.1f}',
+        ])
+        return response
+
+
+class LecturaEscrituraMiddleware:
+    """
+    Marca con una cookie al navegador que acaba de escribir en la base de
+    datos, para que durante settings.LECTURA_PRIMARIA_TRAS_ESCRITURA segundos
+    sus páginas se lean de la base de datos primaria y no de la réplica (ver
+    core.enrutador). Solo se activa si existe el alias de solo lectura.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enrutador.lectura_configurada():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        escrituras, token = enrutador.iniciar_peticion()
+        try:
+            response = self.get_response(request)
+        finally:
+            enrutador.terminar_peticion(token)
+        return self.marcar(response, escrituras)
+
+    async def __acall__(self, request):
+        # El conjunto se comparte con el contexto que sync_to_async copia al hilo del ORM
+        escrituras, token = enrutador.iniciar_peticion()
+        try:
+            response = await self.get_response(request)
+        finally:
+            enrutador.terminar_peticion(token)
+        return self.marcar(response, escrituras)
+
+    def marcar(self, response, escrituras):
+        if escrituras:
+            response.set_cookie(
+                enrutador.COOKIE_ESCRITURA, '1', max_age=settings.LECTURA_PRIMARIA_TRAS_ESCRITURA,
+                httponly=True, samesite='Lax',
+            )
+        return response
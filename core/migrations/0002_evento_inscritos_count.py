@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def calcular_inscritos(apps, schema_editor):
+    Evento = apps.get_model('core', 'Evento')
+    for evento in Evento.objects.annotate(num_inscritos=Count('inscritos')):
+        Evento.objects.filter(pk=evento.pk).update(inscritos_count=evento.num_inscritos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='inscritos_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Inscritos'),
+        ),
+        migrations.RunPython(calcular_inscritos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_evento_inscritos_count'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha'], name='evento_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# Modelos indexados en esta versión del índice, en el orden que forma parte
+# del rowid: (app.Modelo, título, contenido, campo de publicado)
+INDEXADOS = [
+    ('core.Evento', 'titulo', ('descripcion', 'lugar', 'direccion', 'ciudad', 'departamento'), None),
+    ('products.Product', 'name', ('description', 'authors'), 'is_available'),
+    ('products.Package', 'name', ('description',), 'is_available'),
+    ('blog.BlogPost', 'titulo', ('descripcion_breve', 'contenido'), 'esta_publicado'),
+]
+# rowid = pk * BLOQUE + publico * len(INDEXADOS) + índice del modelo
+BLOQUE = 2 * len(INDEXADOS)
+
+
+def indexar_existentes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for indice, (etiqueta, titulo, contenido, publicado) in enumerate(INDEXADOS):
+            filas = []
+            for objeto in apps.get_model(etiqueta)._default_manager.using(schema_editor.connection.alias).iterator():
+                texto = ' '.join(strip_tags(getattr(objeto, campo) or '') for campo in contenido)
+                publico = getattr(objeto, publicado) if publicado else True
+                rowid = objeto.pk * BLOQUE + int(publico) * len(INDEXADOS) + indice
+                filas.append((rowid, getattr(objeto, titulo), texto, objeto.slug))
+            cursor.executemany(
+                'INSERT INTO core_busqueda (rowid, titulo, contenido, slug) VALUES (%s, %s, %s, %s)', filas,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_evento_updated_at'),
+        ('products', '0008_product_indexes'),
+        ('blog', '0003_blogpost_updated_at'),
+    ]
+
+    operations = [
+        # Índice de texto completo de core/busqueda.py. unicode61 con
+        # remove_diacritics 2 ignora tildes y mayúsculas al tokenizar.
+        migrations.RunSQL(
+            sql=(
+                "CREATE VIRTUAL TABLE core_busqueda USING fts5("
+                "titulo, contenido, slug UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            ),
+            reverse_sql='DROP TABLE core_busqueda',
+        ),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:56
+
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Cálculo inicial de core/relacionados.py en esta versión, copiado aquí para
+# que la migración no cambie con el módulo: Jaccard ponderado de las
+# etiquetas, MAXIMO por modelo de destino, comparando hasta CANDIDATOS
+# tomados primero de las etiquetas de más peso.
+MODELOS = ('core.Evento', 'products.Product', 'products.Package', 'blog.BlogPost')
+MAXIMO = 8
+CANDIDATOS = 4 * MAXIMO
+
+
+def calcular_existentes(apps, schema_editor):
+    using = schema_editor.connection.alias
+    etiquetas = defaultdict(set)
+    objetos = defaultdict(lambda: defaultdict(list))
+    usos = defaultdict(int)
+    for codigo, etiqueta in enumerate(MODELOS):
+        campo = apps.get_model(etiqueta)._meta.get_field('tags')
+        objeto, tag = f'{campo.m2m_field_name()}_id', f'{campo.m2m_reverse_field_name()}_id'
+        filas = campo.remote_field.through._default_manager.using(using).values_list(objeto, tag).order_by(objeto)
+        for pk, tag_id in filas.iterator():
+            etiquetas[(codigo, pk)].add(tag_id)
+            objetos[tag_id][codigo].append(pk)
+            usos[tag_id] += 1
+    pesos = {tag_id: math.log(1 + len(etiquetas) / n) for tag_id, n in usos.items()}
+
+    def similitud(a, b):
+        comunes = sum(pesos[tag_id] for tag_id in a & b)
+        return comunes / sum(pesos[tag_id] for tag_id in a | b) if comunes else 0
+
+    def candidatos(clave, destino):
+        encontrados = set()
+        for tag_id in sorted(etiquetas[clave], key=lambda tag_id: (-pesos[tag_id], tag_id)):
+            for pk in objetos[tag_id].get(destino, ()):
+                if (destino, pk) != clave:
+                    encontrados.add(pk)
+                    if len(encontrados) >= CANDIDATOS:
+                        return encontrados
+        return encontrados
+
+    Relacionado = apps.get_model('core', 'Relacionado')
+    relacionados = []
+    for clave, propias in etiquetas.items():
+        for destino in range(len(MODELOS)):
+            puntajes = ((similitud(propias, etiquetas[(destino, pk)]), -pk) for pk in candidatos(clave, destino))
+            for puntaje, menos_pk in heapq.nlargest(MAXIMO, puntajes):
+                relacionados.append(Relacionado(
+                    origen_tipo=clave[0], origen_id=clave[1], destino_tipo=destino, destino_id=-menos_pk,
+                    puntaje=puntaje,
+                ))
+    Relacionado._default_manager.using(using).bulk_create(relacionados, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_busqueda'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen_tipo', models.PositiveSmallIntegerField(choices=[(0, 'Evento'), (1, 'Producto'), (2, 'Paquete'), (3, 'Entrada del blog')])),
+                ('origen_id', models.PositiveBigIntegerField()),
+                ('destino_tipo', models.PositiveSmallIntegerField(choices=[(0, 'Evento'), (1, 'Producto'), (2, 'Paquete'), (3, 'Entrada del blog')])),
+                ('destino_id', models.PositiveBigIntegerField()),
+                ('puntaje', models.FloatField(verbose_name='Similitud')),
+            ],
+            options={
+                'verbose_name': 'Relacionado',
+                'verbose_name_plural': 'Relacionados',
+                'indexes': [models.Index(fields=['destino_tipo', 'destino_id'], name='relacionado_destino_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origen_tipo', 'origen_id', 'destino_tipo', 'destino_id'), name='relacionado_unico')],
+            },
+        ),
+        migrations.RunPython(calcular_existentes, migrations.RunPython.noop),
+    ]
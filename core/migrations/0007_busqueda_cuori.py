@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# Los Cuoris entran al índice (solo para el admin). Con un modelo más cambia
+# el rowid de todas las filas, así que el índice se rehace completo.
+# (app.Modelo, título, contenido, campo de publicado, tiene vista pública)
+INDEXADOS = [
+    ('core.Evento', 'titulo', ('descripcion', 'lugar', 'direccion', 'ciudad', 'departamento'), None, True),
+    ('products.Product', 'name', ('description', 'authors'), 'is_available', True),
+    ('products.Package', 'name', ('description',), 'is_available', True),
+    ('blog.BlogPost', 'titulo', ('descripcion_breve', 'contenido'), 'esta_publicado', True),
+    ('core.Cuori', 'nombre_completo', ('cedula', 'email_contacto', 'numero_contacto', 'numero_contacto_2'), None, False),
+]
+# rowid = pk * BLOQUE + publico * len(INDEXADOS) + índice del modelo
+BLOQUE = 2 * len(INDEXADOS)
+
+
+def reindexar(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DELETE FROM core_busqueda')
+        for indice, (etiqueta, titulo, contenido, publicado, vista) in enumerate(INDEXADOS):
+            filas = []
+            for objeto in apps.get_model(etiqueta)._default_manager.using(schema_editor.connection.alias).iterator():
+                texto = ' '.join(strip_tags(getattr(objeto, campo) or '') for campo in contenido)
+                publico = vista and (getattr(objeto, publicado) if publicado else True)
+                rowid = objeto.pk * BLOQUE + int(publico) * len(INDEXADOS) + indice
+                filas.append((rowid, getattr(objeto, titulo), texto, objeto.slug if vista else ''))
+            cursor.executemany(
+                'INSERT INTO core_busqueda (rowid, titulo, contenido, slug) VALUES (%s, %s, %s, %s)', filas,
+            )
+        cursor.execute("INSERT INTO core_busqueda (core_busqueda) VALUES ('optimize')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_relacionado'),
+    ]
+
+    operations = [
+        # Al revertir, `manage.py reconstruir_busqueda` con el código anterior rehace el índice
+        migrations.RunPython(reindexar, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils.text import slugify
 from tags.models import Tag
 
@@ -46,6 +47,8 @@ class Evento(models.Model):
     ]
 
     cupos = models.PositiveIntegerField(default=0, verbose_name="Cupos")
+    # Contador de inscritos usado para reservar cupos de forma atómica (ver core.services)
+    inscritos_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Inscritos")
     tipo_asistencia = models.CharField(max_length=10, choices=ASISTENCIA_CHOICES, default='LIMITADO', verbose_name="Tipo de Asistencia")
     dirigido_a = models.CharField(max_length=10, choices=PUBLICO_CHOICES, default='TODOS', verbose_name="Dirigido a")
     coordenadas_mapa = models.CharField(max_length=100, blank=True, verbose_name="Coordenadas de Mapa (Latitud, Longitud)")
@@ -55,6 +58,8 @@ class Evento(models.Model):
     valor_ofrenda = models.IntegerField(null=True, blank=True, verbose_name="Valor de la Ofrenda en COP$")
     requiere_inscripcion = models.BooleanField(default=True, verbose_name="¿Requiere Inscripción?")
     tags = models.ManyToManyField(Tag, blank=True, verbose_name="Etiquetas")
+    # También cambia con cada inscripción (ver core.services), para Last-Modified
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
 
     def __str__(self):
         return self.titulo
@@ -64,14 +69,21 @@ class Evento(models.Model):
             self.slug = slugify(self.titulo)
         super().save(*args, **kwargs)
 
+    def get_absolute_url(self):
+        return reverse('evento_detalle', kwargs={'evento_slug': self.slug})
+
     @property
     def cupos_disponibles(self):
-        return self.cupos - self.inscritos.count()
+        # Del contador guardado, sin contar las inscripciones
+        return self.cupos - self.inscritos_count
 
     class Meta:
         verbose_name = "Evento"
         verbose_name_plural = "Eventos"
         ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['fecha'], name='evento_fecha_idx'),
+        ]
 
 # Modelo para las Inscripciones a los eventos
 class Inscripcion(models.Model):
@@ -86,3 +98,35 @@ class Inscripcion(models.Model):
         verbose_name = "Inscripción"
         verbose_name_plural = "Inscripciones"
         unique_together = ('evento', 'cuori')
+
+# Contenido relacionado por etiquetas, precalculado por core/relacionados.py
+class Relacionado(models.Model):
+    # Los códigos siguen el orden de core.relacionados.MODELOS
+    TIPO_CHOICES = [
+        (0, 'Evento'),
+        (1, 'Producto'),
+        (2, 'Paquete'),
+        (3, 'Entrada del blog'),
+    ]
+
+    origen_tipo = models.PositiveSmallIntegerField(choices=TIPO_CHOICES)
+    origen_id = models.PositiveBigIntegerField()
+    destino_tipo = models.PositiveSmallIntegerField(choices=TIPO_CHOICES)
+    destino_id = models.PositiveBigIntegerField()
+    puntaje = models.FloatField(verbose_name="Similitud")
+
+    def __str__(self):
+        return f"{self.get_origen_tipo_display()} {self.origen_id} → {self.get_destino_tipo_display()} {self.destino_id}"
+
+    class Meta:
+        verbose_name = "Relacionado"
+        verbose_name_plural = "Relacionados"
+        constraints = [
+            # También es el índice de la lectura de las vistas de detalle
+            models.UniqueConstraint(fields=['origen_tipo', 'origen_id', 'destino_tipo', 'destino_id'],
+                                    name='relacionado_unico'),
+        ]
+        indexes = [
+            # Para actualizar las listas que contienen un objeto borrado
+            models.Index(fields=['destino_tipo', 'destino_id'], name='relacionado_destino_idx'),
+        ]
@@ -0,0 +1,136 @@
+"""
+Instantánea de la página de inicio.
+
+La portada muestra el próximo evento del mes, las entradas del blog, los
+productos y los paquetes que comparten sus etiquetas (ver core.relacionados)
+y algunos conteos. Todo eso se calcula una vez con construir() y se guarda en
+la caché, así que la vista home la lee sin tocar la base de datos.
+
+Como las páginas de cache_paginas, la clave incluye las generaciones de los
+modelos de los que depende: una escritura la cambia y la instantánea vieja
+deja de leerse, aunque se haya guardado después de la escritura. Además vence
+cuando empieza el evento mostrado o cuando cambia el mes; la siguiente visita
+la vuelve a construir.
+
+Se guardan solo valores simples (textos, fechas y nombres de archivo), no
+instancias de los modelos, para que un cambio en los modelos no impida leer
+las instantáneas ya guardadas.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from blog.models import BlogPost
+from products.models import Package, Product
+
+from . import enrutador, generaciones
+from .models import Evento
+from .relacionados import GENERACION_RELACIONADOS, relacionados
+
+MODELOS = ('core.Evento', 'core.Inscripcion', 'products.Product', 'products.Package', 'blog.BlogPost', 'tags.Tag')
+ENTRADAS = 6
+PRODUCTOS = 4
+PAQUETES = 3
+
+
+def inicio_mes_siguiente(fecha):
+    """Primer instante del mes siguiente a la fecha, en la zona horaria actual."""
+    fecha = timezone.localtime(fecha)
+    if fecha.month == 12:
+        return fecha.replace(year=fecha.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return fecha.replace(month=fecha.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _tiempo_maximo():
+    # Las instantáneas con generaciones viejas no se borran: expiran solas
+    return getattr(settings, 'CACHE_PAGINAS_TIEMPO', 60 * 10)
+
+
+def clave():
+    """Clave de la instantánea con las generaciones actuales."""
+    modelos = MODELOS + (GENERACION_RELACIONADOS,)
+    if enrutador.lee_de_replica():
+        # La copia de la réplica también la renueva: se pudo construir con datos atrasados
+        modelos += (enrutador.GENERACION_REPLICA,)
+    version = sorted(generaciones.generaciones(*modelos).items())
+    return f'portada:{hashlib.md5(str(version).encode()).hexdigest()}'
+
+
+def _evento(evento):
+    return {
+        'titulo': evento.titulo,
+        'slug': evento.slug,
+        'fecha': evento.fecha,
+        'lugar': evento.lugar,
+        'descripcion': evento.descripcion,
+    }
+
+
+def _entrada(entrada):
+    return {
+        'titulo': entrada.titulo,
+        'slug': entrada.slug,
+        'descripcion_breve': entrada.descripcion_breve,
+        'tipo_contenido': entrada.get_tipo_contenido_display(),
+        'imagen': entrada.imagen_destacada.name,
+    }
+
+
+def _producto(producto):
+    return {'name': producto.name, 'slug': producto.slug, 'category': producto.get_category_display()}
+
+
+def _paquete(paquete):
+    return {'name': paquete.name, 'slug': paquete.slug}
+
+
+def construir(ahora=None):
+    """Calcula la instantánea de la portada (un diccionario que se puede guardar en la caché)."""
+    ahora = ahora or timezone.now()
+    fin_mes = inicio_mes_siguiente(ahora)
+    # Rango de fechas en lugar de fecha__year/fecha__month para usar el índice de fecha
+    del_mes = Evento.objects.filter(fecha__gte=ahora, fecha__lt=fin_mes)
+    evento = del_mes.order_by('fecha').first()
+
+    publicadas = BlogPost.objects.filter(esta_publicado=True)
+    entradas, productos, paquetes = [], [], []
+    if evento is not None:
+        entradas = list(relacionados(evento, BlogPost).filter(esta_publicado=True)[:ENTRADAS])
+        productos = list(relacionados(evento, Product).filter(is_available=True)[:PRODUCTOS])
+        paquetes = list(relacionados(evento, Package).filter(is_available=True)[:PAQUETES])
+    if len(entradas) < ENTRADAS:
+        # Sin evento o sin suficientes entradas con sus etiquetas: las últimas publicadas
+        entradas += publicadas.exclude(pk__in=[entrada.pk for entrada in entradas]).order_by(
+            '-fecha_publicacion',
+        )[:ENTRADAS - len(entradas)]
+
+    return {
+        'evento': _evento(evento) if evento is not None else None,
+        'entradas': [_entrada(entrada) for entrada in entradas],
+        'productos': [_producto(producto) for producto in productos],
+        'paquetes': [_paquete(paquete) for paquete in paquetes],
+        'conteos': {
+            'eventos_mes': del_mes.count(),
+            'entradas': publicadas.count(),
+            'productos': Product.objects.filter(is_available=True).count(),
+            'paquetes': Package.objects.filter(is_available=True).count(),
+        },
+        # Cuando empieza el evento deja de ser el próximo
+        'vence': min(fin_mes, evento.fecha) if evento is not None else fin_mes,
+    }
+
+
+def instantanea():
+    """La instantánea guardada en la caché, construyéndola si no está o ya venció."""
+    # Las generaciones se leen antes de construir: si una escritura se confirma
+    # mientras tanto, la instantánea queda con la clave vieja y no se vuelve a leer
+    clave_actual = clave()
+    datos = cache.get(clave_actual)
+    ahora = timezone.now()
+    if datos is None or datos['vence'] <= ahora:
+        datos = construir(ahora)
+        segundos = (datos['vence'] - ahora).total_seconds()
+        cache.set(clave_actual, datos, max(1, min(_tiempo_maximo(), int(segundos))))
+    return datos
@@ -0,0 +1,343 @@
+"""
+Contenido relacionado por etiquetas, precalculado.
+
+Para cada evento, producto, paquete y entrada del blog se guardan en la tabla
+Relacionado los MAXIMO objetos más parecidos de cada uno de esos modelos. La
+similitud es el Jaccard ponderado de sus etiquetas: la suma de los pesos de
+las etiquetas en común sobre la suma de los pesos de todas las etiquetas de
+los dos. Cada etiqueta pesa log(1 + objetos etiquetados / objetos con esa
+etiqueta), así que compartir una etiqueta poco usada cuenta más que compartir
+una que tiene casi todo.
+
+Para no comparar cada objeto con todos los que comparten una etiqueta muy
+usada, los candidatos de cada modelo se toman primero de las etiquetas de más
+peso, hasta CANDIDATOS (y, dentro de una etiqueta, los más antiguos primero);
+la similitud de cada candidato sí se calcula con todas sus etiquetas.
+
+Las vistas de detalle leen los relacionados con relacionados() en una consulta
+por índice. Las señales (ver conectar_senales) actualizan las listas cuando
+cambian las etiquetas de un objeto: se recalcula la del objeto, las que ya lo
+incluían y las de los vecinos (objetos con alguna de las etiquetas tocadas) en
+las que ahora entra. Como en los candidatos, de una etiqueta muy usada solo se
+revisan los vecinos más antiguos. Los pesos también cambian un poco con cada
+etiqueta asignada; `manage.py reconstruir_relacionados` recalcula todo con los
+pesos actuales. Como la reconstrucción no pasa por las señales de los modelos,
+incrementa su propia generación (GENERACION_RELACIONADOS), de la que dependen
+las páginas cacheadas que muestran relacionados (ver core.cache_paginas).
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.apps import apps as apps_globales
+from django.db import router
+from django.db.models import Count, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+
+from . import generaciones
+
+# El orden define los códigos de Relacionado.TIPO_CHOICES
+MODELOS = ('core.Evento', 'products.Product', 'products.Package', 'blog.BlogPost')
+# Relacionados guardados por objeto y modelo de destino
+MAXIMO = 8
+# Candidatos comparados por objeto y modelo de destino
+CANDIDATOS = 4 * MAXIMO
+# Generación que incrementa reconstruir()
+GENERACION_RELACIONADOS = 'relacionados:reconstruccion'
+
+
+def _codigo(modelo):
+    return MODELOS.index(modelo._meta.label)
+
+
+def _campos_through(modelo):
+    """Through de modelo.tags y los nombres de sus columnas del objeto y de la etiqueta."""
+    campo = modelo._meta.get_field('tags')
+    return campo.remote_field.through, f'{campo.m2m_field_name()}_id', f'{campo.m2m_reverse_field_name()}_id'
+
+
+class _Etiquetado:
+    """Etiquetas de un conjunto de objetos, por objeto y por etiqueta."""
+
+    def __init__(self):
+        # (código, pk) -> etiquetas
+        self.etiquetas = defaultdict(set)
+        # etiqueta -> código -> pks en orden
+        self.objetos = defaultdict(lambda: defaultdict(list))
+
+    @classmethod
+    def cargar(cls, apps, using, etiquetas=None, limite=None, claves=()):
+        """
+        Los objetos con alguna de las etiquetas (todos si es None), con todas
+        sus etiquetas. Con `limite`, de cada etiqueta solo los `limite` más
+        antiguos de cada modelo, que son los únicos que candidatos() puede
+        tomar; las claves (código, pk) se cargan siempre.
+        """
+        etiquetado = cls()
+        incluir = _por_tipo(claves)
+        for codigo, etiqueta in enumerate(MODELOS):
+            through, objeto, tag = _campos_through(apps.get_model(etiqueta))
+            filas = through._default_manager.using(using)
+            if etiquetas is not None:
+                seleccion = filas.filter(**{f'{tag}__in': etiquetas})
+                if limite is not None:
+                    seleccion = seleccion.annotate(orden=Window(
+                        RowNumber(), partition_by=F(tag), order_by=F(objeto).asc(),
+                    )).filter(orden__lte=limite)
+                filas = filas.filter(
+                    Q(**{f'{objeto}__in': Subquery(seleccion.values(objeto))})
+                    | Q(**{f'{objeto}__in': incluir.get(codigo, ())})
+                )
+            for pk, tag_id in filas.values_list(objeto, tag).order_by(objeto).iterator():
+                etiquetado.etiquetas[(codigo, pk)].add(tag_id)
+                etiquetado.objetos[tag_id][codigo].append(pk)
+        return etiquetado
+
+    def vecinos(self, clave, etiquetas):
+        """Objetos que comparten con `clave` alguna de las etiquetas."""
+        vecinos = set()
+        for tag_id in etiquetas:
+            for codigo, pks in self.objetos.get(tag_id, {}).items():
+                vecinos.update((codigo, pk) for pk in pks)
+        vecinos.discard(clave)
+        return vecinos
+
+    def candidatos(self, clave, destino, pesos):
+        """Hasta CANDIDATOS objetos del modelo destino, empezando por las etiquetas de más peso."""
+        candidatos = set()
+        for tag_id in sorted(self.etiquetas[clave], key=lambda tag_id: (-pesos.get(tag_id, 0), tag_id)):
+            for pk in self.objetos.get(tag_id, {}).get(destino, ()):
+                if (destino, pk) != clave:
+                    candidatos.add(pk)
+                    if len(candidatos) >= CANDIDATOS:
+                        return candidatos
+        return candidatos
+
+
+def _pesos(apps, using):
+    """Peso de cada etiqueta según cuántos objetos la tienen."""
+    usos = defaultdict(int)
+    etiquetados = 0
+    for etiqueta in MODELOS:
+        through, objeto, tag = _campos_through(apps.get_model(etiqueta))
+        filas = through._default_manager.using(using)
+        for tag_id, n in filas.values_list(tag).annotate(n=Count('*')).order_by():
+            usos[tag_id] += n
+        etiquetados += filas.aggregate(n=Count(objeto, distinct=True))['n']
+    return {tag_id: math.log(1 + etiquetados / n) for tag_id, n in usos.items()}
+
+
+def _similitud(a, b, pesos):
+    comunes = sum(pesos.get(tag_id, 0) for tag_id in a & b)
+    if not comunes:
+        return 0
+    return comunes / sum(pesos.get(tag_id, 0) for tag_id in a | b)
+
+
+def _mejores(clave, etiquetado, pesos, destinos):
+    """Filas de Relacionado de `clave` para los modelos de destino indicados (códigos)."""
+    etiquetas = etiquetado.etiquetas[clave]
+    filas = []
+    for destino in destinos:
+        puntajes = (
+            (_similitud(etiquetas, etiquetado.etiquetas[(destino, pk)], pesos), -pk)
+            for pk in etiquetado.candidatos(clave, destino, pesos)
+        )
+        # Empates: primero el objeto más antiguo
+        for puntaje, menos_pk in heapq.nlargest(MAXIMO, puntajes):
+            filas.append((clave[0], clave[1], destino, -menos_pk, puntaje))
+    return filas
+
+
+def _por_tipo(claves):
+    por_tipo = defaultdict(set)
+    for codigo, pk in claves:
+        por_tipo[codigo].add(pk)
+    return por_tipo
+
+
+def _crear(Relacionado, using, filas):
+    Relacionado._default_manager.using(using).bulk_create([
+        Relacionado(origen_tipo=origen_tipo, origen_id=origen_id, destino_tipo=destino_tipo,
+                    destino_id=destino_id, puntaje=puntaje)
+        for origen_tipo, origen_id, destino_tipo, destino_id, puntaje in filas
+    ], batch_size=1000)
+
+
+def _guardar(using, claves, destinos, filas):
+    """Reemplaza las listas de las claves para los destinos por las filas."""
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    for codigo, pks in _por_tipo(claves).items():
+        Relacionado.objects.using(using).filter(
+            origen_tipo=codigo, origen_id__in=pks, destino_tipo__in=destinos,
+        ).delete()
+    _crear(Relacionado, using, filas)
+
+
+def reconstruir(apps=apps_globales, using=None):
+    """
+    Recalcula todas las listas. apps permite usarla desde una migración con
+    los modelos históricos. Devuelve el número de filas guardadas.
+    """
+    Relacionado = apps.get_model('core.Relacionado')
+    using = using or router.db_for_write(Relacionado)
+    etiquetado = _Etiquetado.cargar(apps, using)
+    pesos = _pesos(apps, using)
+    destinos = set(range(len(MODELOS)))
+    filas = []
+    for clave in etiquetado.etiquetas:
+        filas.extend(_mejores(clave, etiquetado, pesos, destinos))
+    Relacionado._default_manager.using(using).all().delete()
+    _crear(Relacionado, using, filas)
+    generaciones.incrementar(GENERACION_RELACIONADOS)
+    return len(filas)
+
+
+def refrescar(modelo, pks, etiquetas, using=None):
+    """
+    Actualiza las listas después de que cambiaron las etiquetas de los objetos
+    `pks` del modelo; `etiquetas` son las que se agregaron o quitaron.
+    """
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    using = using or router.db_for_write(Relacionado)
+    codigo = _codigo(modelo)
+    origenes = {(codigo, pk) for pk in pks}
+    through, objeto, tag = _campos_through(modelo)
+    actuales = set(through._default_manager.using(using).filter(**{f'{objeto}__in': pks}).values_list(tag, flat=True))
+    tocadas = actuales | set(etiquetas)
+    etiquetado = _Etiquetado.cargar(apps_globales, using, tocadas, limite=CANDIDATOS + 1, claves=origenes)
+    pesos = _pesos(apps_globales, using)
+
+    # Las listas de los objetos que cambiaron, completas
+    todos = set(range(len(MODELOS)))
+    filas = [fila for clave in origenes for fila in _mejores(clave, etiquetado, pesos, todos)]
+    _guardar(using, origenes, todos, filas)
+
+    # Los vecinos solo cambian en su lista de objetos del modelo cambiado: se
+    # recalculan las listas que ya tenían a alguno de los objetos y, de los
+    # vecinos cargados por las etiquetas tocadas, aquellas en las que ahora
+    # entraría. En las etiquetas muy usadas solo se cargan los más antiguos; el
+    # resto se pone al día con reconstruir_relacionados.
+    recalcular = set(Relacionado.objects.using(using).filter(
+        destino_tipo=codigo, destino_id__in=pks,
+    ).values_list('origen_tipo', 'origen_id'))
+    vecinos = set()
+    for clave in origenes:
+        vecinos |= etiquetado.vecinos(clave, tocadas)
+    vecinos -= origenes | recalcular
+    listas = defaultdict(dict)
+    for vecino_tipo, vecino_pks in _por_tipo(vecinos).items():
+        for vecino_id, destino_id, puntaje in Relacionado.objects.using(using).filter(
+            origen_tipo=vecino_tipo, origen_id__in=vecino_pks, destino_tipo=codigo,
+        ).values_list('origen_id', 'destino_id', 'puntaje'):
+            listas[(vecino_tipo, vecino_id)][destino_id] = puntaje
+    for vecino in vecinos:
+        lista = listas.get(vecino, {})
+        minimo = min(lista.values(), default=0) if len(lista) >= MAXIMO else 0
+        if any(_similitud(etiquetado.etiquetas[vecino], etiquetado.etiquetas[clave], pesos) > minimo
+               for clave in origenes):
+            recalcular.add(vecino)
+    recalcular -= origenes
+    if recalcular:
+        refrescar_listas(recalcular, {codigo}, using=using, pesos=pesos)
+
+
+def refrescar_listas(claves, destinos, using=None, pesos=None):
+    """Recalcula las listas de los objetos (código, pk) para los modelos de destino (códigos)."""
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    using = using or router.db_for_write(Relacionado)
+    etiquetas = set()
+    for codigo, pks in _por_tipo(claves).items():
+        through, objeto, tag = _campos_through(apps_globales.get_model(MODELOS[codigo]))
+        etiquetas |= set(through._default_manager.using(using).filter(**{f'{objeto}__in': pks}).values_list(tag, flat=True))
+    etiquetado = _Etiquetado.cargar(apps_globales, using, etiquetas, limite=CANDIDATOS + 1, claves=claves)
+    pesos = pesos if pesos is not None else _pesos(apps_globales, using)
+    filas = [fila for clave in claves for fila in _mejores(clave, etiquetado, pesos, destinos)]
+    _guardar(using, claves, destinos, filas)
+
+
+def ids_relacionados(modelo_origen, origen, modelo):
+    """
+    Subconsulta con los ids de los objetos de `modelo` relacionados con el
+    objeto `origen` (pk o subconsulta de un pk) de modelo_origen.
+    """
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    return Relacionado.objects.filter(
+        origen_tipo=_codigo(modelo_origen), origen_id=origen, destino_tipo=_codigo(modelo),
+    ).values('destino_id')
+
+
+def relacionados(objeto, modelo):
+    """
+    Queryset de los objetos de `modelo` relacionados con `objeto`, del más
+    parecido al menos, con la similitud anotada; se filtra y se corta en la vista.
+    """
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    filas = Relacionado.objects.filter(
+        origen_tipo=_codigo(type(objeto)), origen_id=objeto.pk, destino_tipo=_codigo(modelo),
+    )
+    return modelo._default_manager.filter(pk__in=filas.values('destino_id')).annotate(
+        similitud=Subquery(filas.filter(destino_id=OuterRef('pk')).values('puntaje')[:1]),
+    ).order_by('-similitud', 'pk')
+
+
+def _al_cambiar_etiquetas(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    if action not in ('pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        return
+    # Con reverse, instance es la etiqueta y pk_set son objetos de model
+    modelo = model if reverse else type(instance)
+    if action == 'pre_clear':
+        # Después de clear() ya no se sabe qué se quitó
+        through, objeto, tag = _campos_through(modelo)
+        columna, filtro = (objeto, {tag: instance.pk}) if reverse else (tag, {objeto: instance.pk})
+        instance._relacionados_quitados = set(
+            through._default_manager.using(using).filter(**filtro).values_list(columna, flat=True)
+        )
+        return
+    cambiados = instance.__dict__.pop('_relacionados_quitados', set()) if action == 'post_clear' else pk_set
+    if not cambiados:
+        return
+    if reverse:
+        refrescar(modelo, cambiados, {instance.pk}, using=using)
+    else:
+        refrescar(modelo, [instance.pk], cambiados, using=using)
+
+
+def _al_borrar_objeto(sender, instance, using, **kwargs):
+    Relacionado = apps_globales.get_model('core.Relacionado')
+    codigo = _codigo(sender)
+    Relacionado.objects.using(using).filter(origen_tipo=codigo, origen_id=instance.pk).delete()
+    # Las listas que lo incluían se completan con el siguiente más parecido
+    listas = set(Relacionado.objects.using(using).filter(
+        destino_tipo=codigo, destino_id=instance.pk,
+    ).values_list('origen_tipo', 'origen_id'))
+    if listas:
+        refrescar_listas(listas, {codigo}, using=using)
+
+
+def _antes_de_borrar_etiqueta(sender, instance, using, **kwargs):
+    # El borrado en cascada de las filas del through no envía m2m_changed
+    instance._relacionados_etiquetados = {}
+    for etiqueta in MODELOS:
+        through, objeto, tag = _campos_through(apps_globales.get_model(etiqueta))
+        instance._relacionados_etiquetados[etiqueta] = list(
+            through._default_manager.using(using).filter(**{tag: instance.pk}).values_list(objeto, flat=True)
+        )
+
+
+def _al_borrar_etiqueta(sender, instance, using, **kwargs):
+    for etiqueta, pks in instance.__dict__.pop('_relacionados_etiquetados', {}).items():
+        if pks:
+            refrescar(apps_globales.get_model(etiqueta), pks, {instance.pk}, using=using)
+
+
+def conectar_senales():
+    for etiqueta in MODELOS:
+        modelo = apps_globales.get_model(etiqueta)
+        uid = f'relacionados:{etiqueta}'
+        m2m_changed.connect(_al_cambiar_etiquetas, sender=_campos_through(modelo)[0], dispatch_uid=uid)
+        post_delete.connect(_al_borrar_objeto, sender=modelo, dispatch_uid=uid)
+    Tag = apps_globales.get_model('tags.Tag')
+    pre_delete.connect(_antes_de_borrar_etiqueta, sender=Tag, dispatch_uid='relacionados:tags.Tag')
+    post_delete.connect(_al_borrar_etiqueta, sender=Tag, dispatch_uid='relacionados:tags.Tag')
@@ -0,0 +1,92 @@
+"""
+Servicio de inscripción a eventos.
+
+Reserva el cupo y crea la inscripción en una sola transacción, de modo que
+varias solicitudes simultáneas no puedan sobrepasar los cupos del evento.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import busqueda, generaciones, lookups
+from .models import Cuori, Evento, Inscripcion
+
+
+class InscripcionError(Exception):
+    """Error base del servicio de inscripción."""
+
+
+class YaInscrito(InscripcionError):
+    """El Cuori ya tiene una inscripción para el evento."""
+
+
+class CuposAgotados(InscripcionError):
+    """El evento no tiene cupos disponibles."""
+
+
+def guardar_cuori(datos_cuori):
+    """
+    Crea el Cuori o actualiza sus datos de contacto a partir de los datos
+    del formulario (se identifica por la cédula).
+
+    Si los datos coinciden con los guardados no se escribe nada; si no, se
+    hace un único INSERT ... ON CONFLICT (cedula) DO UPDATE.
+    """
+    campos = [campo for campo in datos_cuori if campo != 'cedula']
+    guardado = Cuori.objects.filter(cedula=datos_cuori['cedula']).values('pk', *campos).first()
+    if guardado and all(guardado[campo] == datos_cuori[campo] for campo in campos):
+        return Cuori(pk=guardado['pk'], **datos_cuori)
+
+    cuori = Cuori(**datos_cuori)
+    Cuori.objects.bulk_create(
+        [cuori],
+        update_conflicts=True,
+        unique_fields=['cedula'],
+        update_fields=campos,
+    )
+    # bulk_create no envía post_save, así que la caché y el índice de
+    # búsqueda del admin se actualizan aquí
+    lookups.invalidar_cuori(cuori.cedula)
+    busqueda.indexar([cuori])
+    return cuori
+
+
+def reservar_cupo(evento):
+    """
+    Incrementa el contador de inscritos del evento con un UPDATE condicional.
+    Devuelve False si el evento tiene cupos limitados y ya están agotados.
+    """
+    hay_cupo = Q(tipo_asistencia='ABIERTO') | Q(inscritos_count__lt=F('cupos'))
+    actualizados = Evento.objects.filter(hay_cupo, pk=evento.pk).update(
+        inscritos_count=F('inscritos_count') + 1, updated_at=timezone.now()
+    )
+    return actualizados == 1
+
+
+def inscribir_cuori(evento, datos_cuori):
+    """
+    Guarda el Cuori e inscribe al evento dentro de una misma transacción.
+
+    Lanza YaInscrito o CuposAgotados si no es posible inscribirlo; en ambos
+    casos los datos de contacto del Cuori quedan actualizados.
+    """
+    error = None
+    with transaction.atomic():
+        cuori = guardar_cuori(datos_cuori)
+        try:
+            with transaction.atomic():
+                # bulk_create no envía post_save: el contador ya se incrementa
+                # en reservar_cupo y no debe contarse dos veces en las señales.
+                inscripcion = Inscripcion.objects.bulk_create([Inscripcion(evento=evento, cuori=cuori)])[0]
+                if not reservar_cupo(evento):
+                    raise CuposAgotados(evento)
+        except IntegrityError:
+            # unique_together (evento, cuori) garantiza una sola inscripción
+            error = YaInscrito(evento)
+        except CuposAgotados as e:
+            error = e
+    if error:
+        raise error
+    lookups.invalidar_inscritos(evento.pk)
+    # La inscripción se crea con bulk_create, que no envía post_save
+    generaciones.incrementar('core.Inscripcion')
+    return cuori, inscripcion
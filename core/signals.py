@@ -0,0 +1,65 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from . import lookups
+from .models import Cuori, Evento, Inscripcion
+
+
+def _valor_anterior(instance, campo):
+    """Valor guardado del campo antes de este save(), o None si el objeto es nuevo."""
+    if instance._state.adding or instance.pk is None:
+        return None
+    return type(instance)._default_manager.filter(pk=instance.pk).values_list(campo, flat=True).first()
+
+
+@receiver(pre_save, sender=Inscripcion)
+def recordar_evento_anterior(sender, instance, **kwargs):
+    instance._evento_anterior = _valor_anterior(instance, 'evento_id')
+
+
+@receiver(pre_save, sender=Cuori)
+def recordar_cedula_anterior(sender, instance, **kwargs):
+    # Al cambiar la cédula también hay que olvidar la clave de la anterior
+    instance._cedula_anterior = _valor_anterior(instance, 'cedula')
+
+
+@receiver(pre_save, sender=Evento)
+def recordar_slug_anterior(sender, instance, **kwargs):
+    instance._slug_anterior = _valor_anterior(instance, 'slug')
+
+
+@receiver(post_save, sender=Inscripcion)
+def incrementar_inscritos(sender, instance, created, **kwargs):
+    """
+    Mantiene Evento.inscritos_count al crear inscripciones fuera del servicio
+    de inscripción (por ejemplo desde el admin).
+    """
+    if created:
+        Evento.objects.filter(pk=instance.evento_id).update(
+            inscritos_count=F('inscritos_count') + 1, updated_at=timezone.now()
+        )
+    anterior = instance.__dict__.pop('_evento_anterior', None)
+    lookups.invalidar_inscritos(*{instance.evento_id, anterior} - {None})
+
+
+@receiver(post_delete, sender=Inscripcion)
+def decrementar_inscritos(sender, instance, **kwargs):
+    Evento.objects.filter(pk=instance.evento_id, inscritos_count__gt=0).update(
+        inscritos_count=F('inscritos_count') - 1, updated_at=timezone.now()
+    )
+    lookups.invalidar_inscritos(instance.evento_id)
+
+
+@receiver(post_save, sender=Cuori)
+@receiver(post_delete, sender=Cuori)
+def invalidar_cache_cuori(sender, instance, **kwargs):
+    anterior = instance.__dict__.pop('_cedula_anterior', None)
+    lookups.invalidar_cuori(*{instance.cedula, anterior} - {None})
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def invalidar_cache_evento(sender, instance, **kwargs):
+    anterior = instance.__dict__.pop('_slug_anterior', None)
+    lookups.invalidar_evento(*{instance.slug, anterior} - {None})
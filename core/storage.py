@@ -0,0 +1,87 @@
+"""
+Almacenamiento de archivos subidos direccionado por contenido.
+
+Cada archivo se guarda con el hash SHA-256 de su contenido como nombre,
+dentro de la carpeta de upload_to (products/3f9a....webp). Subir otra vez
+los mismos bytes, con cualquier nombre, reutiliza el archivo existente en
+lugar de crear copias como amor-dios_nDh8Tzi.webp, y como el contenido de
+una URL nunca cambia se puede cachear indefinidamente (ver servir_media).
+
+Los archivos que ya no usa ningún modelo se borran con
+`manage.py limpiar_media`.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+from .imagenes import CARPETA_VARIANTES
+
+LONGITUD_HASH = 32
+NOMBRE_POR_CONTENIDO = re.compile(rf'(^|/)[0-9a-f]{{{LONGITUD_HASH}}}(-\d+w)?\.[a-z0-9]+$')
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def hash_contenido(content):
+    sha = hashlib.sha256()
+    for chunk in content.chunks():
+        sha.update(chunk)
+    content.seek(0)
+    return sha.hexdigest()[:LONGITUD_HASH]
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    def __init__(self, *args, **kwargs):
+        # Si dos subidas iguales coinciden, ambas escriben los mismos bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(*args, **kwargs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        carpeta, archivo = posixpath.split(name)
+        if posixpath.basename(carpeta) == CARPETA_VARIANTES:
+            # Las variantes de core.imagenes ya tienen un nombre derivado del original
+            return super().save(name, content, max_length=max_length)
+        extension = posixpath.splitext(archivo)[1].lower()
+        nombre = posixpath.join(carpeta, hash_contenido(content) + extension)
+        return super().save(nombre, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # El mismo nombre implica el mismo contenido: no hace falta buscar otro
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def es_inmutable(nombre):
+    return bool(NOMBRE_POR_CONTENIDO.search(nombre))
+
+
+def servir_media(request, path, document_root=None):
+    """
+    django.views.static.serve con caché de un año para los archivos
+    direccionados por contenido (y sus variantes). En producción el servidor
+    web debe enviar la misma cabecera Cache-Control para esos nombres.
+    """
+    response = serve(request, path, document_root=document_root)
+    if es_inmutable(path) and response.status_code == 200:
+        response['Cache-Control'] = CACHE_INMUTABLE
+    return response
+
+
+def archivos(storage, carpeta=''):
+    """Recorre recursivamente los nombres de archivo del storage."""
+    directorios, nombres = storage.listdir(carpeta)
+    for nombre in nombres:
+        yield posixpath.join(carpeta, nombre) if carpeta else nombre
+    for directorio in directorios:
+        yield from archivos(storage, posixpath.join(carpeta, directorio) if carpeta else directorio)
@@ -0,0 +1,33 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from core import imagenes
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_responsiva(imagen, alt='', sizes='100vw', **atributos):
+    """
+    Muestra la imagen en un <picture> con sus variantes AVIF/WebP en varios
+    anchos (srcset), y la imagen original como respaldo.
+    Uso: {% imagen_responsiva product.image alt=product.name sizes="(min-width: 992px) 25vw, 100vw" class="card-img-top" %}
+    La imagen puede ser también el nombre del archivo (ver core.portada).
+    """
+    if isinstance(imagen, str):
+        imagen = imagenes.archivo(imagen)
+    datos = imagenes.variantes(imagen)
+    atributos_img = {'src': imagen.url, 'alt': alt, 'loading': 'lazy', 'decoding': 'async'}
+    if datos:
+        atributos_img.update(width=datos['ancho'], height=datos['alto'])
+    atributos_img.update(atributos)
+
+    fuentes = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        (
+            (formato, ', '.join(f'{url} {ancho}w' for ancho, url in lista), sizes)
+            for formato, lista in datos.get('variantes', {}).items()
+        ),
+    )
+    return format_html('<picture>{}<img{}></picture>', fuentes, flatatt(atributos_img))
@@ -1,3 +1,1048 @@
-from django.test import TestCase
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, OperationalError, close_old_connections, connection
+from django.db.utils import ConnectionHandler
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.template import Context, Template
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from blog import views as blog_views
+from blog.models import BlogPost
+from jts_project import basedatos
+from products import views as products_views
+from products.models import Product
+from tags.models import Tag
+
+from . import (
+    benchmark, busqueda, cache_paginas, checks, enrutador, generaciones, imagenes, metricas, portada, relacionados,
+    storage, views,
+)
+from .middleware import LecturaEscrituraMiddleware
+from .models import Cuori, Evento, Inscripcion, Relacionado
+from .services import CuposAgotados, YaInscrito, inscribir_cuori
+
+
+def datos_cuori(cedula):
+    return {
+        'nombre_completo': f'CUORI {cedula}',
+        'cedula': cedula,
+        'numero_contacto': '3000000000',
+        'numero_contacto_2': None,
+        'email_contacto': f'{cedula}@example.com',
+        'pais': 'COLOMBIA',
+        'departamento': 'CUNDINAMARCA',
+        'ciudad': 'BOGOTÁ',
+    }
+
+
+def en_otro_proceso(codigo):
+    """Ejecuta el código en un proceso aparte con la misma caché, como otro worker; devuelve su salida."""
+    # La carpeta temporal de las pruebas (ver jts_project/pruebas.py), no la caché compartida
+    entorno = {clave: valor for clave, valor in os.environ.items() if clave != 'CACHE_REDIS'}
+    entorno['CACHE_DIR'] = settings.CACHES['default']['LOCATION']
+    return subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-v', '0', '-c', codigo],
+        cwd=settings.BASE_DIR, env=entorno, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def crear_evento(**kwargs):
+    defaults = {
+        'titulo': 'Retiro',
+        'descripcion': 'Retiro de sanación',
+        'fecha': timezone.now() + timezone.timedelta(days=7),
+        'lugar': 'Casa de retiros',
+        'cupos': 10,
+    }
+    defaults.update(kwargs)
+    return Evento.objects.create(**defaults)
+
+
+class InscripcionServiceTests(TestCase):
+    def test_inscribe_y_cuenta_cupo(self):
+        evento = crear_evento(cupos=2)
+        inscribir_cuori(evento, datos_cuori('1'))
+        evento.refresh_from_db()
+        self.assertEqual(evento.inscritos_count, 1)
+        # Del contador guardado, sin COUNT de las inscripciones
+        with self.assertNumQueries(0):
+            self.assertEqual(evento.cupos_disponibles, 1)
+
+    def test_cupos_agotados(self):
+        evento = crear_evento(cupos=1)
+        inscribir_cuori(evento, datos_cuori('1'))
+        with self.assertRaises(CuposAgotados):
+            inscribir_cuori(evento, datos_cuori('2'))
+        self.assertEqual(Inscripcion.objects.filter(evento=evento).count(), 1)
+        # Los datos de contacto se guardan aunque no haya cupo
+        self.assertTrue(Cuori.objects.filter(cedula='2').exists())
+
+    def test_ya_inscrito_actualiza_datos(self):
+        evento = crear_evento()
+        inscribir_cuori(evento, datos_cuori('1'))
+        datos = datos_cuori('1')
+        datos['ciudad'] = 'MEDELLÍN'
+        with self.assertRaises(YaInscrito):
+            inscribir_cuori(evento, datos)
+        self.assertEqual(Cuori.objects.get(cedula='1').ciudad, 'MEDELLÍN')
+        evento.refresh_from_db()
+        self.assertEqual(evento.inscritos_count, 1)
+
+    def test_asistencia_abierta_sin_limite(self):
+        evento = crear_evento(cupos=0, tipo_asistencia='ABIERTO')
+        inscribir_cuori(evento, datos_cuori('1'))
+        inscribir_cuori(evento, datos_cuori('2'))
+        self.assertEqual(evento.inscritos.count(), 2)
+
+    def test_cuori_sin_cambios_no_se_reescribe(self):
+        evento = crear_evento()
+        otro_evento = crear_evento(titulo='Conferencia')
+        inscribir_cuori(evento, datos_cuori('1'))
+        # SELECT del Cuori, INSERT de la inscripción y UPDATE del cupo, más dos savepoints
+        with self.assertNumQueries(7):
+            inscribir_cuori(otro_evento, datos_cuori('1'))
+        self.assertEqual(Cuori.objects.count(), 1)
+
+    def test_borrar_inscripcion_libera_cupo(self):
+        evento = crear_evento(cupos=1)
+        _, inscripcion = inscribir_cuori(evento, datos_cuori('1'))
+        inscripcion.delete()
+        inscribir_cuori(evento, datos_cuori('2'))
+        evento.refresh_from_db()
+        self.assertEqual(evento.inscritos_count, 1)
+
+
+class ConsultaCedulaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.evento = crear_evento()
+        self.url = reverse('get_inscripcion_data_by_cedula')
+
+    def consultar(self, **headers):
+        return self.client.get(self.url, {'cedula': '1', 'evento_slug': self.evento.slug}, **headers)
+
+    def test_datos_y_estado_de_inscripcion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inscribir_cuori(self.evento, datos_cuori('1'))
+        data = self.consultar().json()
+        self.assertEqual(data['nombre_completo'], 'CUORI 1')
+        self.assertTrue(data['is_inscribed'])
+
+    def test_consultas_repetidas_usan_cache(self):
+        Cuori.objects.create(**datos_cuori('1'))
+        self.consultar()
+        with self.assertNumQueries(0):
+            data = self.consultar().json()
+        self.assertFalse(data['is_inscribed'])
+
+    def test_etag_devuelve_304(self):
+        Cuori.objects.create(**datos_cuori('1'))
+        etag = self.consultar()['ETag']
+        response = self.consultar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_guardar_cuori_invalida_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cuori = Cuori.objects.create(**datos_cuori('1'))
+        self.consultar()
+        with self.captureOnCommitCallbacks(execute=True):
+            cuori.ciudad = 'CALI'
+            cuori.save()
+        self.assertEqual(self.consultar().json()['ciudad'], 'CALI')
+
+    def test_cambiar_cedula_o_slug_invalida_la_clave_anterior(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cuori = Cuori.objects.create(**datos_cuori('1'))
+        self.assertEqual(self.consultar().json()['nombre_completo'], 'CUORI 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            cuori.cedula = '2'
+            cuori.save()
+        self.assertNotIn('nombre_completo', self.consultar().json())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inscribir_cuori(self.evento, datos_cuori('3'))
+        parametros = {'cedula': '3', 'evento_slug': self.evento.slug}
+        self.assertTrue(self.client.get(self.url, parametros).json()['is_inscribed'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento.slug = 'otro-retiro'
+            self.evento.save()
+        self.assertFalse(self.client.get(self.url, parametros).json()['is_inscribed'])
+
+    @override_settings(LIMITE_CONSULTAS_CEDULA=2, PROXIES_CONFIABLES=['127.0.0.1'])
+    def test_limite_por_cliente_detras_del_proxy(self):
+        def consultar(ip, **headers):
+            return self.consultar(REMOTE_ADDR=ip, **headers).status_code
+
+        # Detrás del proxy cada cliente tiene su propio contador
+        # (el proxy agrega al final la dirección que ve; la primera la inventó el cliente)
+        reenviado = {'HTTP_X_FORWARDED_FOR': '6.6.6.6, 1.1.1.1'}
+        self.assertEqual([consultar('127.0.0.1', **reenviado) for _ in range(3)], [200, 200, 429])
+        self.assertEqual(consultar('127.0.0.1', HTTP_X_FORWARDED_FOR='10.0.0.2'), 200)
+        # Fuera del proxy el encabezado no cuenta
+        self.assertEqual(consultar('1.1.1.1', HTTP_X_FORWARDED_FOR='10.0.0.3'), 429)
+
+
+class ConsultasFrecuentesTests(TestCase):
+    def test_consultas_frecuentes_usan_indices(self):
+        salida = StringIO()
+        call_command('explain_hot_queries', stdout=salida)
+        self.assertNotIn('[SCAN]', salida.getvalue())
+
+
+@override_settings(METRICAS_VISTAS=True)
+class MetricasVistasTests(TestCase):
+    def setUp(self):
+        metricas.reiniciar()
+        crear_evento()
+
+    def test_server_timing_y_resumen_por_vista(self):
+        response = self.client.get(reverse('eventos'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+        admin = User.objects.create_user('admin', password='clave', is_staff=True)
+        self.client.force_login(admin)
+        vistas = self.client.get(reverse('metricas_vistas')).json()['vistas']
+        self.assertEqual(vistas['eventos']['peticiones'], 1)
+        self.assertGreaterEqual(vistas['eventos']['consultas_max'], 1)
+        self.assertEqual(vistas['eventos']['consultas_duplicadas'], [])
+
+    def test_detecta_consultas_duplicadas(self):
+        medicion, token = metricas.iniciar_medicion()
+        with connection.execute_wrapper(medicion):
+            for evento in Evento.objects.all():
+                evento.inscritos.count()
+                evento.inscritos.count()
+        metricas.terminar_medicion(token)
+        metricas.registrar('prueba', medicion)
+        duplicadas = metricas.resumen()['prueba']['consultas_duplicadas']
+        self.assertEqual(duplicadas[0]['veces'], 2)
+
+    def test_solo_staff(self):
+        response = self.client.get(reverse('metricas_vistas'))
+        self.assertEqual(response.status_code, 302)
+
+
+class PresupuestoConsultasTests(TestCase):
+    """
+    Número máximo de consultas por petición de las vistas públicas, con
+    volúmenes de datos reales. Un N+1 en una vista hace fallar estas pruebas.
+    """
+    EVENTOS = 200
+    CUORIS = 50_000
+    INSCRIPCIONES_POR_CUORI = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        inicio = timezone.now() + timezone.timedelta(hours=1)
+        eventos = Evento.objects.bulk_create([
+            Evento(
+                titulo=f'Evento {i}', slug=f'evento-{i}', descripcion='Retiro de sanación',
+                fecha=inicio + timezone.timedelta(days=i), lugar='Casa de retiros', cupos=1000,
+            )
+            for i in range(cls.EVENTOS)
+        ])
+        cuoris = Cuori.objects.bulk_create(
+            [Cuori(**datos_cuori(str(1_000_000 + i))) for i in range(cls.CUORIS)], batch_size=2000
+        )
+        Inscripcion.objects.bulk_create([
+            Inscripcion(evento=eventos[(i + j) % cls.EVENTOS], cuori=cuori)
+            for i, cuori in enumerate(cuoris)
+            for j in range(cls.INSCRIPCIONES_POR_CUORI)
+        ], batch_size=5000)
+        inscritos = cls.CUORIS * cls.INSCRIPCIONES_POR_CUORI // cls.EVENTOS
+        Evento.objects.update(inscritos_count=inscritos)
+        cls.evento = eventos[0]
+        cls.cedula = cuoris[0].cedula
+
+    def setUp(self):
+        cache.clear()
+
+    def test_home(self):
+        # Evento, sus relacionados, últimas entradas y conteos, una vez
+        with self.assertNumQueries(9):
+            portada.instantanea()
+        # Después la portada sale de la instantánea
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    def test_eventos_list(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('eventos')).status_code, 200)
+
+    def test_evento_detalle(self):
+        # Last-Modified, evento con sus inscritos y eventos relacionados
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('evento_detalle', args=[self.evento.slug]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_inscribir_evento_get(self):
+        url = reverse('inscribir_evento', args=[self.evento.slug])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'cedula': self.cedula})
+        self.assertEqual(response.status_code, 200)
+
+    def test_inscribir_evento_post(self):
+        datos = datos_cuori('999')
+        datos['numero_contacto_2'] = ''
+        datos['terms_accepted'] = 'on'
+        url = reverse('inscribir_evento', args=[self.evento.slug])
+        # Evento, unicidad de la cédula, Cuori (SELECT, upsert y su fila en el
+        # índice de búsqueda del admin), inscripción y cupo, más savepoints
+        with self.assertNumQueries(12):
+            response = self.client.post(url, datos, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+
+    def test_get_inscripcion_data_by_cedula(self):
+        url = reverse('get_inscripcion_data_by_cedula')
+        parametros = {'cedula': self.cedula, 'evento_slug': self.evento.slug}
+        with self.assertNumQueries(3):
+            self.assertTrue(self.client.get(url, parametros).json()['is_inscribed'])
+        with self.assertNumQueries(0):
+            self.client.get(url, parametros)
+
+
+class BenchmarkTests(TestCase):
+    def test_percentiles(self):
+        tiempos = list(range(1, 101))
+        self.assertEqual(benchmark.percentil(tiempos, 50), 50)
+        self.assertEqual(benchmark.percentil(tiempos, 99), 99)
+
+    def test_compara_con_linea_base(self):
+        linea_base = {'home': {'p95_ms': 10.0}, 'eventos': {'p95_ms': 10.0}, 'about': {'p95_ms': 1.0}}
+        resultados = {'home': {'p95_ms': 14.0}, 'eventos': {'p95_ms': 11.0}, 'about': {'p95_ms': 1.5}, 'nueva': {'p95_ms': 5.0}}
+        regresiones = benchmark.comparar(resultados, linea_base, umbral=0.25, minimo_ms=1.0)
+        self.assertEqual(regresiones, [('home', 10.0, 14.0)])
+
+    def test_escenarios_responden(self):
+        datos = benchmark.sembrar_datos(escala=0.001)
+        with self.settings(LIMITE_CONSULTAS_CEDULA=None):
+            for escenario in benchmark.escenarios(datos):
+                resultado = benchmark.medir(escenario, peticiones=1, calentamiento=0)
+                self.assertEqual(resultado['peticiones'], 1)
+
+
+class CachePaginasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.evento = crear_evento()
+        self.url = reverse('eventos')
+
+    def test_visitante_anonimo_usa_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, self.evento.titulo)
+
+    def test_parametros_en_distinto_orden_comparten_pagina(self):
+        self.client.get(self.url, {'a': '1', 'b': '2'})
+        with self.assertNumQueries(0):
+            self.client.get(f'{self.url}?b=2&a=1')
+
+    def test_usuario_autenticado_no_usa_cache(self):
+        self.client.force_login(User.objects.create_user('cuori', password='clave'))
+        self.client.get(self.url)
+        with self.assertNumQueries(3):  # sesión, usuario y eventos
+            self.client.get(self.url)
+
+    def test_peticion_con_mensajes_no_usa_cache(self):
+        request = RequestFactory().get(self.url)
+        request.user = AnonymousUser()
+        request.session = self.client.session
+        request._messages = FallbackStorage(request)
+        self.assertTrue(cache_paginas.se_puede_cachear(request))
+        messages.success(request, 'Inscripción recibida')
+        self.assertFalse(cache_paginas.se_puede_cachear(request))
+
+    def test_guardar_evento_invalida_paginas(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento.titulo = 'Conferencia'
+            self.evento.save()
+        self.assertContains(self.client.get(self.url), 'Conferencia')
+
+    def test_inscripcion_invalida_paginas_de_eventos(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            inscribir_cuori(self.evento, datos_cuori('1'))
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+
+class RespuestaCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.evento = crear_evento(cupos=0)
+        self.url = reverse('evento_detalle', args=[self.evento.slug])
+
+    def test_etag_devuelve_304_sin_consultas(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_inscripcion_cambia_etag(self):
+        evento = crear_evento(titulo='Abierto', tipo_asistencia='ABIERTO')
+        url = reverse('evento_detalle', args=[evento.slug])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            inscribir_cuori(evento, datos_cuori('1'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_compartido_entre_procesos(self):
+        etag = self.client.get(self.url)['ETag']
+        # Otro worker calcula el mismo ETag para la misma página
+        huella = en_otro_proceso(
+            "from django.conf import settings; from django.test import RequestFactory; "
+            "from django.utils import translation; from core.cache_paginas import clave_pagina; "
+            "settings.ALLOWED_HOSTS = ['testserver']; translation.activate(settings.LANGUAGE_CODE); "
+            f"print(clave_pagina(RequestFactory().get('{self.url}'), ['eventos']).split(':', 1)[1])"
+        )
+        self.assertEqual(etag, f'"{huella}"')
+        # y un cambio registrado en otro proceso invalida el ETag en este
+        en_otro_proceso("from core import generaciones; generaciones._incrementar_ahora(['core.Inscripcion'])")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_mensajes_pendientes_no_devuelven_304(self):
+        etag = self.client.get(self.url)['ETag']
+        datos = datos_cuori('1')
+        datos.update({'numero_contacto_2': '', 'terms_accepted': 'on'})
+        self.client.post(reverse('inscribir_evento', args=[self.evento.slug]), datos)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'ya no hay cupos disponibles')
+
+
+class GeneracionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generacion(self, modelo='core.Evento'):
+        return generaciones.generaciones(modelo)[modelo]
+
+    def test_guardar_modelo_incrementa_su_generacion(self):
+        antes = self.generacion()
+        antes_blog = self.generacion('blog.BlogPost')
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_evento()
+        self.assertEqual(self.generacion(), antes + 1)
+        self.assertEqual(self.generacion('blog.BlogPost'), antes_blog)
+
+    def test_agrupar_incrementos(self):
+        antes = self.generacion()
+        with self.captureOnCommitCallbacks(execute=True):
+            with generaciones.agrupar_incrementos():
+                for i in range(5):
+                    crear_evento(titulo=f'Evento {i}')
+        self.assertEqual(self.generacion(), antes + 1)
+
+    def test_contador_perdido_no_reutiliza_generaciones(self):
+        antes = self.generacion()
+        cache.delete('generacion:core.Evento')
+        self.assertGreater(self.generacion(), antes)
+
+    def test_incremento_en_otro_proceso(self):
+        # Como el importador o el otro worker: la caché es compartida
+        antes = self.generacion()
+        clave_portada = portada.clave()
+        en_otro_proceso("from core import generaciones; generaciones._incrementar_ahora(['core.Evento'])")
+        self.assertEqual(self.generacion(), antes + 1)
+        self.assertNotEqual(portada.clave(), clave_portada)
+
+    def test_pruebas_no_usan_la_cache_compartida(self):
+        # jts_project/pruebas.py: una carpeta temporal, compartida con en_otro_proceso()
+        carpeta = settings.CACHES['default']['LOCATION']
+        self.assertTrue(carpeta.startswith(tempfile.gettempdir()))
+        cache.set('prueba:aislada', 1)
+        self.assertEqual(en_otro_proceso("from django.core.cache import cache; print(cache.get('prueba:aislada'))"), '1')
+
+    def test_chequeo_rechaza_cache_por_proceso_en_produccion(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(DB_PERFIL='produccion', CACHES=locmem):
+            self.assertEqual([error.id for error in checks.cache_compartida(None)], ['core.E001'])
+        with self.settings(DB_PERFIL='desarrollo', CACHES=locmem):
+            self.assertEqual(checks.cache_compartida(None), [])
+        with self.settings(DB_PERFIL='produccion'):
+            self.assertEqual(checks.cache_compartida(None), [])
+
+
+def imagen_png(ancho, alto):
+    contenido = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'teal').save(contenido, 'PNG')
+    return SimpleUploadedFile('retiro.png', contenido.getvalue(), content_type='image/png')
+
+
+class ImagenesResponsivasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, IMAGENES_FORMATOS=('webp',)))
+        self.media = media.name
+
+    def test_genera_variantes_al_guardar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            evento = crear_evento(imagen=imagen_png(1500, 1000))
+        # Nada se codifica dentro de la transacción
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'eventos', 'derivadas')))
+        for callback in callbacks:
+            callback()
+        derivadas = os.listdir(os.path.join(self.media, 'eventos', 'derivadas'))
+        base = os.path.basename(evento.imagen.name)
+        self.assertEqual(sorted(derivadas), sorted(f'{base}-{ancho}w.webp' for ancho in imagenes.ANCHOS))
+
+    def test_originales_con_el_mismo_nombre_sin_extension(self):
+        # Como las subidas anteriores a los nombres por contenido: foto.png y foto.webp
+        os.makedirs(os.path.join(self.media, 'products'))
+        for nombre, ancho, formato in (('foto.png', 700, 'PNG'), ('foto.webp', 500, 'WEBP')):
+            Image.new('RGB', (ancho, 300), 'teal').save(os.path.join(self.media, 'products', nombre), formato)
+        png = imagenes.variantes(imagenes.archivo('products/foto.png'))
+        webp = imagenes.variantes(imagenes.archivo('products/foto.webp'))
+        self.assertEqual((png['ancho'], webp['ancho']), (700, 500))
+        self.assertNotEqual(png['variantes']['webp'][0][1], webp['variantes']['webp'][0][1])
+        with Image.open(os.path.join(self.media, imagenes.nombre_variante('products/foto.webp', 500, 'webp'))) as variante:
+            self.assertEqual(variante.width, 500)
+
+        # limpiar_media conserva las variantes de los dos
+        salida = StringIO()
+        Product.objects.create(name='Foto', price=1, category='libro', image='products/foto.png')
+        Product.objects.create(name='Foto 2', price=1, category='libro', image='products/foto.webp')
+        call_command('limpiar_media', '--gracia=0', stdout=salida)
+        self.assertIn('Huérfanos (usa --borrar para eliminarlos): 0 archivos', salida.getvalue())
+
+    def test_no_amplia_imagenes_pequenas(self):
+        evento = crear_evento(imagen=imagen_png(500, 300))
+        anchos = [ancho for ancho, _ in imagenes.variantes(evento.imagen)['variantes']['webp']]
+        self.assertEqual(anchos, [320, 500])
+
+    def test_etiqueta_emite_srcset(self):
+        evento = crear_evento(imagen=imagen_png(700, 400))
+        html = Template('{% load image_tags %}{% imagen_responsiva evento.imagen alt="Retiro" class="img-fluid" %}').render(
+            Context({'evento': evento})
+        )
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('-320w.webp 320w, ', html)
+        self.assertIn('width="700"', html)
+        self.assertIn('height="400"', html)
+        self.assertIn(f'src="{evento.imagen.url}"', html)
+
+    def test_imagen_invalida_usa_el_original(self):
+        evento = crear_evento(imagen=SimpleUploadedFile('roto.png', b'no es una imagen'))
+        with self.assertLogs('core.imagenes', 'WARNING') as logs:
+            html = Template('{% load image_tags %}{% imagen_responsiva evento.imagen %}').render(Context({'evento': evento}))
+        self.assertIn(f'No se pudieron generar las variantes de {evento.imagen.name}', logs.output[0])
+        self.assertNotIn('<source', html)
+        self.assertIn(f'src="{evento.imagen.url}"', html)
+
+
+class AlmacenamientoPorContenidoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, IMAGENES_FORMATOS=('webp',)))
+
+    def test_mismo_contenido_se_guarda_una_vez(self):
+        evento = crear_evento(imagen=imagen_png(400, 300))
+        otro = crear_evento(titulo='Otro', imagen=imagen_png(400, 300))
+        distinto = crear_evento(titulo='Distinto', imagen=imagen_png(401, 300))
+        self.assertEqual(evento.imagen.name, otro.imagen.name)
+        self.assertNotEqual(evento.imagen.name, distinto.imagen.name)
+        self.assertEqual(len(default_storage.listdir('eventos')[1]), 2)
+
+    def test_urls_inmutables(self):
+        evento = crear_evento(imagen=imagen_png(400, 300))
+        response = storage.servir_media(RequestFactory().get('/'), evento.imagen.name, document_root=settings.MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'], storage.CACHE_INMUTABLE)
+
+    def test_limpiar_media(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            evento = crear_evento(imagen=imagen_png(400, 300))
+            huerfano = crear_evento(titulo='Huérfano', imagen=imagen_png(500, 300))
+        nombre_huerfano = huerfano.imagen.name
+        Evento.objects.filter(pk=huerfano.pk).update(imagen='')
+
+        salida = StringIO()
+        call_command('limpiar_media', '--gracia=0', stdout=salida)
+        self.assertIn(nombre_huerfano, salida.getvalue())
+        self.assertTrue(default_storage.exists(nombre_huerfano))
+
+        call_command('limpiar_media', '--gracia=0', '--borrar', stdout=StringIO())
+        self.assertFalse(default_storage.exists(nombre_huerfano))
+        self.assertFalse(default_storage.exists(imagenes.nombre_variante(nombre_huerfano, 320, 'webp')))
+        self.assertTrue(default_storage.exists(evento.imagen.name))
+        self.assertTrue(default_storage.exists(imagenes.nombre_variante(evento.imagen.name, 320, 'webp')))
+
+
+class InscripcionConcurrenteTests(TransactionTestCase):
+    INSCRIPCIONES = 200
+    CUPOS = 50
+
+    def test_no_sobrepasa_cupos(self):
+        # Con la base en memoria no habría escritores concurrentes reales (ver TEST en settings)
+        self.assertFalse(connection.is_in_memory_db())
+        evento = crear_evento(cupos=self.CUPOS)
+        resultados = []
+        inicio = threading.Barrier(self.INSCRIPCIONES)
+
+        def inscribir(cedula):
+            close_old_connections()
+            inicio.wait()
+            try:
+                while True:
+                    try:
+                        inscribir_cuori(evento, datos_cuori(cedula))
+                        resultados.append('ok')
+                    except CuposAgotados:
+                        resultados.append('agotado')
+                    except OperationalError:
+                        # SQLite rechaza escritores concurrentes en lugar de esperar
+                        time.sleep(0.01)
+                        continue
+                    break
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=inscribir, args=(str(i),)) for i in range(self.INSCRIPCIONES)]
+        # Las conexiones de los hilos toman el bloqueo al empezar, como en el
+        # perfil de producción, y esperan en lugar de fallar al promoverlo
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], {'transaction_mode': 'IMMEDIATE'}):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        evento.refresh_from_db()
+        self.assertEqual(resultados.count('ok'), self.CUPOS)
+        self.assertEqual(resultados.count('agotado'), self.INSCRIPCIONES - self.CUPOS)
+        self.assertEqual(evento.inscritos.count(), self.CUPOS)
+        self.assertEqual(evento.inscritos_count, self.CUPOS)
+
+
+class PerfilBaseDatosTests(SimpleTestCase):
+    def test_perfil_desarrollo_no_cambia_la_configuracion(self):
+        configuracion = basedatos.configuracion_sqlite('db.sqlite3')
+        self.assertEqual(configuracion, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3', 'OPTIONS': {}})
+
+    def test_perfil_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            basedatos.configuracion_sqlite('db.sqlite3', 'rapido')
+
+    def test_perfil_produccion_aplica_pragmas_y_transacciones_immediate(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            # Un alias distinto de 'default', que SimpleTestCase no deja usar
+            conexiones = ConnectionHandler({
+                'default': {'ENGINE': 'django.db.backends.dummy'},
+                'perfil': basedatos.configuracion_sqlite(os.path.join(carpeta, 'db.sqlite3'), 'produccion'),
+            })
+            conexion = conexiones['perfil']
+            try:
+                self.assertTrue(conexion.settings_dict['CONN_HEALTH_CHECKS'])
+                self.assertGreater(conexion.settings_dict['CONN_MAX_AGE'], 0)
+                with conexion.cursor() as cursor:
+                    valores = {}
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size'):
+                        cursor.execute(f'PRAGMA {pragma}')
+                        valores[pragma] = cursor.fetchone()[0]
+                self.assertEqual(valores, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -20000})
+                self.assertEqual(conexion.transaction_mode, 'IMMEDIATE')
+            finally:
+                conexiones.close_all()
+
+
+class EnrutadorLecturaTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.enrutador = enrutador.EnrutadorLecturaEscritura()
+        self.enrutador.alias_lectura = enrutador.ALIAS_LECTURA
+
+    def alias_en_vista(self, request):
+        @enrutador.solo_lectura
+        def vista(request):
+            return self.enrutador.db_for_read(Evento)
+        return vista(request)
+
+    def test_vistas_de_solo_lectura_leen_de_la_replica(self):
+        self.assertEqual(self.alias_en_vista(self.factory.get('/')), enrutador.ALIAS_LECTURA)
+        # Fuera de las vistas decoradas se lee de la primaria
+        self.assertIsNone(self.enrutador.db_for_read(Evento))
+
+    def test_sin_alias_de_lectura_no_cambia_nada(self):
+        self.enrutador.alias_lectura = None
+        self.assertIsNone(self.alias_en_vista(self.factory.get('/')))
+
+    def test_tras_escribir_lee_de_la_primaria(self):
+        request = self.factory.get('/', HTTP_COOKIE=f'{enrutador.COOKIE_ESCRITURA}=1')
+        self.assertIsNone(self.alias_en_vista(request))
+
+    def test_sesion_y_usuarios_se_leen_de_la_primaria(self):
+        @enrutador.solo_lectura
+        def vista(request):
+            return [self.enrutador.db_for_read(modelo) for modelo in (Session, User)]
+        self.assertEqual(vista(self.factory.get('/')), [None, None])
+
+    def test_paginas_leidas_de_la_replica_dependen_de_la_copia(self):
+        cache.clear()
+
+        @enrutador.solo_lectura
+        def clave(request):
+            return cache_paginas.clave_pagina(request, ['eventos'])
+
+        request = self.factory.get('/eventos/')
+        sin_replica = clave(request)
+        with mock.patch('core.enrutador.archivo_replica', return_value=Path('/tmp/replica.sqlite3')):
+            self.assertNotIn(enrutador.GENERACION_REPLICA, cache_paginas.modelos_de(['eventos']))
+            antes = clave(request)
+            self.assertNotEqual(antes, sin_replica)
+            # actualizar_replica incrementa la generación de la copia
+            generaciones._incrementar_ahora([enrutador.GENERACION_REPLICA])
+            self.assertNotEqual(clave(request), antes)
+        self.assertEqual(clave(request), sin_replica)
+
+    def test_escrituras_y_migraciones_van_a_la_primaria(self):
+        self.assertEqual(self.enrutador.db_for_write(Evento), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.enrutador.allow_migrate(enrutador.ALIAS_LECTURA, 'core'))
+        self.assertIsNone(self.enrutador.allow_migrate(DEFAULT_DB_ALIAS, 'core'))
+
+    def test_middleware_marca_al_navegador_que_escribio(self):
+        def escribe(request):
+            self.enrutador.db_for_write(Inscripcion)
+            return HttpResponse()
+
+        with mock.patch('core.enrutador.lectura_configurada', return_value=True):
+            respuesta = LecturaEscrituraMiddleware(escribe)(self.factory.post('/'))
+            self.assertEqual(respuesta.cookies[enrutador.COOKIE_ESCRITURA]['max-age'], settings.LECTURA_PRIMARIA_TRAS_ESCRITURA)
+
+            respuesta = LecturaEscrituraMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+            self.assertNotIn(enrutador.COOKIE_ESCRITURA, respuesta.cookies)
+
+    def test_alias_de_lectura_no_admite_escrituras(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'db.sqlite3')
+            conexiones = ConnectionHandler({
+                'default': {'ENGINE': 'django.db.backends.dummy'},
+                'primaria': basedatos.configuracion_sqlite(archivo, 'produccion'),
+                'replica': basedatos.configuracion_lectura(archivo, 'ro', 'produccion'),
+            })
+            try:
+                with conexiones['primaria'].cursor() as cursor:
+                    cursor.execute('CREATE TABLE prueba (valor INTEGER)')
+                    cursor.execute('INSERT INTO prueba VALUES (1)')
+                with conexiones['replica'].cursor() as cursor:
+                    cursor.execute('SELECT valor FROM prueba')
+                    self.assertEqual(cursor.fetchall(), [(1,)])
+                    with self.assertRaises(OperationalError):
+                        cursor.execute('INSERT INTO prueba VALUES (2)')
+            finally:
+                conexiones.close_all()
+
+
+class VistasAsincronasTests(TestCase):
+    """Vistas públicas servidas por ASGI (AsyncClient) con el ORM asíncrono."""
+
+    def setUp(self):
+        cache.clear()
+        self.datos = benchmark.sembrar_datos(escala=0.001)
+        self.urls = [url for nombre, metodo, url, _ in benchmark.escenarios(self.datos) if metodo == 'get']
+
+    def test_vistas_publicas_son_asincronas(self):
+        for vista in (
+            views.get_inscripcion_data_by_cedula, views.evento_detalle, views.eventos_list,
+            products_views.product_detail, products_views.categorized_product_list, products_views.product_list,
+            blog_views.blog_list, blog_views.blog_detalle, blog_views.blog_por_tipo,
+        ):
+            self.assertTrue(iscoroutinefunction(vista), vista.__name__)
+
+    async def test_paginas_por_asgi(self):
+        for url in self.urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        # Segunda vez desde la caché de páginas, y 304 con el ETag
+        response = await self.async_client.get(reverse('blog:blog_list'))
+        response = await self.async_client.get(reverse('blog:blog_list'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_usuario_autenticado_por_asgi(self):
+        admin = await User.objects.acreate_user('admin', password='clave', is_staff=True)
+        await self.async_client.aforce_login(admin)
+        for url in self.urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+    async def test_api_cedula_por_asgi(self):
+        evento, cuori = self.datos['evento'], self.datos['cuori']
+        response = await self.async_client.get(
+            reverse('get_inscripcion_data_by_cedula'), {'cedula': cuori.cedula, 'evento_slug': evento.slug},
+        )
+        datos = response.json()
+        self.assertEqual(datos['nombre_completo'], cuori.nombre_completo)
+        self.assertTrue(datos['is_inscribed'])
+
+    async def test_renderiza_fuera_del_bucle(self):
+        hilos = []
+
+        def render(*args, **kwargs):
+            hilos.append(threading.get_ident())
+            return HttpResponse()
+
+        with mock.patch('core.asincrono.render', render):
+            await self.async_client.get(reverse('eventos'))
+        self.assertEqual(len(hilos), 1)
+        self.assertNotEqual(hilos[0], threading.get_ident())
+
+    @override_settings(METRICAS_VISTAS=True)
+    async def test_metricas_miden_el_orm_asincrono(self):
+        response = await self.async_client.get(reverse('eventos'))
+        self.assertIn('desc="1 consultas"', response['Server-Timing'])
+
+
+class BusquedaTests(TestCase):
+    """Índice de texto completo FTS5 de core/busqueda.py."""
+
+    def setUp(self):
+        cache.clear()
+        self.evento = crear_evento(titulo='Retiro de Sanación', descripcion='Oración y alabanza <b>juntos</b>')
+        self.producto = Product.objects.create(
+            name='Canciones para sanar', description='Libro de alabanzas', price=10000, category='libro',
+        )
+        self.entrada = BlogPost.objects.create(titulo='Reflexión', contenido='<p>La sanación interior</p>')
+
+    def titulos(self, texto, **kwargs):
+        return [resultado['titulo'] for resultado in busqueda.buscar(texto, **kwargs)]
+
+    def test_ignora_tildes_y_busca_prefijos(self):
+        self.assertEqual(self.titulos('SANACION retiro'), ['Retiro de Sanación'])
+        # El título pesa más que el contenido
+        self.assertEqual(self.titulos('sanacion'), ['Retiro de Sanación', 'Reflexión'])
+        self.assertEqual(self.titulos('cancion'), ['Canciones para sanar'])
+        self.assertEqual(self.titulos('alabanza', tipos=['producto']), ['Canciones para sanar'])
+        self.assertEqual(busqueda.buscar('"OR" NEAR(*'), [])
+
+    def test_fragmento_resaltado_sin_html_del_contenido(self):
+        resultado, = busqueda.buscar('juntos')
+        self.assertEqual(resultado['url'], self.evento.get_absolute_url())
+        self.assertIn('<mark>juntos</mark>', resultado['fragmento'])
+        self.assertNotIn('<b>', resultado['fragmento'])
+
+    def test_senales_mantienen_el_indice(self):
+        self.entrada.esta_publicado = False
+        self.entrada.save()
+        self.assertEqual(self.titulos('interior'), [])
+        self.producto.name = 'Cantos'
+        self.producto.save()
+        self.assertEqual(self.titulos('cancion'), [])
+        self.assertEqual(self.titulos('cantos'), ['Cantos'])
+        self.evento.delete()
+        self.assertEqual(self.titulos('retiro'), [])
+
+    def test_reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {busqueda.TABLA}')
+        call_command('reconstruir_busqueda', stdout=StringIO())
+        self.assertEqual(self.titulos('sanacion'), ['Retiro de Sanación', 'Reflexión'])
+
+    def test_vista_buscar(self):
+        response = self.client.get(reverse('buscar'), {'q': 'sanacion', 'tipo': 'entrada'})
+        self.assertEqual([resultado['titulo'] for resultado in response.context['resultados']], ['Reflexión'])
+        self.assertContains(response, self.entrada.get_absolute_url())
+
+    def test_admin_usa_el_indice(self):
+        modelo_admin = admin.site._registry[Evento]
+        resultados, duplicados = modelo_admin.get_search_results(None, Evento.objects.all(), 'alabanza')
+        self.assertEqual(list(resultados), [self.evento])
+        self.assertFalse(duplicados)
+
+    def test_admin_busca_tambien_en_campos_no_indexados(self):
+        modelo_admin = admin.site._registry[Product]
+        self.assertEqual(busqueda.campos_no_indexados(Product, modelo_admin.search_fields), ['category'])
+        resultados, _ = modelo_admin.get_search_results(None, Product.objects.all(), 'libro')
+        self.assertEqual(list(resultados), [self.producto])
+        resultados, _ = modelo_admin.get_search_results(None, Product.objects.all(), 'canciones')
+        self.assertEqual(list(resultados), [self.producto])
+
+    def test_admin_de_cuoris_busca_en_el_indice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inscribir_cuori(self.evento, datos_cuori('1234567'))
+        Cuori.objects.create(**{**datos_cuori('7654321'), 'nombre_completo': 'María Pérez'})
+        modelo_admin = admin.site._registry[Cuori]
+        self.assertEqual(busqueda.campos_no_indexados(Cuori, modelo_admin.search_fields), [])
+        for termino, nombre in (('1234567', 'CUORI 1234567'), ('maria', 'María Pérez'), ('7654', 'María Pérez')):
+            resultados, _ = modelo_admin.get_search_results(None, Cuori.objects.all(), termino)
+            self.assertEqual([cuori.nombre_completo for cuori in resultados], [nombre], termino)
+        self.assertNotIn('LIKE', str(resultados.query))
+        # Nunca aparecen en la búsqueda pública
+        self.assertEqual(busqueda.buscar('maria'), [])
+
+
+class RelacionadosTests(TestCase):
+    """Contenido relacionado por etiquetas precalculado (core/relacionados.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.oracion, self.sanacion, self.familia = (
+            Tag.objects.create(name=nombre) for nombre in ('Oración', 'Sanación', 'Familia')
+        )
+        self.entradas = [BlogPost.objects.create(titulo=f'Entrada {i}', contenido='Contenido') for i in range(4)]
+        a, b, c, d = self.entradas
+        a.tags.set([self.oracion, self.sanacion])
+        b.tags.set([self.oracion, self.sanacion])
+        c.tags.add(self.oracion)
+        d.tags.add(self.familia)
+
+    def lista(self, objeto, modelo=BlogPost):
+        return list(relacionados.relacionados(objeto, modelo))
+
+    def test_ordena_por_similitud_de_etiquetas(self):
+        a, b, c, d = self.entradas
+        self.assertEqual(self.lista(a), [b, c])
+        # Empate: primero el más antiguo
+        self.assertEqual(self.lista(c), [a, b])
+        self.assertEqual(self.lista(d), [])
+
+    def test_senales_actualizan_las_listas(self):
+        a, b, c, d = self.entradas
+        self.familia.blogpost_set.add(a)
+        self.assertEqual(self.lista(d), [a])
+        a.tags.clear()
+        self.assertEqual(self.lista(b), [c])
+        self.assertEqual(self.lista(d), [])
+        b.tags.remove(self.sanacion)
+        self.assertEqual(self.lista(c), [b])
+
+        producto = Product.objects.create(name='Libro', price=1, category='libro')
+        producto.tags.add(self.oracion)
+        # b y c solo tienen Oración, como el producto
+        self.assertEqual(self.lista(producto), [b, c])
+        self.assertEqual(self.lista(b, Product), [producto])
+        c.delete()
+        self.assertEqual(self.lista(producto), [b])
+        self.oracion.delete()
+        self.assertEqual(self.lista(producto), [])
+
+    def test_reconstruir(self):
+        a, b, c, d = self.entradas
+        Relacionado.objects.all().delete()
+        call_command('reconstruir_relacionados', stdout=StringIO())
+        self.assertEqual(self.lista(a), [b, c])
+
+    def test_reconstruir_renueva_las_paginas_de_detalle(self):
+        a, b, c, d = self.entradas
+        etag = self.client.get(a.get_absolute_url())['ETag']
+        self.assertEqual(self.client.get(a.get_absolute_url(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconstruir_relacionados', stdout=StringIO())
+        response = self.client.get(a.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_vistas_de_detalle(self):
+        a, b, c, d = self.entradas
+        response = self.client.get(a.get_absolute_url())
+        self.assertEqual(response.context['posts_relacionados'][:2], [b, c])
+
+        evento = crear_evento(titulo='Retiro')
+        proximo = crear_evento(titulo='Vigilia', slug='vigilia')
+        pasado = crear_evento(titulo='Ayuno', slug='ayuno', fecha=timezone.now() - timezone.timedelta(days=7))
+        for e in (evento, proximo, pasado):
+            e.tags.add(self.sanacion)
+        response = self.client.get(reverse('evento_detalle', args=[evento.slug]))
+        self.assertEqual(response.context['eventos_relacionados'], [proximo])
+
+
+class PortadaTests(TestCase):
+    """Instantánea de la página de inicio (core/portada.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.sanacion = Tag.objects.create(name='Sanación')
+        self.evento = crear_evento()
+        self.evento.tags.add(self.sanacion)
+        self.antigua = BlogPost.objects.create(titulo='Antigua', contenido='Contenido')
+        self.antigua.tags.add(self.sanacion)
+        self.reciente = BlogPost.objects.create(titulo='Reciente', contenido='Contenido')
+        self.producto = Product.objects.create(name='Libro', price=1, category='libro')
+        self.producto.tags.add(self.sanacion)
+
+    def test_contenido_del_evento_del_mes(self):
+        inicio_mes = timezone.localtime(self.evento.fecha).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        datos = portada.construir(inicio_mes)
+        self.assertEqual(datos['evento']['slug'], self.evento.slug)
+        # Primero las entradas con sus etiquetas, luego las últimas publicadas
+        self.assertEqual([entrada['slug'] for entrada in datos['entradas']], [self.antigua.slug, self.reciente.slug])
+        # Valores simples, no instancias de los modelos
+        self.assertEqual(datos['productos'], [{'name': 'Libro', 'slug': self.producto.slug, 'category': 'Libro'}])
+        self.assertEqual(datos['conteos']['entradas'], 2)
+        self.assertEqual(datos['vence'], self.evento.fecha)
+
+    def test_sin_evento_vence_al_cambiar_el_mes(self):
+        Evento.objects.all().delete()
+        ahora = timezone.now()
+        datos = portada.construir(ahora)
+        self.assertIsNone(datos['evento'])
+        self.assertEqual([entrada['slug'] for entrada in datos['entradas']], [self.reciente.slug, self.antigua.slug])
+        self.assertEqual(datos['productos'], [])
+        self.assertEqual(datos['vence'], portada.inicio_mes_siguiente(ahora))
+
+    def test_se_reconstruye_al_vencer(self):
+        datos = portada.instantanea()
+        despues = datos['vence'] + timezone.timedelta(minutes=1)
+        with mock.patch('core.portada.timezone.now', return_value=despues):
+            self.assertGreater(portada.instantanea()['vence'], datos['vence'])
+
+    def test_escrituras_cambian_la_clave(self):
+        clave = portada.clave()
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(titulo='Nueva', contenido='Contenido')
+        self.assertNotEqual(portada.clave(), clave)
+
+        clave = portada.clave()
+        with self.captureOnCommitCallbacks(execute=True):
+            relacionados.reconstruir()
+        self.assertNotEqual(portada.clave(), clave)
+
+    def test_escritura_durante_la_construccion(self):
+        construir = portada.construir
+
+        def construir_y_escribir(ahora):
+            datos = construir(ahora)
+            # Se confirma después de leer la base de datos y antes de guardar en la caché
+            with self.captureOnCommitCallbacks(execute=True):
+                BlogPost.objects.create(titulo='Nueva', contenido='Contenido')
+            return datos
+
+        with mock.patch('core.portada.construir', construir_y_escribir):
+            self.assertNotIn('Nueva', [entrada['titulo'] for entrada in portada.instantanea()['entradas']])
+        self.assertIn('Nueva', [entrada['titulo'] for entrada in portada.instantanea()['entradas']])
@@ -1,59 +1,99 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.conf import settings
 from django.contrib import messages
-from django.db import IntegrityError
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Max, Q, Subquery
 from django.http import JsonResponse
-from .models import Evento, Inscripcion, Cuori
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from .models import Evento
 from .forms import InscripcionPublicaForm, CuoriForm
+from .services import inscribir_cuori, YaInscrito, CuposAgotados
+from . import busqueda, metricas, portada
+from .cache_paginas import cache_pagina, respuesta_condicional
+from .enrutador import solo_lectura
+from .relacionados import ids_relacionados, relacionados
+from .asincrono import alista, arender
+from .lookups import (
+    CAMPOS_CONTACTO, aconsulta_permitida, adatos_contacto_cuori, aevento_id_por_slug, ainscritos_evento,
+    datos_contacto_cuori, ip_cliente,
+)
 from django.utils import timezone
-import random
+import hashlib
+import json
 
 # Create your views here.
+@solo_lectura
+@cache_pagina('eventos', 'productos', 'blog')
 def home(request):
     """
     Esta es la vista para la página de inicio.
-    Incluye una sección de contenido recomendado basado en los eventos del mes.
+    Incluye una sección de contenido recomendado basado en el próximo evento
+    del mes, leída de la instantánea precalculada (ver core.portada).
     """
-    now = timezone.now()
-
-    # 1. Encontrar el tema del mes basado en el próximo evento
-    upcoming_event = Evento.objects.filter(fecha__year=now.year, fecha__month=now.month, fecha__gte=now).order_by('fecha').first()
-
-    # 2. Obtener contenido recomendado para la sección de blog
-    try:
-        from blog.models import BlogPost
-        recommended_items = BlogPost.objects.filter(
-            esta_publicado=True
-        ).order_by('-fecha_publicacion')[:6]  # últimos 6 posts
-    except:
-        # Si la app blog no está completamente configurada aún
-        recommended_items = []
-
+    datos = portada.instantanea()
     context = {
-        'upcoming_event': upcoming_event,
-        'recommended_items': recommended_items
+        'upcoming_event': datos['evento'],
+        'recommended_items': datos['entradas'],
+        'productos_recomendados': datos['productos'],
+        'paquetes_recomendados': datos['paquetes'],
+        'conteos': datos['conteos'],
     }
     return render(request, 'core/home.html', context)
 
+@cache_pagina()
 def about(request):
     """
     Esta es la vista para la página "Quiénes Somos".
     """
     return render(request, 'core/about.html')
 
-def eventos_list(request):
-    eventos = Evento.objects.all().order_by('fecha')
-    return render(request, 'core/eventos.html', {'eventos': eventos})
-
-def evento_detalle(request, evento_slug):
-    evento = get_object_or_404(Evento, slug=evento_slug)
+@solo_lectura
+@cache_pagina('eventos')
+async def eventos_list(request):
+    eventos = await alista(Evento.objects.order_by('fecha'))
+    return await arender(request, 'core/eventos.html', {'eventos': eventos})
+
+async def _ultima_modificacion_evento(request, evento_slug):
+    # El evento y sus relacionados
+    evento = Evento.objects.filter(slug=evento_slug)
+    eventos = Evento.objects.filter(
+        Q(slug=evento_slug) | Q(pk__in=ids_relacionados(Evento, Subquery(evento.values('pk')), Evento))
+    )
+    return (await eventos.aaggregate(m=Max('updated_at')))['m']
+
+@solo_lectura
+@respuesta_condicional('eventos', ultima_modificacion=_ultima_modificacion_evento)
+async def evento_detalle(request, evento_slug):
+    evento = await aget_object_or_404(Evento, slug=evento_slug)
     # Ya no se verifica si el usuario está inscrito usando request.user
     # La lógica de inscripción es ahora completamente pública
     esta_inscrito = False # Opcional: si quieres mantener la variable pero siempre en False
+    # Próximos eventos con etiquetas en común (precalculados en core.relacionados)
+    eventos_relacionados = await alista(relacionados(evento, Evento).filter(fecha__gte=timezone.now())[:3])
     context = {
         'evento': evento,
         'esta_inscrito': esta_inscrito,
+        'eventos_relacionados': eventos_relacionados,
     }
-    return render(request, 'core/evento_detalle.html', context)
+    return await arender(request, 'core/evento_detalle.html', context)
+
+@solo_lectura
+@cache_pagina('eventos', 'productos', 'blog')
+async def buscar(request):
+    """Búsqueda en eventos, productos, paquetes y blog con el índice de core/busqueda.py."""
+    texto = request.GET.get('q', '').strip()[:100]
+    tipo = request.GET.get('tipo')
+    tipos = [tipo] if tipo in busqueda.TIPOS else None
+    resultados = await sync_to_async(busqueda.buscar)(texto, tipos=tipos) if texto else []
+    context = {
+        'texto': texto,
+        'tipo': tipo if tipos else '',
+        'tipos': busqueda.TIPOS,
+        'resultados': resultados,
+    }
+    return await arender(request, 'core/buscar.html', context)
 
 def events(request):
     """
@@ -61,27 +101,31 @@ def events(request):
     """
     return render(request, 'core/eventos.html')
 
-def get_inscripcion_data_by_cedula(request):
+async def get_inscripcion_data_by_cedula(request):
+    if not await aconsulta_permitida(ip_cliente(request)):
+        return JsonResponse({'error': 'Demasiadas consultas. Intenta de nuevo en un minuto.'}, status=429)
+
     cedula = request.GET.get('cedula', None)
     evento_slug = request.GET.get('evento_slug', None)
     data = {'is_inscribed': False}
     if cedula:
-        cuori = Cuori.objects.filter(cedula=cedula).first()
+        cuori = await adatos_contacto_cuori(cedula)
         if cuori:
-            data = {
-                'nombre_completo': cuori.nombre_completo,
-                'numero_contacto': cuori.numero_contacto,
-                'numero_contacto_2': cuori.numero_contacto_2,
-                'email_contacto': cuori.email_contacto,
-                'pais': cuori.pais,
-                'departamento': cuori.departamento,
-                'ciudad': cuori.ciudad,
-            }
+            data = {campo: cuori[campo] for campo in CAMPOS_CONTACTO}
+            data['is_inscribed'] = False
             if evento_slug:
-                evento = Evento.objects.filter(slug=evento_slug).first()
-                if evento and Inscripcion.objects.filter(evento=evento, cuori=cuori).exists():
+                evento_id = await aevento_id_por_slug(evento_slug)
+                if evento_id and cuori['pk'] in await ainscritos_evento(evento_id):
                     data['is_inscribed'] = True
-    return JsonResponse(data)
+
+    # ETag calculado sobre la respuesta para poder devolver 304 Not Modified
+    contenido = json.dumps(data, sort_keys=True).encode()
+    etag = quote_etag(hashlib.md5(contenido).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(data)
+    response['ETag'] = etag
+    return response
 
 def inscribir_evento(request, evento_slug):
     evento = get_object_or_404(Evento, slug=evento_slug)
@@ -91,65 +135,25 @@ def inscribir_evento(request, evento_slug):
         inscripcion_form = InscripcionPublicaForm(request.POST, request.FILES)
 
         if cuori_form.is_valid() and inscripcion_form.is_valid():
-            cedula = cuori_form.cleaned_data['cedula']
-
-            # Obtener o crear el Cuori
-            cuori, created = Cuori.objects.get_or_create(
-                cedula=cedula,
-                defaults={
-                    'nombre_completo': cuori_form.cleaned_data['nombre_completo'],
-                    'numero_contacto': cuori_form.cleaned_data['numero_contacto'],
-                    'numero_contacto_2': cuori_form.cleaned_data['numero_contacto_2'],
-                    'email_contacto': cuori_form.cleaned_data['email_contacto'],
-                    'pais': cuori_form.cleaned_data['pais'],
-                    'departamento': cuori_form.cleaned_data['departamento'],
-                    'ciudad': cuori_form.cleaned_data['ciudad'],
-                }
-            )
-
-            # Si el Cuori ya existía, actualizar sus datos con la información del formulario
-            if not created:
-                cuori.nombre_completo = cuori_form.cleaned_data['nombre_completo']
-                cuori.numero_contacto = cuori_form.cleaned_data['numero_contacto']
-                cuori.numero_contacto_2 = cuori_form.cleaned_data['numero_contacto_2']
-                cuori.email_contacto = cuori_form.cleaned_data['email_contacto']
-                cuori.pais = cuori_form.cleaned_data['pais']
-                cuori.departamento = cuori_form.cleaned_data['departamento']
-                cuori.ciudad = cuori_form.cleaned_data['ciudad']
-                cuori.save()
-                # No usar messages.info aquí, se manejará en el frontend
-
-            # Verificar si ya existe una inscripción para este evento con este Cuori
-            if Inscripcion.objects.filter(evento=evento, cuori=cuori).exists():
+            try:
+                inscribir_cuori(evento, cuori_form.cleaned_data)
+            except YaInscrito:
                 # Si es una solicitud AJAX, devolver JSON
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                     return JsonResponse({'success': False, 'message': f'Ya estás inscrito(a) en {evento.titulo}. Tus datos de contacto han sido actualizados.'})
                 # Si no es AJAX, usar messages y redireccionar
                 messages.warning(request, f'Ya estás inscrito(a) en {evento.titulo}. Tus datos de contacto han sido actualizados.')
                 return redirect('inscripcion_confirmacion', evento_slug=evento.slug)
-
-            if evento.cupos_disponibles <= 0 and evento.tipo_asistencia == 'LIMITADO':
+            except CuposAgotados:
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                     return JsonResponse({'success': False, 'message': 'Lo sentimos, ya no hay cupos disponibles para este evento.'})
                 messages.error(request, 'Lo sentimos, ya no hay cupos disponibles para este evento.')
                 return redirect('evento_detalle', evento_slug=evento.slug)
 
-            try:
-                inscripcion = inscripcion_form.save(commit=False)
-                inscripcion.evento = evento
-                inscripcion.cuori = cuori # Asignar el Cuori a la inscripción
-                inscripcion.save()
-
-                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                    return JsonResponse({'success': True, 'message': f'¡Te has pre-inscrito exitosamente en {evento.titulo}! Por favor, espera la confirmación.'})
-                messages.success(request, f'¡Te has pre-inscrito exitosamente en {evento.titulo}! Por favor, espera la confirmación.')
-                return redirect('inscripcion_confirmacion', evento_slug=evento.slug)
-            except IntegrityError:
-                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                    return JsonResponse({'success': False, 'message': 'Hubo un error al procesar tu inscripción. Por favor, inténtalo de nuevo.'})
-                messages.error(request, 'Hubo un error al procesar tu inscripción. Por favor, inténtalo de nuevo.')
-                # Esto podría ocurrir si hay una condición de carrera y se intenta crear una inscripción duplicada
-                # aunque ya se haya verificado antes. Es una capa extra de seguridad.
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse({'success': True, 'message': f'¡Te has pre-inscrito exitosamente en {evento.titulo}! Por favor, espera la confirmación.'})
+            messages.success(request, f'¡Te has pre-inscrito exitosamente en {evento.titulo}! Por favor, espera la confirmación.')
+            return redirect('inscripcion_confirmacion', evento_slug=evento.slug)
         else:
             # Si la validación del formulario falla, devolver errores en JSON para AJAX
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -165,18 +169,10 @@ def inscribir_evento(request, evento_slug):
         cedula_param = request.GET.get('cedula')
         if cedula_param:
             # Buscar un Cuori existente para pre-llenar el formulario de Cuori
-            cuori_existente = Cuori.objects.filter(cedula=cedula_param).first()
+            cuori_existente = datos_contacto_cuori(cedula_param)
             if cuori_existente:
-                initial_cuori_data = {
-                    'nombre_completo': cuori_existente.nombre_completo,
-                    'cedula': cuori_existente.cedula,
-                    'numero_contacto': cuori_existente.numero_contacto,
-                    'numero_contacto_2': cuori_existente.numero_contacto_2,
-                    'email_contacto': cuori_existente.email_contacto,
-                    'pais': cuori_existente.pais,
-                    'departamento': cuori_existente.departamento,
-                    'ciudad': cuori_existente.ciudad,
-                }
+                initial_cuori_data = {campo: cuori_existente[campo] for campo in CAMPOS_CONTACTO}
+                initial_cuori_data['cedula'] = cedula_param
         cuori_form = CuoriForm(initial=initial_cuori_data)
         inscripcion_form = InscripcionPublicaForm()
 
@@ -187,3 +183,17 @@ def inscribir_evento(request, evento_slug):
     }
     return render(request, 'core/inscripcion_publica_form.html', context)
 
+
+
+@staff_member_required
+def metricas_vistas(request):
+    """
+    Consultas y tiempos agregados por vista desde que arrancó el proceso
+    (requiere settings.METRICAS_VISTAS). POST con reiniciar=1 las borra.
+    """
+    if request.method == 'POST' and request.POST.get('reiniciar') == '1':
+        metricas.reiniciar()
+    return JsonResponse({
+        'activo': getattr(settings, 'METRICAS_VISTAS', False),
+        'vistas': metricas.resumen(),
+    })
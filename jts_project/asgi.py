@@ -5,6 +5,38 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Perfil de despliegue con uvicorn
+--------------------------------
+Las vistas públicas de lectura (eventos, catálogo, blog) y la API de cédulas
+del formulario de inscripción son asíncronas: una conexión lenta solo ocupa
+el bucle de eventos mientras espera, y un hilo únicamente durante las
+consultas a la base de datos. La inscripción, el inicio y el admin siguen
+siendo síncronos y Django los ejecuta en hilos.
+
+    DB_PERFIL=produccion uvicorn jts_project.asgi:application \
+        --host 127.0.0.1 --port 8000 \
+        --workers 2 \
+        --limit-concurrency 4000 \
+        --backlog 4096 \
+        --timeout-keep-alive 20 \
+        --proxy-headers --forwarded-allow-ips 127.0.0.1
+
+- --workers: SQLite admite un solo escritor a la vez, así que más procesos
+  no aumentan las inscripciones por segundo; dos bastan para aprovechar la
+  espera de red de uno mientras el otro consulta.
+- --limit-concurrency: conexiones simultáneas por proceso antes de responder
+  503, para no agotar la memoria en la apertura de inscripciones.
+- --timeout-keep-alive: segundos que se conserva una conexión inactiva.
+- La caché tiene que ser compartida entre los workers y el proceso del
+  importador (CACHE_DIR o CACHE_REDIS en settings); `manage.py check`
+  rechaza LocMemCache con DB_PERFIL=produccion.
+- DB_PERFIL=produccion (jts_project/basedatos.py): WAL y busy_timeout, para
+  que las lecturas no esperen a las inscripciones. Con DB_LECTURA las páginas
+  públicas leen además de una conexión de solo lectura.
+- Los archivos estáticos y media los sirve el servidor web de adelante
+  (collectstatic en STATIC_ROOT), con Cache-Control inmutable para los
+  nombres direccionados por contenido (ver core/storage.py).
 """
 
 import os
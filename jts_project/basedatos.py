@@ -0,0 +1,102 @@
+"""
+Perfiles de configuración de la base de datos SQLite.
+
+settings.DATABASES se arma con configuracion_sqlite(), y el perfil se elige con
+la variable de entorno DB_PERFIL:
+
+- desarrollo (por defecto): la configuración de siempre de Django, con
+  journal en modo rollback y una conexión nueva por petición.
+- produccion: journal en modo WAL (los lectores no bloquean al escritor ni al
+  revés), synchronous=NORMAL, espera de hasta busy_timeout ms cuando la base
+  está bloqueada en lugar de fallar enseguida, mmap y caché de páginas más
+  grandes, conexiones persistentes con verificación de salud y transacciones
+  IMMEDIATE.
+
+Con transacciones IMMEDIATE cada transaction.atomic() toma el bloqueo de
+escritura al empezar. En el modo por defecto (DEFERRED) una transacción que
+primero lee y luego escribe, como inscribir_cuori, tiene que promover su
+bloqueo a mitad de camino, y si otro escritor se adelantó SQLite responde
+"database is locked" sin esperar el busy_timeout. En este proyecto los bloques
+atómicos son todos de escritura, así que no se pierde concurrencia de lectura.
+
+`manage.py bench_concurrencia` compara el rendimiento de los dos perfiles con
+lectores y escritores simultáneos.
+
+La variable DB_LECTURA agrega el alias de solo lectura 'lectura' que usan las
+páginas públicas (ver core/enrutador.py): con DB_LECTURA=ro es una segunda
+conexión a la misma base abierta con mode=ro, y con DB_LECTURA=/ruta/archivo
+es una réplica que `manage.py actualizar_replica` copia con la API de backup
+en línea de SQLite.
+"""
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+PERFIL_POR_DEFECTO = 'desarrollo'
+
+PRAGMAS_PRODUCCION = {
+    'journal_mode': 'WAL',
+    # Con WAL, NORMAL no corrompe la base ante una caída del proceso; solo un
+    # corte de energía puede perder las últimas transacciones confirmadas
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'mmap_size': 128 * 1024 * 1024,  # bytes
+    'cache_size': -20000,  # negativo: KiB (unos 20 MB por conexión)
+    'temp_store': 'MEMORY',
+}
+
+
+def _init_command(pragmas):
+    return ';'.join(f'PRAGMA {pragma}={valor}' for pragma, valor in pragmas.items())
+
+
+PERFILES = {
+    'desarrollo': {
+        'OPTIONS': {},
+    },
+    'produccion': {
+        'OPTIONS': {
+            'init_command': _init_command(PRAGMAS_PRODUCCION),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Segundos que se reutiliza una conexión; CONN_HEALTH_CHECKS la
+        # descarta antes de la petición si ya no responde
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+
+def configuracion_sqlite(nombre, perfil=PERFIL_POR_DEFECTO):
+    """Diccionario para settings.DATABASES de la base SQLite `nombre` con el perfil indicado."""
+    if perfil not in PERFILES:
+        raise ImproperlyConfigured(
+            f"Perfil de base de datos desconocido: {perfil!r} (opciones: {', '.join(PERFILES)})"
+        )
+    opciones = PERFILES[perfil]
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': nombre,
+        **opciones,
+        'OPTIONS': dict(opciones['OPTIONS']),
+    }
+
+
+def configuracion_lectura(nombre, replica='ro', perfil=PERFIL_POR_DEFECTO):
+    """
+    Diccionario para el alias de solo lectura: la misma base `nombre` si
+    replica es 'ro', o el archivo réplica indicado, abiertos con mode=ro.
+    """
+    archivo = Path(nombre if replica == 'ro' else replica).resolve()
+    configuracion = configuracion_sqlite(f'{archivo.as_uri()}?mode=ro', perfil)
+    opciones = configuracion['OPTIONS']
+    # Una conexión de solo lectura no puede cambiar el journal ni tomar el
+    # bloqueo de escritura
+    opciones.pop('transaction_mode', None)
+    if 'init_command' in opciones:
+        opciones['init_command'] = _init_command(
+            {pragma: valor for pragma, valor in PRAGMAS_PRODUCCION.items() if pragma != 'journal_mode'}
+        )
+    # En las pruebas lee de la base de datos de prueba de 'default'
+    configuracion['TEST'] = {'MIRROR': 'default'}
+    return configuracion
@@ -0,0 +1,43 @@
+"""
+Caché aislada para las pruebas y los benchmarks.
+
+La caché configurada en settings es la compartida por los workers (Redis o
+la carpeta CACHE_DIR). Las pruebas y los comandos bench siembran datos y
+llaman a cache.clear(), así que corridos contra un despliegue envenenarían
+las cédulas consultadas, las generaciones, los límites de consultas y los
+latidos de las importaciones. setup_databases() solo aísla la base de datos:
+la caché se reemplaza con caches_temporales() en una carpeta temporal.
+
+Es una caché en archivos y no LocMemCache para que las pruebas que corren
+código en otro proceso (core.tests.en_otro_proceso) la compartan, pasándoles
+la carpeta en la variable de entorno CACHE_DIR.
+"""
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def caches_temporales(carpeta):
+    """Configuración de CACHES en la carpeta dada, para override_settings()."""
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(carpeta),
+        },
+    }
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """DiscoverRunner con la caché en una carpeta temporal (ver TEST_RUNNER en settings)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._carpeta_cache = tempfile.TemporaryDirectory(prefix='cache-pruebas-')
+        self._cache = override_settings(CACHES=caches_temporales(self._carpeta_cache.name))
+        self._cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.disable()
+        self._carpeta_cache.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
 
+from .basedatos import configuracion_lectura, configuracion_sqlite
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,8 +44,43 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.LecturaEscrituraMiddleware',
+    'core.middleware.MetricasVistasMiddleware',
 ]
 
+# Métricas de consultas y tiempos por vista (core.metricas), desactivadas por defecto
+METRICAS_VISTAS = os.environ.get('METRICAS_VISTAS') == '1'
+
+# Segundos que se guardan las páginas públicas para visitantes anónimos (core.cache_paginas)
+CACHE_PAGINAS_TIEMPO = 60 * 10
+
+# Caché compartida por todos los procesos (los workers de uvicorn y el del
+# importador): las generaciones de core.generaciones, las páginas, las
+# consultas de cédulas y la portada tienen que verse igual en todos. Con
+# CACHE_REDIS=redis://... se usa Redis (requiere el paquete redis); si no, una
+# carpeta de archivos (CACHE_DIR). LocMemCache es por proceso y el chequeo
+# core.E001 la rechaza con DB_PERFIL=produccion.
+if os.environ.get('CACHE_REDIS'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / '.cache'),
+            # Al pasar el máximo se borra un tercio de las entradas al azar
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# Las pruebas usan una caché en una carpeta temporal y no la compartida (ver
+# jts_project/pruebas.py)
+TEST_RUNNER = 'jts_project.pruebas.EjecutorPruebas'
+
 ROOT_URLCONF = 'jts_project.urls'
 
 TEMPLATES = [
@@ -66,13 +103,34 @@ WSGI_APPLICATION = 'jts_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_PERFIL=produccion activa WAL, conexiones persistentes y transacciones
+# IMMEDIATE (ver jts_project/basedatos.py)
+
+DB_PERFIL = os.environ.get('DB_PERFIL', 'desarrollo')
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_sqlite(BASE_DIR / 'db.sqlite3', DB_PERFIL),
 }
+# Base de pruebas en archivo y no en memoria, para que las pruebas de
+# inscripciones concurrentes tengan escritores reales en varias conexiones
+DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# DB_LECTURA=ro (o la ruta de una réplica) agrega un alias de solo lectura para
+# las páginas públicas; el resto sigue en 'default' (ver core/enrutador.py).
+# Las pruebas se corren sin DB_LECTURA.
+if os.environ.get('DB_LECTURA'):
+    DATABASES['lectura'] = configuracion_lectura(BASE_DIR / 'db.sqlite3', os.environ['DB_LECTURA'], DB_PERFIL)
+
+DATABASE_ROUTERS = ['core.enrutador.EnrutadorLecturaEscritura']
+
+# Proxies inversos cuyas peticiones traen la IP del cliente en
+# ENCABEZADO_IP_CLIENTE (clave de request.META), para el límite de consultas de
+# cédulas (core.lookups.ip_cliente)
+PROXIES_CONFIABLES = [ip for ip in os.environ.get('PROXIES_CONFIABLES', '127.0.0.1,::1').split(',') if ip]
+ENCABEZADO_IP_CLIENTE = 'HTTP_X_FORWARDED_FOR'
+
+# Segundos que un navegador que acaba de escribir sigue leyendo de 'default'
+LECTURA_PRIMARIA_TRAS_ESCRITURA = 60
 
 
 # Password validation
@@ -121,6 +179,16 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Archivos subidos direccionados por contenido: sin copias repetidas y con URLs inmutables
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.AlmacenamientoPorContenido',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.storage import servir_media
 
 admin.site.site_header = "Panel de Administración Jesús te Sana"
 admin.site.site_title = "Admin JTS"
@@ -31,4 +32,4 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=servir_media, document_root=settings.MEDIA_ROOT)
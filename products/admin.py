@@ -5,7 +5,10 @@ from django.utils.html import format_html
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.http import HttpResponseRedirect
-from .models import Product, Package
+from core.busqueda import BusquedaAdminMixin
+
+from .jobs import rows_written
+from .models import Product, Package, ImportJob
 
 class ProductAdminForm(forms.ModelForm):
     class Meta:
@@ -19,7 +22,7 @@ class ProductAdminForm(forms.ModelForm):
         }
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     form = ProductAdminForm
     list_display = ('name', 'category', 'get_authors', 'price', 'is_available', 'created_at')
     list_filter = ('category', 'is_available')
@@ -53,11 +56,12 @@ class ProductAdmin(admin.ModelAdmin):
         # Agregar el botón de importación de Google Sheets
         extra_context['show_google_sheet_import'] = True
         extra_context['import_url'] = reverse('products:import_products_from_sheet')
+        extra_context['import_status_url'] = reverse('products:import_jobs_status')
         extra_context['title'] = 'Productos'
         return super().changelist_view(request, extra_context=extra_context)
 
 @admin.register(Package)
-class PackageAdmin(admin.ModelAdmin):
+class PackageAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'price', 'is_available', 'created_at')
     list_filter = ('is_available',)
     search_fields = ('name', 'description')
@@ -74,4 +78,22 @@ class PackageAdmin(admin.ModelAdmin):
         ('Etiquetas', {
             'fields': ('tags',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('sheet_url', 'status', 'rows_processed', 'get_rows_written', 'imported_count', 'get_error_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('sheet_url', 'delete_existing', 'status', 'rows_processed', 'get_rows_written', 'imported_count', 'summary', 'errors', 'created_at', 'started_at', 'finished_at')
+
+    def get_rows_written(self, obj):
+        return rows_written(obj)
+    get_rows_written.short_description = 'Filas escritas'
+
+    def get_error_count(self, obj):
+        return len(obj.errors)
+    get_error_count.short_description = 'Errores'
+
+    def has_add_permission(self, request):
+        # Las importaciones se crean desde el listado de productos
+        return False
@@ -1,14 +1,60 @@
 """
 Funcionalidad de importación de productos desde Google Sheets (sin API directa)
 """
-import pandas as pd
-import io
 import csv
-import requests
+import hashlib
+import io
+import json
+import math
+import pickle
+import tempfile
+from decimal import Decimal
 from urllib.parse import urlparse, parse_qs
-from io import StringIO
+
+import requests
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core import busqueda, generaciones
+
 from .models import Product
 
+# Nombres de columna aceptados para cada campo, en orden de preferencia
+COLUMN_ALIASES = {
+    'name': ['name', 'Name', 'producto', 'Producto'],
+    'description': ['description', 'Description', 'descripción', 'Descripción'],
+    'price': ['price', 'Price', 'precio', 'Precio'],
+    'category': ['categories', 'category', 'Category', 'categoría', 'Categoría'],
+    'book_type': ['book_type', 'bookType', 'booktype'],
+    'is_available': ['is_available', 'available', 'disponible'],
+    'measures': ['measures', 'Measures', 'medidas', 'Medidas', 'measurements'],
+    'pages': ['pages', 'Pages', 'páginas', 'Páginas', 'page_count'],
+    'authors': ['authors', 'author', 'Authors', 'Autor', 'autores'],
+}
+
+# Variantes comunes de los nombres de categorías
+CATEGORY_ALIASES = {
+    **dict.fromkeys(['libro', 'libros', 'book', 'books'], 'libro'),
+    **dict.fromkeys(['serie', 'series', 'bolsillo', 'pocket', 'collection', 'bolsillos'], 'serie'),
+    **dict.fromkeys(['paquete', 'packages', 'package', 'pack'], 'paquete'),
+    **dict.fromkeys(['otro producto', 'otro_producto', 'otros productos', 'other product', 'other products'], 'otro_producto'),
+}
+
+# Tipos de libro que indican que un producto pertenece a la categoría serie
+SERIES_BOOK_TYPES = ['serie_bolsillo', 'serie bolsillo', 'bolsillo', 'pocket', 'series']
+
+FALSE_VALUES = ['false', '0', 'no', 'n', 'f']
+
+# Campos del producto que escribe el importador
+PRODUCT_FIELDS = ['description', 'price', 'category', 'is_available', 'measures', 'pages', 'authors']
+
+BATCH_SIZE = 500
+
+# Tiempo máximo de espera (segundos) para conectar y para cada bloque de la descarga
+DOWNLOAD_TIMEOUT = 30
+
+
 def extract_sheet_id_from_url(sheet_url):
     """
     Extrae el ID del documento de Google Sheets de la URL
@@ -23,28 +69,311 @@ def extract_sheet_id_from_url(sheet_url):
                 sheet_id_index = path_parts.index('d') + 1
                 if sheet_id_index < len(path_parts):
                     return path_parts[sheet_id_index]
-        
+
         # Si no se encuentra en el path, intentar con query parameters
         query_params = parse_qs(parsed.query)
         if 'key' in query_params:
             return query_params['key'][0]
-            
+
         raise ValueError("No se pudo extraer el ID del Google Sheet")
     except:
         raise ValueError("URL de Google Sheets inválida")
 
-def import_products_with_gspread(sheet_url, delete_existing=False):
+
+def _clean_value(value):
+    """Convierte un valor de celda a texto, tratando vacíos, 'nan' y 'none' como ''."""
+    if value is None:
+        return ''
+    text = str(value).strip()
+    return '' if text.lower() in ('nan', 'none') else text
+
+
+def _first_value(raw, aliases):
+    """Primer valor no vacío entre las columnas alias de la fila."""
+    for alias in aliases:
+        value = _clean_value(raw.get(alias))
+        if value:
+            return value
+    return ''
+
+
+def _to_number(value):
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def normalize_category(raw_category, book_type):
+    """Traduce las variantes de categoría; el resto se decide por el tipo de libro."""
+    category = raw_category.lower()
+    if not category:
+        return 'otro_producto'
+    if category in CATEGORY_ALIASES:
+        return CATEGORY_ALIASES[category]
+    return 'serie' if book_type.lower() in SERIES_BOOK_TYPES else 'otro_producto'
+
+
+def normalize_row(raw):
+    """Normaliza una fila del sheet (diccionario columna -> valor)."""
+    values = {field: _first_value(raw, aliases) for field, aliases in COLUMN_ALIASES.items()}
+    price = _to_number(values['price']) or 0.0
+    pages = _to_number(values['pages'])
+    return {
+        'name': values['name'],
+        'description': values['description'],
+        'measures': values['measures'],
+        'authors': values['authors'],
+        'price': Decimal(str(round(price, 2))),
+        'pages': int(pages) if pages is not None else None,
+        'category': normalize_category(values['category'], values['book_type']),
+        'is_available': values['is_available'].lower() not in FALSE_VALUES,
+    }
+
+
+def csv_rows(lines):
     """
-    Importa productos desde un Google Sheet exportando como CSV.
-    Esta función permite al usuario copiar y pegar el contenido o descargar como CSV.
+    Genera (número de fila, datos del producto) leyendo el CSV fila a fila, sin
+    cargarlo completo en memoria.
     """
-    errors = []
-    imported_count = 0
-    
-    try:
+    for row_number, raw in enumerate(csv.DictReader(lines), start=1):
+        yield row_number, normalize_row(raw)
+
+
+def _clean_text(series):
+    """Convierte una columna a texto, tratando vacíos, 'nan' y 'none' como ''."""
+    text = series.astype(str).str.strip()
+    return text.mask(series.isna() | text.str.lower().isin(['nan', 'none']), '')
+
+
+def _coalesce(df, aliases):
+    """Primer valor no vacío entre las columnas alias, fila a fila."""
+    import pandas as pd
+
+    result = pd.Series('', index=df.index, dtype=object)
+    for alias in reversed(aliases):
+        if alias in df.columns:
+            column = _clean_text(df[alias])
+            result = column.where(column != '', result)
+    return result
+
+
+def normalize_dataframe(df):
+    """
+    Normaliza las columnas del sheet de una sola vez sobre todo el DataFrame y
+    devuelve un DataFrame con una columna por campo del producto.
+    Requiere pandas, que es una dependencia opcional.
+    """
+    import pandas as pd
+
+    columns = {field: _coalesce(df, aliases) for field, aliases in COLUMN_ALIASES.items()}
+    normalized = pd.DataFrame(index=df.index)
+
+    normalized['name'] = columns['name']
+    normalized['description'] = columns['description']
+    normalized['measures'] = columns['measures']
+    normalized['authors'] = columns['authors']
+    normalized['price'] = pd.to_numeric(columns['price'], errors='coerce').fillna(0.0).round(2)
+
+    pages = pd.to_numeric(columns['pages'], errors='coerce')
+    normalized['pages'] = pages.astype(object).where(pages.notna(), None)
+
+    # Categorías: se traducen las variantes conocidas; el resto (p. ej. 'producto')
+    # se decide por el tipo de libro
+    raw_category = columns['category'].str.lower()
+    is_series = columns['book_type'].str.lower().isin(SERIES_BOOK_TYPES) & (raw_category != '')
+    fallback = pd.Series('otro_producto', index=df.index).mask(is_series, 'serie')
+    normalized['category'] = raw_category.map(CATEGORY_ALIASES).fillna(fallback)
+
+    normalized['is_available'] = ~columns['is_available'].str.lower().isin(FALSE_VALUES)
+    return normalized
+
+
+def dataframe_rows(df):
+    """Genera (número de fila, datos del producto) a partir de un DataFrame normalizado."""
+    for idx, record in zip(df.index, df.to_dict('records')):
+        if record['pages'] is not None:
+            record['pages'] = int(record['pages'])
+        record['price'] = Decimal(str(record['price']))
+        record['is_available'] = bool(record['is_available'])
+        yield idx + 1, record
+
+
+def row_fingerprint(data):
+    """Hash del contenido de una fila normalizada, para detectar filas sin cambios."""
+    content = {field: str(data[field]) for field in ['name'] + PRODUCT_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ProductBatchWriter:
+    """
+    Escribe los productos importados con bulk_create/bulk_update en lotes,
+    omitiendo los productos cuya fila no cambió desde la última importación.
+    Debe usarse dentro de una transacción.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.errors = []
+        self.summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0}
+        self._to_create = {}
+        self._to_update = {}
+        self._seen = set()
+        # Catálogo actual precargado por nombre y por slug
+        self._existing = {product.name: product for product in Product.objects.all()}
+        self._slugs = {product.slug: product.name for product in self._existing.values()}
+
+    def add(self, row_number, data):
+        name = data['name']
+        if not name:
+            self.errors.append(f"Fila {row_number}: No se encontró un nombre de producto válido")
+            return
+
+        if name in self._seen:
+            self.errors.append(f"Fila {row_number}: El producto '{name}' está repetido en el sheet; se usa la primera fila")
+            return
+        self._seen.add(name)
+
+        fingerprint = row_fingerprint(data)
+        product = self._existing.get(name)
+        if product is None:
+            slug = slugify(name)
+            if slug in self._slugs:
+                self.errors.append(f"Fila {row_number}: El slug '{slug}' ya está en uso por '{self._slugs[slug]}'")
+                return
+            product = Product(name=name, slug=slug)
+            self._slugs[slug] = name
+            self._to_create[name] = product
+        elif product.sheet_hash == fingerprint and product.is_available == data['is_available']:
+            self.summary['unchanged'] += 1
+            return
+        else:
+            self._to_update[name] = product
+
+        for field in PRODUCT_FIELDS:
+            setattr(product, field, data[field])
+        product.sheet_hash = fingerprint
+
+        if len(self._to_create) + len(self._to_update) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._to_create:
+            created = Product.objects.bulk_create(self._to_create.values(), batch_size=self.batch_size)
+            self.summary['created'] += len(created)
+            self._existing.update((product.name, product) for product in created)
+            busqueda.indexar(created)
+        if self._to_update:
+            now = timezone.now()
+            for product in self._to_update.values():
+                product.updated_at = now
+            Product.objects.bulk_update(
+                self._to_update.values(), PRODUCT_FIELDS + ['sheet_hash', 'updated_at'], batch_size=self.batch_size
+            )
+            self.summary['updated'] += len(self._to_update)
+            busqueda.indexar(self._to_update.values())
+        self._to_create = {}
+        self._to_update = {}
+
+    def deactivate_missing(self):
+        """Marca como no disponibles los productos que ya no aparecen en el sheet."""
+        missing = [
+            product.pk for name, product in self._existing.items()
+            if name not in self._seen and product.is_available
+        ]
+        now = timezone.now()
+        for start in range(0, len(missing), self.batch_size):
+            batch = Product.objects.filter(pk__in=missing[start:start + self.batch_size])
+            self.summary['deactivated'] += batch.update(is_available=False, updated_at=now)
+            busqueda.indexar(batch)
+
+
+def write_products(rows, delete_existing=False, deactivate_missing=False, progress=None):
+    """
+    Escribe las filas (número de fila, datos) en una sola transacción: si algo
+    falla no se aplica ningún cambio, ni siquiera el borrado del catálogo.
+    Con deactivate_missing los productos que no están en las filas se marcan
+    como no disponibles. progress(filas escritas) se llama cada BATCH_SIZE
+    filas y al terminar; como la transacción sigue abierta, no debe escribir
+    en la base de datos (ver products.jobs).
+    Devuelve (resumen con created/updated/unchanged/deactivated, errores por fila).
+    """
+    # Las señales de cada producto borrado incrementan la generación una sola vez
+    with generaciones.agrupar_incrementos(), transaction.atomic():
         if delete_existing:
             Product.objects.all().delete()
+        writer = ProductBatchWriter()
+        rows_written = 0
+        for row_number, data in rows:
+            writer.add(row_number, data)
+            rows_written += 1
+            if progress and rows_written % BATCH_SIZE == 0:
+                progress(rows_written)
+        writer.flush()
+        if progress:
+            progress(rows_written)
+        if deactivate_missing:
+            writer.deactivate_missing()
+        # bulk_create/bulk_update no envían señales: el índice de búsqueda se
+        # actualiza en flush() y deactivate_missing(). Una resincronización sin
+        # cambios no invalida las páginas ni los ETag de los productos.
+        summary = writer.summary
+        if delete_existing or summary['created'] or summary['updated'] or summary['deactivated']:
+            generaciones.incrementar('products.Product')
+    return writer.summary, writer.errors
+
+
+def spool_rows(rows, progress=None):
+    """
+    Guarda las filas normalizadas en un archivo temporal mientras se descargan,
+    para no mantener abierta la transacción de escritura durante la descarga.
+    progress(filas leídas) se llama cada BATCH_SIZE filas y al terminar.
+    """
+    spool = tempfile.TemporaryFile()
+    rows_read = 0
+    for row in rows:
+        pickle.dump(row, spool)
+        rows_read += 1
+        if progress and rows_read % BATCH_SIZE == 0:
+            progress(rows_read)
+    if progress:
+        progress(rows_read)
+    spool.seek(0)
+    return spool
+
+
+def spooled_rows(spool):
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+def _response_lines(response):
+    """Lee la respuesta HTTP por bloques como texto, sin copiar el contenido completo."""
+    response.raw.decode_content = True
+    return io.TextIOWrapper(response.raw, encoding='utf-8-sig', newline='')
+
+
+def sync_products_with_gspread(sheet_url, delete_existing=False, deactivate_missing=True, use_pandas=False, progress=None,
+                               write_progress=None):
+    """
+    Sincroniza el catálogo con un Google Sheet exportado como CSV: crea los
+    productos nuevos, actualiza solo las filas que cambiaron y marca como no
+    disponibles los productos que ya no están en el sheet.
+
+    Por defecto el CSV se procesa en streaming, fila a fila; con use_pandas=True
+    se carga en un DataFrame (requiere pandas instalado). progress se llama con
+    el número de filas leídas (ver spool_rows) y write_progress con el de filas
+    escritas (ver write_products).
+    Devuelve (resumen de la sincronización, errores).
+    """
+    errors = []
+    summary = {}
 
+    try:
         # Extraer ID del sheet y construir URL para exportar como CSV
         try:
             sheet_id = extract_sheet_id_from_url(sheet_url)
@@ -54,158 +383,51 @@ def import_products_with_gspread(sheet_url, delete_existing=False):
 
             # Intentar descargar y leer el CSV
             try:
-                # Intentar leer directamente desde la URL
-                response = requests.get(csv_url)
-                
-                if response.status_code == 200:
-                    # Decodificar el contenido CSV
-                    csv_content = response.content.decode('utf-8')
-                    csv_data = csv_content
-                    
-                    # Usar pandas para leer el CSV
-                    df = pd.read_csv(StringIO(csv_data))
-                    
-                    # Procesar cada fila del CSV
-                    for idx, row in df.iterrows():
-                        # Asegurarse de que los datos requeridos existan
-                        name = str(row.get('name', '')).strip()
-                        if not name:
-                            name = str(row.get('Name', '')).strip()  # También intentar variaciones
-                            if not name:
-                                name = str(row.get('producto', '')).strip()
-                                if not name:
-                                    name = str(row.get('Producto', '')).strip()
-                        
-                        if not name:
-                            errors.append(f"Fila {idx+1}: No se encontró un nombre de producto válido")
-                            continue
-                        
-                        # Extraer otros campos con posibles variaciones
-                        description = str(row.get('description', ''))
-                        if not description or description == 'nan':
-                            description = str(row.get('Description', ''))
-                            if not description or description == 'nan':
-                                description = str(row.get('descripción', ''))
-                                if not description or description == 'nan':
-                                    description = str(row.get('Descripción', ''))
-                        
-                        try:
-                            price_value = row.get('price', row.get('Price', row.get('precio', row.get('Precio', 0))))
-                            if pd.isna(price_value) or str(price_value).lower() == 'nan' or str(price_value).strip() == '':
-                                price = 0.0
-                            else:
-                                price = float(price_value)
-                        except (ValueError, TypeError):
-                            price = 0.0
-                        
-                        # Obtener y procesar el valor de categoría
-                        raw_category = row.get('categories', row.get('category', row.get('Category', row.get('categoría', row.get('Categoría', 'otro_producto')))))
-                        
-                        if pd.isna(raw_category) or str(raw_category).lower() == 'nan' or str(raw_category).strip() == '':
-                            category = 'otro_producto'
+                # Leer directamente desde la URL, por bloques
+                with requests.get(csv_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    if response.status_code == 200:
+                        lines = _response_lines(response)
+                        if use_pandas:
+                            import pandas as pd
+                            rows = dataframe_rows(normalize_dataframe(pd.read_csv(lines)))
                         else:
-                            category = str(raw_category).strip().lower()
-                            
-                            # Validar que la categoría sea una de las válidas
-                            valid_categories = ['paquete', 'serie', 'libro', 'otro_producto']
-                            
-                            # Manejar variantes comunes de nombres de categorías
-                            if category in ['producto', 'productos', 'product', 'prod']:
-                                # Determinar si debería ser 'otro_producto' basado en el campo book_type
-                                book_type_raw = str(row.get('book_type', row.get('bookType', row.get('booktype', '')))).lower()
-                                
-                                # Si el tipo de libro indica serie o bolsillo, usar categoría serie
-                                if book_type_raw in ['serie_bolsillo', 'serie bolsillo', 'bolsillo', 'pocket', 'series']:
-                                    category = 'serie'
-                                else:
-                                    category = 'otro_producto'  # Valor por defecto para 'producto'
-                            elif category in ['libro', 'libros', 'book', 'books']:
-                                category = 'libro'
-                            elif category in ['serie', 'series', 'bolsillo', 'pocket', 'collection', 'bolsillos']:
-                                category = 'serie'
-                            elif category in ['paquete', 'packages', 'package', 'pack']:
-                                category = 'paquete'
-                            elif category in ['otro producto', 'otro_producto', 'otros productos', 'other product', 'other products']:
-                                category = 'otro_producto'
-                            else:
-                                # Si aún no es válida después de la transformación, usar valor por defecto
-                                book_type_raw = str(row.get('book_type', row.get('bookType', row.get('booktype', '')))).lower()
-                                
-                                # Si el tipo de libro indica serie o bolsillo, usar categoría serie
-                                if book_type_raw in ['serie_bolsillo', 'serie bolsillo', 'bolsillo', 'pocket', 'series']:
-                                    category = 'serie'
-                                # Si la categoría original es 'libro', asignar como libro
-                                elif category in ['libro']:
-                                    category = 'libro'
-                                else:
-                                    category = 'otro_producto'  # Valor por defecto si no se puede determinar
-                        
-                        try:
-                            is_available_value = str(row.get('is_available', row.get('available', row.get('disponible', 'True')))).lower()
-                            is_available = is_available_value in ['true', '1', 'yes', 'sí', 'si', 't', 'y'] or is_available_value not in ['false', '0', 'no', 'n', 'f']
-                        except:
-                            is_available = True
-
-                        measures = str(row.get('measures', row.get('Measures', row.get('medidas', row.get('Medidas', row.get('measurements', ''))))))
-                        if pd.isna(measures) or str(measures).lower() == 'nan' or str(measures).strip() == '' or str(measures).lower() == 'none':
-                            measures = ''
-
-                        try:
-                            pages_value = row.get('pages', row.get('Pages', row.get('páginas', row.get('Páginas', row.get('page_count', 0)))))
-                            if pd.isna(pages_value) or str(pages_value).lower() == 'nan' or str(pages_value).strip() == '' or str(pages_value).lower() == 'none':
-                                pages = None
-                            else:
-                                pages = int(pages_value)
-                        except (ValueError, TypeError):
-                            pages = None
-
-                        # El campo ISBN ya no se utiliza, simplemente asignamos cadena vacía
-                        isbn = ''
-                        
-                        # Extraer información de autores u otros campos adicionales
-                        authors = str(row.get('authors', row.get('author', row.get('Authors', row.get('Autor', row.get('autores', ''))))))
-                        if pd.isna(authors) or str(authors).lower() == 'nan' or str(authors).strip() == '' or str(authors).lower() == 'none':
-                            authors = ''
-
-                        # Crear o actualizar producto (sin product_type ni isbn)
-                        product, created = Product.objects.get_or_create(
-                            name=name,
-                            defaults={
-                                'description': description if (description != 'nan' and description.lower() != 'none') else '',
-                                'price': price,
-                                'category': category,
-                                'is_available': is_available,
-                                'measures': measures if (measures != 'nan' and measures.lower() != 'none') else '',
-                                'pages': pages,
-                                'authors': authors if (authors != 'nan' and authors.lower() != 'none') else '',
-                            }
-                        )
+                            rows = csv_rows(lines)
+                        spool = spool_rows(rows, progress)
+                    else:
+                        errors.append(f"No se pudo acceder al Google Sheet. Código de estado: {response.status_code}")
+                        errors.append("Asegúrate de que el documento esté compartido con permisos de lectura.")
+                        spool = None
 
-                        if not created:
-                            # Si el producto ya existía, actualizar los campos
-                            product.description = description if (description != 'nan' and description.lower() != 'none') else ''
-                            product.price = price
-                            product.category = category
-                            product.is_available = is_available
-                            product.measures = measures if (measures != 'nan' and measures.lower() != 'none') else ''
-                            product.pages = pages
-                            product.authors = authors if (authors != 'nan' and authors.lower() != 'none') else ''
-                            product.save()
-
-                        if created:
-                            imported_count += 1
-                else:
-                    errors.append(f"No se pudo acceder al Google Sheet. Código de estado: {response.status_code}")
-                    errors.append("Asegúrate de que el documento esté compartido con permisos de lectura.")
+                if spool is not None:
+                    with spool:
+                        summary, errors = write_products(
+                            spooled_rows(spool), delete_existing, deactivate_missing, write_progress
+                        )
             except requests.RequestException as e:
                 errors.append(f"Error al descargar el archivo: {str(e)}")
                 errors.append("Verifica que la URL sea correcta y esté accesible.")
         except ValueError as e:
             errors.append(f"Error al procesar la URL: {str(e)}")
-    
+
     except Exception as e:
         errors.append(f"Error general en la importación: {str(e)}")
-    
+
     # Eliminar las líneas de diagnóstico para que no aparezcan en la interfaz
     filtered_errors = [error for error in errors if not str(error).startswith("DEBUG:")]
-    return imported_count, filtered_errors
\ No newline at end of file
+    return summary, filtered_errors
+
+
+def import_products_with_gspread(sheet_url, delete_existing=False, use_pandas=False, progress=None):
+    """
+    Importa productos desde un Google Sheet exportando como CSV, sin desactivar
+    los productos que no aparecen en él.
+    Devuelve (productos creados, errores).
+    """
+    summary, errors = sync_products_with_gspread(
+        sheet_url,
+        delete_existing=delete_existing,
+        deactivate_missing=False,
+        use_pandas=use_pandas,
+        progress=progress,
+    )
+    return summary.get('created', 0), errors
@@ -0,0 +1,148 @@
+"""
+Cola de importaciones de productos respaldada por la base de datos.
+
+El admin encola las importaciones con enqueue_import() y el comando
+`manage.py run_import_worker` las ejecuta en segundo plano, sin necesidad de
+un broker externo.
+
+Mientras ejecuta una importación, el worker renueva un latido en la caché
+compartida; una importación en proceso sin latido se considera interrumpida.
+El latido y el progreso de la escritura van a la caché y no a la fila del job
+porque la escritura del catálogo es una sola transacción, y mientras dura
+SQLite no deja que otra conexión actualice la fila.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .google_sheet_importer import sync_products_with_gspread
+from .models import ImportJob
+
+# Cada cuántos segundos se renueva el latido
+HEARTBEAT_INTERVAL = 10
+# Una importación en proceso sin latido por más tiempo se considera interrumpida
+STALE_AFTER = timedelta(minutes=1)
+
+
+def _heartbeat_key(job_pk):
+    return f'importacion:{job_pk}:latido'
+
+
+def _rows_written_key(job_pk):
+    return f'importacion:{job_pk}:escritas'
+
+
+def beat(job_pk):
+    cache.set(_heartbeat_key(job_pk), time.time(), STALE_AFTER.total_seconds())
+
+
+@contextmanager
+def heartbeat(job_pk):
+    """Renueva el latido de la importación en un hilo mientras dura el bloque."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            beat(job_pk)
+
+    beat(job_pk)
+    thread = threading.Thread(target=run, name=f'latido-importacion-{job_pk}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        cache.delete(_heartbeat_key(job_pk))
+
+
+def rows_written(job):
+    """Filas escritas, incluida la escritura en curso de una importación en proceso."""
+    if job.status == 'running':
+        return cache.get(_rows_written_key(job.pk), job.rows_written)
+    return job.rows_written
+
+
+def enqueue_import(sheet_url, delete_existing=False):
+    """
+    Encola una importación del sheet. Si ya hay una activa para la misma URL
+    se reutiliza. Devuelve (job, creado).
+    """
+    try:
+        with transaction.atomic():
+            return ImportJob.objects.create(sheet_url=sheet_url, delete_existing=delete_existing), True
+    except IntegrityError:
+        job = ImportJob.objects.filter(sheet_url=sheet_url, status__in=ImportJob.ACTIVE_STATUSES).first()
+        if job is None:
+            # La importación activa terminó entre el INSERT y la consulta
+            return enqueue_import(sheet_url, delete_existing)
+        return job, False
+
+
+def fail_stale_jobs():
+    """Marca como fallidas las importaciones abandonadas por un worker que se detuvo."""
+    now = timezone.now()
+    running = list(ImportJob.objects.filter(status='running', started_at__lt=now - STALE_AFTER).values_list('pk', flat=True))
+    if not running:
+        return 0
+    alive = cache.get_many([_heartbeat_key(pk) for pk in running])
+    stale = [pk for pk in running if _heartbeat_key(pk) not in alive]
+    if not stale:
+        return 0
+    cache.delete_many([_rows_written_key(pk) for pk in stale])
+    return ImportJob.objects.filter(pk__in=stale, status='running').update(
+        status='failed',
+        errors=['La importación se interrumpió antes de terminar.'],
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def claim_next_job():
+    """Toma la importación pendiente más antigua; None si no hay ninguna."""
+    for job in ImportJob.objects.filter(status='pending').order_by('created_at')[:5]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=now, updated_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_import_job(job):
+    def progress(rows_read):
+        ImportJob.objects.filter(pk=job.pk).update(rows_processed=rows_read, updated_at=timezone.now())
+
+    def write_progress(rows):
+        cache.set(_rows_written_key(job.pk), rows, None)
+
+    try:
+        with heartbeat(job.pk):
+            summary, errors = sync_products_with_gspread(
+                job.sheet_url, delete_existing=job.delete_existing, progress=progress, write_progress=write_progress
+            )
+        status = 'done'
+    except Exception as e:
+        summary, errors = {}, [f"Error general en la importación: {str(e)}"]
+        status = 'failed'
+
+    now = timezone.now()
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=status,
+        rows_written=cache.get(_rows_written_key(job.pk), 0),
+        imported_count=summary.get('created', 0),
+        summary=summary,
+        errors=errors,
+        finished_at=now,
+        updated_at=now,
+    )
+    cache.delete(_rows_written_key(job.pk))
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from products.jobs import claim_next_job, fail_stale_jobs, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las importaciones de productos encoladas desde el admin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa las importaciones pendientes y termina')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos de espera cuando no hay importaciones pendientes')
+
+    def handle(self, *args, **options):
+        while True:
+            fail_stale_jobs()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Importando {job.sheet_url} (#{job.pk})...')
+            job = run_import_job(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(
+                f'#{job.pk} {job.get_status_display()}: {job.imported_count} productos importados, {len(job.errors)} errores.'
+            ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core import generaciones
+from products.models import Product, generate_shuffle_key
+
+
+class Command(BaseCommand):
+    help = 'Regenera el orden aleatorio de los productos del catálogo (programar periódicamente, p. ej. cada hora).'
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.only('pk'))
+        for product in products:
+            product.shuffle_key = generate_shuffle_key()
+        Product.objects.bulk_update(products, ['shuffle_key'], batch_size=500)
+        generaciones.incrementar('products.Product')
+        self.stdout.write(self.style.SUCCESS(f'Se reordenaron {len(products)} productos.'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:00
+
+import products.models
+from django.db import migrations, models
+
+
+def shuffle_existing_products(apps, schema_editor):
+    # El default se evalúa una sola vez para las filas existentes
+    Product = apps.get_model('products', 'Product')
+    existing = list(Product.objects.only('pk'))
+    for product in existing:
+        product.shuffle_key = products.models.generate_shuffle_key()
+    Product.objects.bulk_update(existing, ['shuffle_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_rename_additional_info_to_authors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='shuffle_key',
+            field=models.PositiveIntegerField(db_index=True, default=products.models.generate_shuffle_key, editable=False, verbose_name='Orden aleatorio'),
+        ),
+        migrations.RunPython(shuffle_existing_products, migrations.RunPython.noop),
+    ]
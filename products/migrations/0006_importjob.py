@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_shuffle_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_url', models.CharField(max_length=500, verbose_name='URL del Google Sheet')),
+                ('delete_existing', models.BooleanField(default=False, verbose_name='Eliminar productos existentes')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Completada'), ('failed', 'Fallida')], default='pending', max_length=10, verbose_name='Estado')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Filas procesadas')),
+                ('imported_count', models.PositiveIntegerField(default=0, verbose_name='Productos importados')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Errores')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+            ],
+            options={
+                'verbose_name': 'Importación de Productos',
+                'verbose_name_plural': 'Importaciones de Productos',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('sheet_url',), name='unique_active_import_per_sheet')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Resumen'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sheet_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Huella del Google Sheet'),
+        ),
+    ]
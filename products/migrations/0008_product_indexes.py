@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_sheet_hash_importjob_summary'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', '-created_at'], name='product_cat_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'shuffle_key'], name='product_cat_avail_shuffle_idx'),
+        ),
+    ]
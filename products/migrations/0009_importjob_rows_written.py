@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_written',
+            field=models.PositiveIntegerField(default=0, verbose_name='Filas escritas'),
+        ),
+    ]
@@ -1,8 +1,13 @@
+import random
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
 from tags.models import Tag
 
+def generate_shuffle_key():
+    return random.randint(0, 2**31 - 1)
+
+
 class Product(models.Model):
     # Categorías integradas directamente como opciones
     CATEGORIA_CHOICES = [
@@ -34,10 +39,25 @@ class Product(models.Model):
     # Información de autores del producto
     authors = models.TextField(blank=True, null=True, verbose_name="Autores")
 
+    # Clave aleatoria para mostrar los productos "en desorden" sin ORDER BY RANDOM();
+    # se regenera periódicamente con el comando shuffle_products
+    shuffle_key = models.PositiveIntegerField(default=generate_shuffle_key, db_index=True, editable=False, verbose_name="Orden aleatorio")
+
+    # Huella de la fila del Google Sheet de la última importación (ver google_sheet_importer)
+    sheet_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Huella del Google Sheet")
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-created_at']
+        indexes = [
+            # Parciales sobre los productos disponibles, que son los únicos que se listan
+            models.Index(fields=['category', '-created_at'], name='product_cat_avail_created_idx',
+                         condition=models.Q(is_available=True)),
+            # Catálogo y productos relacionados, ordenados por shuffle_key
+            models.Index(fields=['category', 'shuffle_key'], name='product_cat_avail_shuffle_idx',
+                         condition=models.Q(is_available=True)),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -76,4 +96,50 @@ class Package(models.Model):
         return self.name
 
     def get_absolute_url(self):
-        return reverse('products:package_detail', kwargs={'slug': self.slug})
\ No newline at end of file
+        return reverse('products:package_detail', kwargs={'slug': self.slug})
+
+class ImportJob(models.Model):
+    """
+    Importación de productos desde Google Sheets encolada desde el admin y
+    ejecutada por el comando run_import_worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    ]
+    ACTIVE_STATUSES = ['pending', 'running']
+
+    sheet_url = models.CharField(max_length=500, verbose_name="URL del Google Sheet")
+    delete_existing = models.BooleanField(default=False, verbose_name="Eliminar productos existentes")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name="Filas procesadas")
+    rows_written = models.PositiveIntegerField(default=0, verbose_name="Filas escritas")
+    imported_count = models.PositiveIntegerField(default=0, verbose_name="Productos importados")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Errores")
+    summary = models.JSONField(default=dict, blank=True, verbose_name="Resumen")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+
+    class Meta:
+        verbose_name = "Importación de Productos"
+        verbose_name_plural = "Importaciones de Productos"
+        ordering = ['-created_at']
+        constraints = [
+            # Una sola importación activa por sheet
+            models.UniqueConstraint(
+                fields=['sheet_url'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_import_per_sheet',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sheet_url} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
@@ -1,3 +1,288 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import busqueda, generaciones
+
+from . import jobs
+from .google_sheet_importer import csv_rows, dataframe_rows, normalize_dataframe, write_products
+from .jobs import claim_next_job, enqueue_import, fail_stale_jobs, run_import_job
+from .models import ImportJob, Package, Product
+
+
+def crear_producto(name, **kwargs):
+    defaults = {'price': 10000, 'category': 'libro'}
+    defaults.update(kwargs)
+    return Product.objects.create(name=name, **defaults)
+
+
+class ShuffleOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_catalogo_ordenado_por_shuffle_key(self):
+        for i in range(5):
+            crear_producto(f'Libro {i}', shuffle_key=5 - i)
+        response = self.client.get(reverse('products:categorized_product_list'))
+        libros = list(response.context['categorias']['libro'])
+        self.assertEqual([p.shuffle_key for p in libros], [1, 2, 3, 4, 5])
+
+    def test_relacionados_siguen_al_producto_y_dan_la_vuelta(self):
+        productos = [crear_producto(f'Libro {i}', shuffle_key=i) for i in range(6)]
+        response = self.client.get(productos[4].get_absolute_url())
+        relacionados = [p.shuffle_key for p in response.context['related_products']]
+        self.assertEqual(relacionados, [5, 0, 1, 2])
+
+    def test_comando_shuffle_products(self):
+        producto = crear_producto('Libro', shuffle_key=0)
+        call_command('shuffle_products', stdout=StringIO())
+        producto.refresh_from_db()
+        self.assertNotEqual(producto.shuffle_key, 0)
+
+
+class CategorizedCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_consultas_constantes(self):
+        for i, (category, _) in enumerate(Product.CATEGORIA_CHOICES * 3):
+            crear_producto(f'Producto {i}', category=category)
+        package = Package.objects.create(name='Paquete', price=50000)
+        package.products.set(Product.objects.all()[:2])
+        # Last-Modified (productos y paquetes), productos, paquetes y productos incluidos
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('products:categorized_product_list'))
+        categorias = response.context['categorias']
+        self.assertEqual(len(categorias['libro']), 3)
+        self.assertIn(package, categorias['paquete'])
+        self.assertContains(response, package.get_absolute_url())
+
+    def test_filtro_por_categoria(self):
+        crear_producto('Libro', category='libro')
+        crear_producto('Serie', category='serie')
+        response = self.client.get(reverse('products:categorized_product_list'), {'category': 'serie'})
+        self.assertEqual(list(response.context['categorias']), ['serie'])
+        self.assertEqual(len(response.context['categorias']['serie']), 1)
+
+    def test_cambiar_productos_del_paquete_invalida_catalogo(self):
+        libro = crear_producto('Libro')
+        package = Package.objects.create(name='Paquete', price=50000)
+        url = reverse('products:categorized_product_list')
+        self.assertNotContains(self.client.get(url), 'Incluye: Libro')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            package.products.add(libro)
+        self.assertContains(self.client.get(url), 'Incluye: Libro')
+
+class PresupuestoConsultasTests(TestCase):
+    """Consultas máximas por petición de las vistas públicas del catálogo."""
+    PRODUCTOS = 2000
+    PAQUETES = 20
+    PRODUCTOS_POR_PAQUETE = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        categorias = [category for category, _ in Product.CATEGORIA_CHOICES if category != 'paquete']
+        productos = Product.objects.bulk_create([
+            Product(
+                name=f'Producto {i}', slug=f'producto-{i}', price=10000,
+                category=categorias[i % len(categorias)], description='Descripción', shuffle_key=i,
+            )
+            for i in range(cls.PRODUCTOS)
+        ], batch_size=500)
+        paquetes = Package.objects.bulk_create([
+            Package(name=f'Paquete {i}', slug=f'paquete-{i}', price=50000)
+            for i in range(cls.PAQUETES)
+        ])
+        Package.products.through.objects.bulk_create([
+            Package.products.through(package=paquete, product=productos[i * cls.PRODUCTOS_POR_PAQUETE + j])
+            for i, paquete in enumerate(paquetes)
+            for j in range(cls.PRODUCTOS_POR_PAQUETE)
+        ])
+        cls.producto = productos[0]
+        # El de mayor shuffle_key de su categoría: los relacionados dan la vuelta al inicio
+        cls.ultimo_producto = productos[-1]
+        cls.paquete = paquetes[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_categorized_product_list(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('products:categorized_product_list'))
+        self.assertEqual(len(response.context['categorias']['paquete']), self.PAQUETES)
+
+    def test_product_detail(self):
+        # Last-Modified, producto, relacionados por etiquetas (no hay) y, de la
+        # misma categoría, los siguientes y los del inicio
+        with self.assertNumQueries(5):
+            response = self.client.get(self.ultimo_producto.get_absolute_url())
+        self.assertEqual(len(response.context['related_products']), 4)
+
+    def test_package_detail(self):
+        # Last-Modified, paquete y productos incluidos
+        with self.assertNumQueries(3):
+            response = self.client.get(self.paquete.get_absolute_url())
+        self.assertContains(response, self.producto.name)
+
+
+SHEET_CSV = """Name,precio,categoría,book_type,disponible,Medidas,páginas,autores
+Libro A,12000,Libros,,si,15x20,120,Autor X
+Serie B,5000,producto,bolsillo,no,,,
+,1000,libro,,,,,
+Libro A,13000,book,,,,,
+"""
+
+
+class SheetImporterTests(TestCase):
+    def rows(self, csv=SHEET_CSV):
+        return csv_rows(StringIO(csv))
+
+    def test_normaliza_alias_de_columnas(self):
+        rows = dict(self.rows())
+        self.assertEqual(rows[1]['category'], 'libro')
+        self.assertEqual(rows[1]['pages'], 120)
+        self.assertEqual(rows[1]['measures'], '15x20')
+        self.assertEqual(rows[2]['category'], 'serie')
+        self.assertFalse(rows[2]['is_available'])
+
+    def test_importa_en_lote_y_reporta_errores(self):
+        crear_producto('Serie B', price=1, category='libro')
+        # 2 consultas por lote para el índice de búsqueda (ver core/busqueda.py)
+        with self.assertNumQueries(9):
+            summary, errors = write_products(self.rows())
+        self.assertEqual((summary['created'], summary['updated']), (1, 1))
+        self.assertEqual(errors, [
+            'Fila 3: No se encontró un nombre de producto válido',
+            "Fila 4: El producto 'Libro A' está repetido en el sheet; se usa la primera fila",
+        ])
+        self.assertEqual(Product.objects.get(name='Libro A').price, 12000)
+        self.assertEqual(Product.objects.get(name='Serie B').category, 'serie')
+        # Serie B quedó como no disponible
+        self.assertEqual([resultado['titulo'] for resultado in busqueda.buscar('autor')], ['Libro A'])
+
+    def test_progreso_de_la_escritura_por_lote(self):
+        progress = []
+        with mock.patch('products.google_sheet_importer.BATCH_SIZE', 2):
+            write_products(self.rows(), progress=progress.append)
+        self.assertEqual(progress, [2, 4, 4])
+
+    def test_importacion_incrementa_la_generacion_una_vez(self):
+        for i in range(3):
+            crear_producto(f'Existente {i}')
+        antes = generaciones.generaciones('products.Product')['products.Product']
+        with self.captureOnCommitCallbacks(execute=True):
+            write_products(self.rows(), delete_existing=True)
+        self.assertEqual(generaciones.generaciones('products.Product')['products.Product'], antes + 1)
+
+    def test_error_revierte_el_borrado(self):
+        crear_producto('Existente')
+
+        def rows():
+            yield from self.rows()
+            raise RuntimeError('fallo de red')
+
+        with self.assertRaises(RuntimeError):
+            write_products(rows(), delete_existing=True)
+        self.assertTrue(Product.objects.filter(name='Existente').exists())
+
+    def test_resincronizar_sin_cambios_no_escribe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            write_products(self.rows(), deactivate_missing=True)
+        antes = generaciones.generaciones('products.Product')
+        # SAVEPOINT, SELECT del catálogo y RELEASE
+        with self.assertNumQueries(3), self.captureOnCommitCallbacks(execute=True):
+            summary, errors = write_products(self.rows(), deactivate_missing=True)
+        self.assertEqual(summary, {'created': 0, 'updated': 0, 'unchanged': 2, 'deactivated': 0})
+        # Ni las páginas ni los ETag de los productos se invalidan
+        self.assertEqual(generaciones.generaciones('products.Product'), antes)
+
+    def test_sincronizacion_actualiza_y_desactiva(self):
+        crear_producto('Antiguo')
+        write_products(self.rows(), deactivate_missing=True)
+        csv = SHEET_CSV.replace('Libro A,12000', 'Libro A,14000')
+        summary, errors = write_products(self.rows(csv), deactivate_missing=True)
+        self.assertEqual(summary, {'created': 0, 'updated': 1, 'unchanged': 1, 'deactivated': 0})
+        self.assertEqual(Product.objects.get(name='Libro A').price, 14000)
+        self.assertFalse(Product.objects.get(name='Antiguo').is_available)
+
+        # Un producto desactivado vuelve a estar disponible si reaparece en el sheet
+        summary, errors = write_products(self.rows(csv + 'Antiguo,10000,libro,,,,,\n'), deactivate_missing=True)
+        self.assertEqual(summary['updated'], 1)
+        self.assertTrue(Product.objects.get(name='Antiguo').is_available)
+
+    @skipUnless(pd, 'pandas no está instalado')
+    def test_dataframe_normaliza_igual_que_streaming(self):
+        csv = SHEET_CSV + 'Otro C,abc,,,,,12.0,\n'
+        dataframe = list(dataframe_rows(normalize_dataframe(pd.read_csv(StringIO(csv)))))
+        self.assertEqual(dataframe, list(self.rows(csv)))
+
+
+class ImportJobTests(TestCase):
+    SHEET_URL = 'https://docs.google.com/spreadsheets/d/abc/edit'
+
+    def test_importaciones_del_mismo_sheet_se_deduplican(self):
+        job, created = enqueue_import(self.SHEET_URL)
+        self.assertTrue(created)
+        same_job, created = enqueue_import(self.SHEET_URL)
+        self.assertFalse(created)
+        self.assertEqual(same_job, job)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_worker_ejecuta_y_registra_el_progreso(self):
+        enqueue_import(self.SHEET_URL, delete_existing=True)
+
+        def fake_import(sheet_url, delete_existing, progress, write_progress):
+            progress(10)
+            # La escritura se ve en curso aunque su transacción no haya terminado
+            write_progress(5)
+            self.assertEqual(jobs.rows_written(ImportJob.objects.get()), 5)
+            self.assertEqual(fail_stale_jobs(), 0)
+            write_progress(9)
+            return {'created': 8}, ['Fila 3: No se encontró un nombre de producto válido']
+
+        job = claim_next_job()
+        self.assertEqual(job.status, 'running')
+        self.assertIsNone(claim_next_job())
+        # Una importación larga: con latido no se da por interrumpida
+        ImportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('products.jobs.sync_products_with_gspread', side_effect=fake_import):
+            job = run_import_job(job)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.rows_processed, job.rows_written, job.imported_count, len(job.errors)), (10, 9, 8, 1))
+        # Terminada la importación se puede volver a encolar
+        self.assertTrue(enqueue_import(self.SHEET_URL)[1])
+
+    def test_importacion_sin_latido_se_marca_fallida(self):
+        enqueue_import(self.SHEET_URL)
+        job = claim_next_job()
+        ImportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - jobs.STALE_AFTER * 2)
+        jobs.beat(job.pk)
+        self.assertEqual(fail_stale_jobs(), 0)
+        cache.delete(jobs._heartbeat_key(job.pk))
+        self.assertEqual(fail_stale_jobs(), 1)
+        self.assertEqual(ImportJob.objects.get().status, 'failed')
 
-# Create your tests here.
+    def test_vista_encola_sin_importar(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        with mock.patch('products.jobs.sync_products_with_gspread') as importer:
+            self.client.post(reverse('products:import_products_from_sheet'), {'sheet_url': self.SHEET_URL})
+        importer.assert_not_called()
+        self.assertEqual(ImportJob.objects.get().status, 'pending')
+        status = self.client.get(reverse('products:import_jobs_status')).json()
+        self.assertEqual(status['jobs'][0]['status'], 'pending')
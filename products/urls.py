@@ -9,4 +9,5 @@ urlpatterns = [
     path('products/<slug:slug>/', views.product_detail, name='product_detail'),
     path('packages/<slug:slug>/', views.package_detail, name='package_detail'),
     path('admin/import_products/', views.import_products_from_sheet, name='import_products_from_sheet'),
+    path('admin/import_products/status/', views.import_jobs_status, name='import_jobs_status'),
 ]
\ No newline at end of file
@@ -1,24 +1,62 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import redirect
+from django.db.models import Max, Prefetch, Q, Subquery
+from core.asincrono import alista, arender
+from core.cache_paginas import cache_pagina, respuesta_condicional
+from core.enrutador import solo_lectura
+from core.relacionados import ids_relacionados, relacionados
 from .models import Product, Package
 
-def product_list(request):
+async def product_list(request):
     # Redirigir a la vista categorizada para mantener consistencia
-    return categorized_product_list(request)
-
-def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_available=True)
-
-    # Obtener productos relacionados (mismos de la misma categoría) en orden aleatorio
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_available=True
-    ).exclude(slug=slug).order_by('?')[:4]
+    return await categorized_product_list(request)
+
+# Last-Modified de las páginas del catálogo: el último cambio entre los productos
+# que muestran (se incluyen los no disponibles, que también dejan de mostrarse)
+
+async def _ultima_modificacion_producto(request, slug):
+    # El producto y sus relacionados: por etiquetas y, si faltan, de la misma categoría
+    product = Product.objects.filter(slug=slug)
+    products = Product.objects.filter(
+        Q(category__in=product.values('category'))
+        | Q(pk__in=ids_relacionados(Product, Subquery(product.values('pk')), Product))
+    )
+    return (await products.aaggregate(m=Max('updated_at')))['m']
+
+def _ultima_modificacion_paquete(request, slug):
+    fechas = Package.objects.filter(slug=slug).aggregate(paquete=Max('updated_at'), productos=Max('products__updated_at'))
+    return max(filter(None, fechas.values()), default=None)
+
+async def _ultima_modificacion_catalogo(request):
+    fechas = [
+        (await Product.objects.aaggregate(m=Max('updated_at')))['m'],
+        (await Package.objects.aaggregate(m=Max('updated_at')))['m'],
+    ]
+    return max(filter(None, fechas), default=None)
+
+@solo_lectura
+@respuesta_condicional('productos', ultima_modificacion=_ultima_modificacion_producto)
+@cache_pagina('productos')
+async def product_detail(request, slug):
+    product = await aget_object_or_404(Product, slug=slug, is_available=True)
+
+    # Productos relacionados por etiquetas (precalculados en core.relacionados)
+    related_products = await alista(relacionados(product, Product).filter(is_available=True)[:4])
+    if len(related_products) < 4:
+        # Si no alcanzan, de la misma categoría en orden aleatorio: los
+        # siguientes según shuffle_key, volviendo al inicio si no alcanzan
+        candidates = Product.objects.filter(
+            category=product.category,
+            is_available=True
+        ).exclude(pk__in=[product.pk, *(related.pk for related in related_products)]).order_by('shuffle_key')
+        related_products += await alista(candidates.filter(shuffle_key__gte=product.shuffle_key)[:4 - len(related_products)])
+        if len(related_products) < 4:
+            related_products += await alista(candidates.filter(shuffle_key__lt=product.shuffle_key)[:4 - len(related_products)])
 
     # Obtener información de autores si está presente
     authors_info = ""
@@ -28,33 +66,53 @@ def product_detail(request, slug):
     else:
         authors_info = ""
 
-    return render(request, 'products/product_detail.html', {
+    return await arender(request, 'products/product_detail.html', {
         'product': product,
         'related_products': related_products,
         'additional_info': authors_info
     })
 
+@solo_lectura
+@respuesta_condicional('productos', ultima_modificacion=_ultima_modificacion_paquete)
+@cache_pagina('productos')
 def package_detail(request, slug):
-    package = get_object_or_404(Package, slug=slug, is_available=True)
+    # La plantilla recorre package.products.all varias veces
+    package = get_object_or_404(Package.objects.prefetch_related('products'), slug=slug, is_available=True)
     return render(request, 'products/package_detail.html', {'package': package})
 
-def categorized_product_list(request):
-    """Vista para mostrar productos organizados por categorías"""
-    # Obtener productos por categorías específicas
-    products = Product.objects.filter(is_available=True)
+# Campos que usan las tarjetas del catálogo
+CATALOG_CARD_FIELDS = ('name', 'slug', 'description', 'price', 'image', 'category', 'measures', 'shuffle_key')
 
+@solo_lectura
+@respuesta_condicional('productos', ultima_modificacion=_ultima_modificacion_catalogo)
+@cache_pagina('productos')
+async def categorized_product_list(request):
+    """Vista para mostrar productos organizados por categorías"""
     # Obtener el filtro de categoría si existe
     category_filter = request.GET.get('category', None)
 
     if category_filter and category_filter != 'all':
-        # Filtrar por categoría específica y ordenar aleatoriamente
-        categorias = {}
-        categorias[category_filter] = products.filter(category=category_filter).order_by('?')
+        categorias = {category_filter: []}
     else:
-        # Mostrar todas las categorías con productos ordenados aleatoriamente
-        categorias = {}
-        for cat_choice, cat_name in Product.CATEGORIA_CHOICES:
-            categorias[cat_choice] = products.filter(category=cat_choice).order_by('?')
+        categorias = {cat_choice: [] for cat_choice, cat_name in Product.CATEGORIA_CHOICES}
+
+    # Una sola consulta para todos los productos, agrupados por categoría en Python
+    # (ordenados aleatoriamente según shuffle_key)
+    products = Product.objects.filter(
+        is_available=True,
+        category__in=categorias,
+    ).only(*CATALOG_CARD_FIELDS).order_by('shuffle_key')
+
+    if 'paquete' in categorias:
+        categorias['paquete'].extend(await alista(
+            Package.objects.filter(is_available=True).only(
+                'name', 'slug', 'image', 'price'
+            ).prefetch_related(
+                Prefetch('products', queryset=Product.objects.only('name', 'slug'))
+            )
+        ))
+    async for product in products:
+        categorias[product.category].append(product)
 
     # Diccionario para traducir las categorías al plural para mostrar en la web
     categoria_plurales = {
@@ -70,16 +128,17 @@ def categorized_product_list(request):
         'categoria_plurales': categoria_plurales,
         'current_category': category_filter
     }
-    return render(request, 'products/categorized_product_list.html', context)
+    return await arender(request, 'products/categorized_product_list.html', context)
 
-# Importar la funcionalidad de importación desde Google Sheets
-from .google_sheet_importer import import_products_with_gspread
+# Las importaciones desde Google Sheets se ejecutan en segundo plano (ver products.jobs)
+from .jobs import enqueue_import, rows_written
+from .models import ImportJob
 
 @staff_member_required
 @require_POST
 def import_products_from_sheet(request):
     """
-    Vista para importar productos desde una URL de Google Sheets
+    Vista para encolar la importación de productos desde una URL de Google Sheets
     """
     sheet_url = request.POST.get('sheet_url', '').strip()
 
@@ -87,17 +146,35 @@ def import_products_from_sheet(request):
         messages.error(request, 'La URL del Google Sheet es requerida.')
         return redirect('admin:products_product_changelist')
 
-    try:
-        imported_count, errors = import_products_with_gspread(sheet_url, delete_existing=True)
-
-        if imported_count > 0:
-            messages.success(request, f'Se importaron {imported_count} productos exitosamente.')
-
-        if errors:
-            for error in errors:
-                messages.error(request, f'Error: {error}')
+    # Por defecto se sincronizan solo los cambios; la casilla del formulario
+    # permite borrar el catálogo y cargarlo de nuevo
+    delete_existing = request.POST.get('delete_existing') == '1'
+    job, created = enqueue_import(sheet_url, delete_existing=delete_existing)
+    if created:
+        messages.success(request, 'La importación se inició en segundo plano. El progreso se muestra en esta página.')
+    else:
+        messages.warning(request, 'Ya hay una importación en curso para este Google Sheet.')
 
-    except Exception as e:
-        messages.error(request, f'Error al importar el archivo: {str(e)}')
+    return redirect('admin:products_product_changelist')
 
-    return redirect('admin:products_product_changelist')
\ No newline at end of file
+@staff_member_required
+def import_jobs_status(request):
+    """
+    Estado de las últimas importaciones, consultado periódicamente desde el admin
+    """
+    jobs = ImportJob.objects.all()[:5]
+    return JsonResponse({'jobs': [
+        {
+            'id': job.id,
+            'sheet_url': job.sheet_url,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'rows_processed': job.rows_processed,
+            'rows_written': rows_written(job),
+            'imported_count': job.imported_count,
+            'summary': job.summary,
+            'errors': job.errors,
+            'is_active': job.is_active,
+        }
+        for job in jobs
+    ]})